@@ -1,8 +1,137 @@
+import hashlib
+import hmac
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from iot_ai_monitor.metrics import timed
 from .models import UserAPIKey
 
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "api-key-auth:v2"
+
+
+class VerifiedAPIKeyCache:
+    """
+    Remembers the id of each API key that already passed the password-hasher check, for
+    API_KEY_CACHE_TTL seconds, so repeated requests skip the hasher. Entries are keyed by an
+    HMAC of the raw header, so the secret part of a key never reaches the cache, and hold only
+    the key id. A second entry maps the key prefix to that HMAC so a key can be dropped
+    without knowing its secret.
+
+    The cache only runs on an alias shared by all processes: changing or revoking a key clears
+    it once the change commits, and a per-process cache would keep it elsewhere. If the cache
+    cannot be reached, keys are verified against the database.
+    """
+
+    def __init__(self, alias: str, timeout: int):
+        self.alias = alias
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self) -> bool:
+        return self.timeout > 0 and self.shared
+
+    @property
+    def shared(self) -> bool:
+        return not isinstance(self.cache, LocMemCache)
+
+    @staticmethod
+    def _digest(raw_key: str) -> str:
+        return hmac.new(settings.SECRET_KEY.encode(), raw_key.encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def _prefix_key(prefix: str) -> str:
+        return f"{KEY_PREFIX}:prefix:{prefix}"
+
+    def get(self, raw_key: str):
+        try:
+            key_id = self.cache.get(f"{KEY_PREFIX}:{self._digest(raw_key)}")
+        except Exception as e:
+            logger.warning(f"API key cache lookup failed: {e}")
+            key_id = None
+        with self._lock:
+            if key_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key_id
+
+    def set(self, raw_key: str, api_key):
+        digest = self._digest(raw_key)
+        try:
+            self.cache.set_many({
+                f"{KEY_PREFIX}:{digest}": api_key.pk,
+                self._prefix_key(api_key.prefix): digest,
+            }, self.timeout)
+        except Exception as e:
+            logger.warning(f"Could not cache API key {api_key.prefix}: {e}")
+
+    def invalidate(self, prefix: str):
+        if not self.enabled:
+            return
+        try:
+            digest = self.cache.get(self._prefix_key(prefix))
+            if digest is not None:
+                self.cache.delete_many([f"{KEY_PREFIX}:{digest}", self._prefix_key(prefix)])
+        except Exception as e:
+            logger.error(f"Could not drop API key {prefix} from the cache; it stays cached for up to "
+                         f"{self.timeout} seconds: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared,
+            "ttl_seconds": self.timeout,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+
+
+api_key_cache = VerifiedAPIKeyCache(alias=settings.API_KEY_CACHE_ALIAS, timeout=settings.API_KEY_CACHE_TTL)
+
+
+@timed("api_key_verify")
+def verify_api_key(raw_key: str) -> UserAPIKey:
+    """
+    Same checks as UserAPIKey.objects.get_from_key, but loads the user and the device
+    configuration in the same query. Keys found in api_key_cache skip the password hasher;
+    they are still loaded from the database, so revocation and expiry apply immediately.
+    """
+    usable_keys = UserAPIKey.objects.get_usable_keys().select_related("user", "config")
+    if api_key_cache.enabled:
+        key_id = api_key_cache.get(raw_key)
+        if key_id is not None:
+            api_key = usable_keys.filter(pk=key_id).first()
+            if api_key is not None and not api_key.has_expired:
+                return api_key
+
+    prefix, _, _ = raw_key.partition(".")
+    api_key = usable_keys.get(prefix=prefix)
+    if api_key.has_expired or not api_key.is_valid(raw_key):
+        raise UserAPIKey.DoesNotExist("Key is not valid.")
+
+    if api_key_cache.enabled:
+        api_key_cache.set(raw_key, api_key)
+    return api_key
+
 
 class APIKeyAuthentication(BaseAuthentication):
     def authenticate(self, request):
@@ -11,7 +140,7 @@ class APIKeyAuthentication(BaseAuthentication):
             return None
 
         try:
-            api_key = UserAPIKey.objects.get_from_key(api_key_header)
+            api_key = verify_api_key(api_key_header)
             user = api_key.user
         except UserAPIKey.DoesNotExist:
             raise exceptions.AuthenticationFailed('Invalid API Key provided.')
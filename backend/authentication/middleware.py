@@ -0,0 +1,27 @@
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+
+from .authentication import verify_api_key
+from .models import UserAPIKey
+
+
+class APIKeyAuthMiddleware(BaseMiddleware):
+    """
+    Channels counterpart of APIKeyAuthentication: when a WebSocket handshake carries an
+    X-Api-Key header, the verified key is stored in scope["api_key"] and its user in
+    scope["user"]. Connections without a valid key get scope["api_key"] = None.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope["api_key"] = None
+        raw_key = dict(scope.get("headers", [])).get(b"x-api-key")
+        if raw_key:
+            try:
+                api_key = await database_sync_to_async(verify_api_key)(raw_key.decode("latin1"))
+            except UserAPIKey.DoesNotExist:
+                pass
+            else:
+                scope["api_key"] = api_key
+                scope["user"] = api_key.user
+        return await super().__call__(scope, receive, send)
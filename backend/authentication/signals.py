@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from .authentication import api_key_cache
 from .models import UserAPIKey
+from vision.device_config import close_device_config_sockets
 from vision.models import DeviceConfiguration
 
 
@@ -8,3 +11,27 @@ from vision.models import DeviceConfiguration
 def create_device_configuration(sender, instance, created, **kwargs):
     if created:
         DeviceConfiguration.objects.create(api_key=instance)
+
+
+@receiver(post_save, sender=UserAPIKey)
+@receiver(post_delete, sender=UserAPIKey)
+def invalidate_cached_api_key(sender, instance, **kwargs):
+    # After the commit, so a concurrent request cannot cache the old row again meanwhile.
+    prefix = instance.prefix
+    transaction.on_commit(lambda: api_key_cache.invalidate(prefix))
+
+
+@receiver(post_save, sender=UserAPIKey)
+@receiver(post_delete, sender=UserAPIKey)
+def close_revoked_device_sockets(sender, instance, **kwargs):
+    if kwargs.get("signal") is post_delete or instance.revoked or instance.has_expired:
+        prefix = instance.prefix
+        transaction.on_commit(lambda: close_device_config_sockets(prefix))
+
+
+@receiver(post_save, sender=DeviceConfiguration)
+@receiver(post_delete, sender=DeviceConfiguration)
+def invalidate_cached_device_configuration(sender, instance, **kwargs):
+    # The key's primary key is "<prefix>.<hash>"; avoid loading a key that may be mid-delete.
+    prefix = instance.api_key_id.partition(".")[0]
+    transaction.on_commit(lambda: api_key_cache.invalidate(prefix))
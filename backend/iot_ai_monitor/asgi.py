@@ -12,15 +12,25 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-import vision.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'iot_ai_monitor.settings')
 
+# Set up Django before importing consumers and middleware that use models.
+django_asgi_app = get_asgi_application()
+
+from authentication.middleware import APIKeyAuthMiddleware  # noqa: E402
+from iot_ai_monitor.profiling import ChannelsProfilingMiddleware  # noqa: E402
+import vision.routing  # noqa: E402
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
-        URLRouter(
-            vision.routing.websocket_urlpatterns
+        APIKeyAuthMiddleware(
+            ChannelsProfilingMiddleware(
+                URLRouter(
+                    vision.routing.websocket_urlpatterns
+                )
+            )
         )
     ),
 })
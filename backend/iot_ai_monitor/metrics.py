@@ -0,0 +1,261 @@
+"""
+In-process metrics for the /metrics endpoint, exposed in the Prometheus text format.
+
+Counters, gauges and histograms are kept per server process, so scrape every process on a port
+of its own. Metrics without labels are exposed from the start, at zero. When
+METRICS_ENABLED is off, recording returns immediately and @timed hands back the undecorated
+function, so instrumented hot paths cost nothing.
+"""
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry, name: str, documentation: str, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        if not self.labelnames:
+            # Prometheus convention: a metric without labels shows 0 before anything is recorded.
+            self._values[()] = self._zero()
+
+    def _zero(self):
+        return 0
+
+    def _key(self, labels: dict) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _label_text(self, key: tuple, extra=()) -> str:
+        pairs = [*zip(self.labelnames, key), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines += self._sample_lines(key, value)
+        return lines
+
+    def _sample_lines(self, key, value) -> list:
+        return [f"{self.name}{self._label_text(key)} {_format_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def track(self, **labels):
+        """Context manager that counts the code inside it as in progress."""
+        return _InProgress(self, labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(registry, name, documentation, labelnames)
+
+    def _zero(self):
+        # Per-bucket counts (the last one is +Inf), then the sum of all observations.
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = self._zero()
+            state[index] += 1
+            state[-1] += value
+
+    def time(self, **labels):
+        """Context manager that observes how long the code inside it took, in seconds."""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def _sample_lines(self, key, value) -> list:
+        counts, total = value[:-1], value[-1]
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{self._label_text(key, [('le', _format_number(bound))])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_format_number(total)}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _InProgress:
+    __slots__ = ("gauge", "labels")
+
+    def __init__(self, gauge: Gauge, labels: dict):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self):
+        self.gauge.inc(**self.labels)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.gauge.dec(**self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"A metric named {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(f"{line}\n" for metric in metrics for line in metric.expose())
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+stage_seconds = metrics.histogram(
+    "iot_monitor_stage_duration_seconds",
+    "Time spent in each stage of request handling and analysis.",
+    ["stage"],
+)
+llm_requests_total = metrics.counter(
+    "iot_monitor_llm_requests_total", "Requests sent to the LLM service, by model.", ["model"]
+)
+llm_errors_total = metrics.counter(
+    "iot_monitor_llm_errors_total", "Failed LLM requests, by model and error type.", ["model", "error"]
+)
+analyses_in_flight = metrics.gauge(
+    "iot_monitor_analyses_in_flight", "Analyses currently running in this process."
+)
+websocket_connections = metrics.gauge(
+    "iot_monitor_websocket_connections", "Open WebSocket connections, by consumer.", ["consumer"]
+)
+
+
+def timer(stage: str):
+    """Context manager that records the duration of a stage in stage_seconds."""
+    return stage_seconds.time(stage=stage)
+
+
+def timed(stage: str):
+    """Decorator that records each call of a function or coroutine function as a stage."""
+    def decorator(func):
+        if not metrics.enabled:
+            return func
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage_seconds.time(stage=stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_seconds.time(stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,350 @@
+"""
+Opt-in sampling profiler for individual HTTP requests and WebSocket connections.
+
+A profiled request is sampled every PROFILING_INTERVAL_MS by one background thread, and each
+sample reads only that request's own stacks: the await chain of its asyncio task and the thread
+Django runs its sync code in (under ASGI every request gets its own thread-sensitive thread).
+Concurrent requests therefore never show up in each other's profiles. Work a request hands to a
+shared pool with thread_sensitive=False shows up only as the await that waits for it.
+
+Profiles are written to PROFILING_DIR as collapsed stacks ("outer;inner 12"), which
+flamegraph.pl, inferno and speedscope read directly, and only the newest PROFILING_MAX_FILES are kept.
+"""
+import asyncio
+import concurrent.futures.thread
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import SyncToAsync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".folded"
+PROFILE_NAME_RE = re.compile(r"^[\w.-]+\.folded$")
+
+# Frames from these modules are all an idle executor thread shows while it waits for work.
+_IDLE_FILES = {
+    os.path.normcase(module.__file__) for module in (threading, queue, concurrent.futures.thread)
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    base_dir = str(settings.BASE_DIR)
+    if filename.startswith(base_dir):
+        filename = os.path.relpath(filename, base_dir)
+    else:
+        filename = filename.rpartition("site-packages" + os.sep)[2]
+    # ";" separates frames in the collapsed format.
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _thread_frames(frame, stop=None) -> list:
+    """The frames of a thread from the outermost call in, stopping before `stop` if it is found."""
+    frames = []
+    while frame is not None and frame is not stop:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _await_chain(task: asyncio.Task, loop_frame) -> list:
+    """
+    The frames of a task from its outermost coroutine in. Suspended coroutines are followed through
+    what they await; if the innermost one is running, the loop thread's frames below it are added.
+    """
+    frames = []
+    awaitable = task.get_coro()
+    innermost = None
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) \
+            or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        innermost = awaitable
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) \
+            or getattr(awaitable, "ag_await", None)
+
+    running = innermost is not None and (
+        getattr(innermost, "cr_running", False) or getattr(innermost, "gi_running", False)
+    )
+    if running and loop_frame is not None:
+        below = _thread_frames(loop_frame, stop=frames[-1])
+        # Only trust the loop thread's stack if it really passes through our innermost coroutine.
+        if below and below[0].f_back is frames[-1]:
+            frames += below
+    return frames
+
+
+class RequestProfile:
+    """The samples collected for one request or connection."""
+
+    def __init__(self, kind: str, label: str):
+        self.kind = kind
+        self.label = label
+        self.task = None
+        self.loop_thread_id = None
+        self.thread_id = None
+        self.owns_sync_thread = False
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @classmethod
+    def for_current_context(cls, kind: str, label: str) -> "RequestProfile":
+        profile = cls(kind, label)
+        try:
+            profile.task = asyncio.current_task()
+        except RuntimeError:
+            profile.task = None
+        if profile.task is not None:
+            profile.loop_thread_id = threading.get_ident()
+            # Django's ASGI handler gives each request a ThreadSensitiveContext, so its sync code
+            # gets a thread of its own; without one, sync code shares a thread with other requests.
+            profile.owns_sync_thread = SyncToAsync.thread_sensitive_context.get(None) is not None
+        else:
+            profile.thread_id = threading.get_ident()
+        return profile
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def sample(self, thread_frames: dict):
+        if self.duration > settings.PROFILING_MAX_SECONDS:
+            return
+        frames = []
+        if self.task is not None:
+            frames = _await_chain(self.task, thread_frames.get(self.loop_thread_id))
+        if self.thread_id is not None:
+            sync_frames = _thread_frames(thread_frames.get(self.thread_id))
+            if not all(os.path.normcase(f.f_code.co_filename) in _IDLE_FILES for f in sync_frames):
+                frames += sync_frames
+        if frames:
+            self.stacks[";".join(_frame_label(frame) for frame in frames)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class _Sampler:
+    """One background thread that samples every active profile; it exits when none are left."""
+
+    def __init__(self):
+        self._profiles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: RequestProfile):
+        profile.finished = time.perf_counter()
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self):
+        interval = settings.PROFILING_INTERVAL_MS / 1000
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            thread_frames = sys._current_frames()
+            for profile in profiles:
+                try:
+                    profile.sample(thread_frames)
+                except Exception as e:
+                    logger.debug(f"Dropped a profiler sample: {e}")
+            del thread_frames
+
+
+sampler = _Sampler()
+
+
+class ProfileStore:
+    """The bounded directory profiles are written to."""
+
+    @property
+    def root(self) -> Path:
+        return Path(settings.PROFILING_DIR)
+
+    def save(self, profile: RequestProfile) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", profile.label).strip("_")[:60] or "root"
+        name = (
+            f"{timezone.now():%Y%m%dT%H%M%S}-{profile.kind}-{slug}-"
+            f"{round(profile.duration * 1000)}ms-{uuid.uuid4().hex[:8]}{PROFILE_SUFFIX}"
+        )
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_path = self.root / f".{name}.tmp"
+        temp_path.write_text(profile.collapsed(), encoding="utf-8")
+        os.replace(temp_path, self.root / name)
+        self.prune()
+        return name
+
+    def entries(self) -> list:
+        """The stored profiles, newest first."""
+        try:
+            paths = [path for path in self.root.iterdir() if PROFILE_NAME_RE.match(path.name)]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for path in paths:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append({"name": path.name, "size": stat.st_size, "modified": stat.st_mtime})
+        entries.sort(key=lambda entry: entry["modified"], reverse=True)
+        return entries
+
+    def path(self, name: str):
+        """The path of a stored profile, or None if the name is not one."""
+        if not PROFILE_NAME_RE.match(name):
+            return None
+        path = self.root / name
+        return path if path.is_file() else None
+
+    def prune(self):
+        for entry in self.entries()[settings.PROFILING_MAX_FILES:]:
+            try:
+                (self.root / entry["name"]).unlink()
+            except FileNotFoundError:
+                pass
+
+
+profile_store = ProfileStore()
+
+
+def _sampled() -> bool:
+    return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def _save(profile: RequestProfile):
+    if not profile.samples:
+        return None
+    try:
+        return profile_store.save(profile)
+    except OSError as e:
+        logger.warning(f"Could not save the profile of {profile.label}: {e}")
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a PROFILING_SAMPLE_RATE share of requests, and every request from a staff user that
+    carries the PROFILING_HEADER header. The stored profile's name is returned in X-Profile-Id.
+    Must come after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not (_sampled() or (self._requested(request) and request.user.is_staff)):
+            return self.get_response(request)
+
+        profile = RequestProfile.for_current_context("http", f"{request.method} {request.path}")
+        request._profile = profile
+        sampler.add(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.remove(profile)
+        return self._finish(response, _save(profile))
+
+    async def __acall__(self, request):
+        if not (_sampled() or (self._requested(request) and (await request.auser()).is_staff)):
+            return await self.get_response(request)
+
+        profile = RequestProfile.for_current_context("http", f"{request.method} {request.path}")
+        request._profile = profile
+        sampler.add(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            sampler.remove(profile)
+        return self._finish(response, await sync_to_async(_save, thread_sensitive=False)(profile))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI this runs in the request's own thread-sensitive thread, the one its sync view
+        # and sync_to_async calls will use, so that thread is sampled alongside the task.
+        profile = getattr(request, "_profile", None)
+        if profile is not None and profile.owns_sync_thread:
+            profile.thread_id = threading.get_ident()
+        return None
+
+    @staticmethod
+    def _requested(request) -> bool:
+        return bool(request.headers.get(settings.PROFILING_HEADER))
+
+    @staticmethod
+    def _finish(response, name):
+        if name:
+            response["X-Profile-Id"] = name
+        return response
+
+
+class ChannelsProfilingMiddleware:
+    """
+    Channels counterpart of ProfilingMiddleware: profiles a sampled share of WebSocket connections,
+    and those a staff user opens with the PROFILING_HEADER header, for at most PROFILING_MAX_SECONDS
+    each. Wrap it inside AuthMiddlewareStack so scope["user"] is set.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        if not settings.PROFILING_ENABLED or not self._wanted(scope):
+            return await self.inner(scope, receive, send)
+
+        profile = RequestProfile.for_current_context(scope["type"], scope.get("path", ""))
+        sampler.add(profile)
+        try:
+            return await self.inner(scope, receive, send)
+        finally:
+            sampler.remove(profile)
+            await sync_to_async(_save, thread_sensitive=False)(profile)
+
+    @staticmethod
+    def _wanted(scope) -> bool:
+        if _sampled():
+            return True
+        header = settings.PROFILING_HEADER.lower().encode("latin1")
+        if not dict(scope.get("headers", [])).get(header):
+            return False
+        user = scope.get("user")
+        return bool(user is not None and user.is_staff)
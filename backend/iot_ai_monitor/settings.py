@@ -1,5 +1,5 @@
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
 
 # ==============================================================================
@@ -46,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'iot_ai_monitor.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -107,19 +108,63 @@ REST_FRAMEWORK = {
 
 API_KEY_CUSTOM_HEADER = "HTTP_X_API_KEY"
 API_KEY_MODEL = "authentication.UserAPIKey"
+# The ids of verified API keys are cached for this many seconds so frequent device requests
+# skip the key hasher; the key itself is still loaded on each request. 0 disables the cache.
+# The alias must be shared by all processes so a changed key is dropped everywhere; a
+# process-local (LocMemCache) alias turns the cache off.
+API_KEY_CACHE_ALIAS = 'shared'
+API_KEY_CACHE_TTL = config('API_KEY_CACHE_TTL', default=60, cast=int)
 
 # ==============================================================================
 # 6. REAL-TIME (CHANNELS)
 # ==============================================================================
+REDIS_HOST = config('REDIS_HOST', default='127.0.0.1')
+REDIS_PORT = config('REDIS_PORT', default=6379, cast=int)
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
-            "hosts": [(config('REDIS_HOST', default='127.0.0.1'), config('REDIS_PORT', default=6379, cast=int))],
+            "hosts": [(REDIS_HOST, REDIS_PORT)],
         },
     },
 }
 
+# Device log lines are kept per user in a capped Redis stream and replayed to dashboards on connect.
+DEVICE_LOG_HISTORY_ENABLED = config('DEVICE_LOG_HISTORY_ENABLED', default=True, cast=bool)
+DEVICE_LOG_REDIS_URL = config('DEVICE_LOG_REDIS_URL', default=f"redis://{REDIS_HOST}:{REDIS_PORT}/0")
+DEVICE_LOG_MAX_ENTRIES = config('DEVICE_LOG_MAX_ENTRIES', default=1000, cast=int)
+DEVICE_LOG_MAX_AGE_SECONDS = config('DEVICE_LOG_MAX_AGE_SECONDS', default=7 * 24 * 3600, cast=int)
+DEVICE_LOG_REPLAY_COUNT = config('DEVICE_LOG_REPLAY_COUNT', default=100, cast=int)
+# Each dashboard socket receives log lines in one frame per interval and queues at most
+# LOG_SOCKET_MAX_PENDING of them; older lines are skipped when a client falls behind.
+LOG_SOCKET_FLUSH_INTERVAL_MS = config('LOG_SOCKET_FLUSH_INTERVAL_MS', default=250, cast=int)
+LOG_SOCKET_MAX_PENDING = config('LOG_SOCKET_MAX_PENDING', default=500, cast=int)
+LOG_SOCKET_MAX_BATCH = config('LOG_SOCKET_MAX_BATCH', default=200, cast=int)
+
+# Results of repeated image pairs are cached in the "analysis" alias. Use
+# django.core.cache.backends.redis.RedisCache with a redis:// LOCATION to share it
+# between processes; size-based eviction then follows Redis' maxmemory policy.
+ANALYSIS_CACHE_BACKEND = config('ANALYSIS_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+ANALYSIS_CACHE = {
+    'BACKEND': ANALYSIS_CACHE_BACKEND,
+    'LOCATION': config('ANALYSIS_CACHE_LOCATION', default='analysis-results'),
+    'TIMEOUT': config('ANALYSIS_CACHE_TTL', default=7 * 24 * 3600, cast=int),
+}
+if ANALYSIS_CACHE_BACKEND.endswith('LocMemCache'):
+    ANALYSIS_CACHE['OPTIONS'] = {'MAX_ENTRIES': config('ANALYSIS_CACHE_MAX_ENTRIES', default=5000, cast=int)}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "analysis": ANALYSIS_CACHE,
+    # State every server process must agree on, such as verified API keys.
+    "shared": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config('SHARED_CACHE_LOCATION', default=f"redis://{REDIS_HOST}:{REDIS_PORT}/2"),
+    },
+}
+
 # ==============================================================================
 # 7. INTERNATIONALIZATION & STATIC/MEDIA FILES
 # ==============================================================================
@@ -132,6 +177,23 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Store analysis images once per SHA-256 so repeated frames share a single file.
+CONTENT_ADDRESSED_MEDIA = config('CONTENT_ADDRESSED_MEDIA', default=True, cast=bool)
+# How protected images are sent after the ownership check: 'django' streams the file itself,
+# 'x-accel-redirect' (nginx) and 'x-sendfile' (Apache/lighttpd) hand the transfer to the web server.
+PROTECTED_MEDIA_SERVE_MODE = config('PROTECTED_MEDIA_SERVE_MODE', default='django')
+# Internal nginx location that aliases MEDIA_ROOT, used with 'x-accel-redirect'.
+PROTECTED_MEDIA_INTERNAL_URL = config('PROTECTED_MEDIA_INTERNAL_URL', default='/protected-media/')
+PROTECTED_MEDIA_MAX_AGE = config('PROTECTED_MEDIA_MAX_AGE', default=86400, cast=int)
+# Thumbnails are rendered on demand into MEDIA_ROOT/THUMBNAIL_DIR and evicted least recently used first.
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_SIZES = config('THUMBNAIL_SIZES', default='160,320,640', cast=Csv(int))
+THUMBNAIL_CACHE_MAX_BYTES = config('THUMBNAIL_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+THUMBNAIL_WORKERS = config('THUMBNAIL_WORKERS', default=2, cast=int)
+THUMBNAIL_MAX_AGE = config('THUMBNAIL_MAX_AGE', default=30 * 86400, cast=int)
+# Hit/miss counters live in the shared Redis cache so every server process and the
+# thumbnail_cache management command see the same totals.
+THUMBNAIL_STATS_CACHE_ALIAS = 'shared'
 
 # ==============================================================================
 # 8. THIRD-PARTY PACKAGES CONFIGURATION
@@ -175,3 +237,75 @@ LOGGING = {
         'level': 'INFO',
     },
 }
+
+# ==============================================================================
+# 10. ANALYSIS PIPELINE
+# ==============================================================================
+# When enabled, analysis requests return 202 with a queued log instead of 201 with the result,
+# and the LLM call runs on a bounded pool of background workers. Results are pushed to the
+# user's log WebSocket. Off by default because it changes the response clients get.
+ANALYSIS_ASYNC_ENABLED = config('ANALYSIS_ASYNC_ENABLED', default=False, cast=bool)
+ANALYSIS_WORKERS = config('ANALYSIS_WORKERS', default=4, cast=int)
+ANALYSIS_QUEUE_SIZE = config('ANALYSIS_QUEUE_SIZE', default=100, cast=int)
+# Queued or running analyses older than this are failed as lost to a restart.
+ANALYSIS_STALE_SECONDS = config('ANALYSIS_STALE_SECONDS', default=900, cast=int)
+# Batch uploads: maximum pairs per request and concurrent LLM calls per user.
+ANALYSIS_BATCH_MAX_PAIRS = config('ANALYSIS_BATCH_MAX_PAIRS', default=50, cast=int)
+# Uncompressed bytes of the images a batch archive may hold; larger archives are rejected while reading.
+ANALYSIS_BATCH_MAX_BYTES = config('ANALYSIS_BATCH_MAX_BYTES', default=200 * 1024 * 1024, cast=int)
+ANALYSIS_CONCURRENCY_PER_USER = config('ANALYSIS_CONCURRENCY_PER_USER', default=4, cast=int)
+ANALYSIS_CACHE_ALIAS = 'analysis'
+ANALYSIS_CACHE_ENABLED = config('ANALYSIS_CACHE_ENABLED', default=True, cast=bool)
+# Also match near-identical pairs by a 64-bit perceptual hash of each frame.
+ANALYSIS_CACHE_PERCEPTUAL = config('ANALYSIS_CACHE_PERCEPTUAL', default=False, cast=bool)
+# Threads used to resize/re-encode images before they are sent to the LLM.
+IMAGE_PREPROCESS_WORKERS = config('IMAGE_PREPROCESS_WORKERS', default=2, cast=int)
+# Margin added around the changed area in the crops/composite payload modes, as a fraction of the frame.
+ANALYSIS_CROP_PADDING = config('ANALYSIS_CROP_PADDING', default=0.1, cast=float)
+
+# Resumable uploads: chunks are written under MEDIA_ROOT/UPLOAD_SESSION_DIR and moved into
+# image storage on commit. Unfinished sessions expire after UPLOAD_SESSION_TTL seconds.
+UPLOAD_SESSION_DIR = 'uploads'
+UPLOAD_SESSION_TTL = config('UPLOAD_SESSION_TTL', default=3600, cast=int)
+UPLOAD_SESSIONS_PER_KEY = config('UPLOAD_SESSIONS_PER_KEY', default=4, cast=int)
+UPLOAD_MAX_IMAGE_BYTES = config('UPLOAD_MAX_IMAGE_BYTES', default=10 * 1024 * 1024, cast=int)
+# Seconds a chunk request may take before another request for the same session can take over.
+UPLOAD_CHUNK_CLAIM_SECONDS = config('UPLOAD_CHUNK_CLAIM_SECONDS', default=120, cast=int)
+
+# Adaptive capture scheduling: how much recent history is considered, the bounds of the
+# recommended interval, and the difference score that counts as a change when the device
+# has no change threshold of its own.
+CAPTURE_SCHEDULE_HISTORY = config('CAPTURE_SCHEDULE_HISTORY', default=20, cast=int)
+CAPTURE_SCHEDULE_WINDOW_HOURS = config('CAPTURE_SCHEDULE_WINDOW_HOURS', default=24, cast=int)
+CAPTURE_SCHEDULE_MIN_INTERVAL = config('CAPTURE_SCHEDULE_MIN_INTERVAL', default=15, cast=int)
+CAPTURE_SCHEDULE_MAX_INTERVAL = config('CAPTURE_SCHEDULE_MAX_INTERVAL', default=3600, cast=int)
+CAPTURE_SCHEDULE_CHANGE_SCORE = config('CAPTURE_SCHEDULE_CHANGE_SCORE', default=0.05, cast=float)
+
+# Device log ingestion: batch limits and a per-API-key token bucket (lines/second, burst size).
+LOG_BATCH_MAX_MESSAGES = config('LOG_BATCH_MAX_MESSAGES', default=50, cast=int)
+LOG_MESSAGE_MAX_LENGTH = config('LOG_MESSAGE_MAX_LENGTH', default=1000, cast=int)
+LOG_RATE_PER_SECOND = config('LOG_RATE_PER_SECOND', default=5.0, cast=float)
+LOG_RATE_BURST = config('LOG_RATE_BURST', default=30, cast=int)
+# Shared by all processes so the budget is per key, not per key and process.
+LOG_RATE_LIMIT_CACHE_ALIAS = 'shared'
+
+# ==============================================================================
+# 11. OBSERVABILITY
+# ==============================================================================
+# Per-process metrics served at /metrics in the Prometheus text format. Scrapers send
+# "Authorization: Bearer <METRICS_TOKEN>"; without a token only staff sessions may read them.
+# With several server processes behind one port, give each process its own port as well and
+# scrape every one of them (see the README); one scrape of the shared port sees one process.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Request profiling: a PROFILING_SAMPLE_RATE share of requests and sockets, plus those a staff
+# user sends with the PROFILING_HEADER header, are stack-sampled every PROFILING_INTERVAL_MS.
+# The collapsed-stack files are kept in PROFILING_DIR, newest PROFILING_MAX_FILES only.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_HEADER = config('PROFILING_HEADER', default='X-Profile')
+PROFILING_INTERVAL_MS = config('PROFILING_INTERVAL_MS', default=5, cast=int)
+PROFILING_MAX_SECONDS = config('PROFILING_MAX_SECONDS', default=120, cast=int)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILING_MAX_FILES = config('PROFILING_MAX_FILES', default=200, cast=int)
@@ -5,7 +5,7 @@ from django.conf.urls.static import static
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from vision.views import DashboardView
+from vision.views import DashboardView, MetricsView
 from authentication.views import LoginTemplateView, RegisterTemplateView, UserGuideTemplateView
 
 urlpatterns = [
@@ -22,6 +22,8 @@ urlpatterns = [
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
 
 if settings.DEBUG:
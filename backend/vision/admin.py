@@ -1,13 +1,22 @@
 from django.contrib import admin
-from .models import ChangeDetectionLog, DeviceConfiguration
+from .models import ChangeDetectionLog, DeviceConfiguration, UploadSession
 
 
 @admin.register(ChangeDetectionLog)
 class ChangeDetectionLogAdmin(admin.ModelAdmin):
-    list_display = ('id', 'model_used', 'created_at', 'description')
-    readonly_fields = ('image1', 'image2', 'description', 'created_at', 'model_used')
+    list_display = ('id', 'model_used', 'status', 'difference_score', 'created_at', 'description')
+    readonly_fields = ('image1', 'image2', 'description', 'created_at', 'model_used', 'status',
+                       'difference_score', 'changed_area_percent', 'change_regions', 'payload_mode',
+                       'payload_bytes', 'llm_latency_ms')
 
 
 @admin.register(DeviceConfiguration)
 class DeviceConfigurationAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'default_model', 'delay_seconds', 'flash_enabled', 'updated_at')
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'api_key', 'image1_received', 'image1_size', 'image2_received', 'image2_size', 'created_at')
+    readonly_fields = ('user', 'api_key', 'image1_size', 'image2_size', 'image1_received', 'image2_received',
+                       'created_at', 'updated_at')
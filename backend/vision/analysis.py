@@ -0,0 +1,317 @@
+import logging
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from iot_ai_monitor.metrics import analyses_in_flight, timed, timer
+from .caching import result_cache
+from .diffing import changed_bounds, compute_difference
+from .enums import AnalysisStatus, PayloadMode
+from .models import ChangeDetectionLog, DeviceConfiguration
+from .preprocessing import compose_pair, crop_pair, prepare_pair
+from .services import arequest_change_description, request_change_description, LLMServiceError
+
+logger = logging.getLogger(__name__)
+
+NO_CHANGE_DESCRIPTION = "No significant change detected."
+UNEXPECTED_ERROR_DESCRIPTION = "Unexpected error while analyzing the images."
+CROPS_NOTE = ("Both images are crops of the same part of the camera view, where a local difference "
+              "check found changes; the first is earlier and the second later.")
+COMPOSITE_NOTE = ("The image shows two frames side by side, separated by a white bar: the earlier frame "
+                  "on the left and the later one on the right.")
+
+
+@dataclass
+class AnalysisOptions:
+    """Per-request analysis settings, resolved from the device configuration and request overrides."""
+    prompt_context: str = ""
+    change_threshold: float = 0.0
+    preprocess_enabled: bool = False
+    preprocess_max_edge: int = 1024
+    preprocess_quality: int = 85
+    preprocess_grayscale: bool = False
+    payload_mode: str = PayloadMode.FULL
+
+    @classmethod
+    def from_config(cls, config: DeviceConfiguration, prompt_context: str = None):
+        return cls(
+            prompt_context=prompt_context or config.prompt_context,
+            change_threshold=config.change_threshold,
+            preprocess_enabled=config.preprocess_enabled,
+            preprocess_max_edge=config.preprocess_max_edge,
+            preprocess_quality=config.preprocess_quality,
+            preprocess_grayscale=config.preprocess_grayscale,
+            payload_mode=config.payload_mode,
+        )
+
+    def cache_variant(self) -> str:
+        """Describes how the images are transformed before the LLM sees them, for the result cache key."""
+        encoding = f"{self.preprocess_max_edge}:{self.preprocess_quality}:{int(self.preprocess_grayscale)}"
+        if self.payload_mode != PayloadMode.FULL:
+            # Crops and composites are always re-encoded, and their framing depends on the padding.
+            return f"{self.payload_mode}:{encoding}:{settings.ANALYSIS_CROP_PADDING}"
+        if not self.preprocess_enabled:
+            return "original"
+        return f"preprocessed:{encoding}"
+
+
+RESULT_FIELDS = ['description', 'status', 'payload_mode', 'payload_bytes', 'llm_latency_ms']
+DIFFERENCE_FIELDS = ['difference_score', 'changed_area_percent', 'change_regions']
+
+
+@dataclass
+class LLMImages:
+    """The images and layout note sent to the LLM, and the payload mode they were built for."""
+    image1: object
+    image2: object
+    image_note: str = ""
+    payload_mode: str = PayloadMode.FULL
+
+
+def run_analysis(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1=None,
+                 image2=None) -> ChangeDetectionLog:
+    """
+    Runs the analysis for an already saved log and stores the outcome on it.
+    Used inline by the synchronous API path and by the background job workers.
+    The synchronous path passes the uploaded files so the just-saved images are not read back.
+    """
+    log_instance.status = AnalysisStatus.RUNNING
+    log_instance.save(update_fields=['status'])
+
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(analyses_in_flight.track())
+            if image1 is None or image2 is None:
+                try:
+                    image1 = stack.enter_context(log_instance.image1.open("rb"))
+                    image2 = stack.enter_context(log_instance.image2.open("rb"))
+                except OSError:
+                    record_crash(log_instance, "Could not read saved image files after upload.")
+                    raise
+
+            update_fields = prefilter_changes(log_instance, options, image1, image2)
+            if log_instance.status != AnalysisStatus.DONE:
+                describe_changes(log_instance, options, image1, image2)
+
+        with timer("db_write"):
+            log_instance.save(update_fields=update_fields)
+    except Exception:
+        if log_instance.status != AnalysisStatus.FAILED:
+            record_crash(log_instance)
+        raise
+    return log_instance
+
+
+async def arun_analysis(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1,
+                        image2) -> ChangeDetectionLog:
+    """
+    Awaitable variant of run_analysis for async views, given the uploaded files. The same steps
+    run on worker threads; only the database writes and the LLM call are awaited directly, so the
+    event loop only holds a coroutine while the request is in flight.
+    """
+    log_instance.status = AnalysisStatus.RUNNING
+    await log_instance.asave(update_fields=['status'])
+
+    try:
+        with analyses_in_flight.track():
+            update_fields = await sync_to_async(prefilter_changes, thread_sensitive=False)(
+                log_instance, options, image1, image2
+            )
+            if log_instance.status != AnalysisStatus.DONE:
+                await adescribe_changes(log_instance, options, image1, image2)
+
+        with timer("db_write"):
+            await log_instance.asave(update_fields=update_fields)
+    except Exception:
+        if log_instance.status != AnalysisStatus.FAILED:
+            await sync_to_async(record_crash, thread_sensitive=False)(log_instance)
+        raise
+    return log_instance
+
+
+def describe_changes(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1, image2):
+    """Fills in the description from the result cache, or from the LLM on a cache miss."""
+    cache_keys = lookup_cached_description(log_instance, options, image1, image2)
+    if log_instance.status == AnalysisStatus.DONE:
+        return
+
+    started = time.monotonic()
+    images = prepare_llm_images(log_instance, options, image1, image2)
+    try:
+        reply = request_change_description(
+            images.image1, images.image2, log_instance.model_used, options.prompt_context, images.image_note
+        )
+    except LLMServiceError as e:
+        record_failure(log_instance, e)
+        return
+    record_reply(log_instance, reply, images.payload_mode, started)
+
+    if cache_keys:
+        result_cache.set(cache_keys, log_instance.description)
+
+
+async def adescribe_changes(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1, image2):
+    """Awaitable variant of describe_changes; the LLM call uses the async client."""
+    cache_keys = await sync_to_async(lookup_cached_description, thread_sensitive=False)(
+        log_instance, options, image1, image2
+    )
+    if log_instance.status == AnalysisStatus.DONE:
+        return
+
+    started = time.monotonic()
+    images = await sync_to_async(prepare_llm_images, thread_sensitive=False)(log_instance, options, image1, image2)
+    try:
+        reply = await arequest_change_description(
+            images.image1, images.image2, log_instance.model_used, options.prompt_context, images.image_note
+        )
+    except LLMServiceError as e:
+        record_failure(log_instance, e)
+        return
+    record_reply(log_instance, reply, images.payload_mode, started)
+
+    if cache_keys:
+        await sync_to_async(result_cache.set, thread_sensitive=False)(cache_keys, log_instance.description)
+
+
+def prefilter_changes(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1, image2) -> list:
+    """Runs the change pre-filter and returns the log fields the analysis has to save."""
+    if apply_change_prefilter(log_instance, options, image1, image2):
+        return RESULT_FIELDS + DIFFERENCE_FIELDS
+    return list(RESULT_FIELDS)
+
+
+def lookup_cached_description(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1, image2) -> list:
+    """
+    Completes the log from the result cache when the pair was described before. Returns the keys
+    a new description should be cached under, or an empty list when the cache is off.
+    """
+    if not result_cache.enabled:
+        return []
+    with timer("cache_lookup"):
+        cache_keys = result_cache.make_keys(
+            image1, image2, log_instance.model_used, options.prompt_context, options.cache_variant()
+        )
+        cached_description = result_cache.get(cache_keys)
+    if cached_description is not None:
+        log_instance.description = cached_description
+        log_instance.status = AnalysisStatus.DONE
+    return cache_keys
+
+
+def prepare_llm_images(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1, image2) -> LLMImages:
+    """Builds what is sent to the LLM: region crops or a composite, preprocessed frames or the originals."""
+    if options.payload_mode != PayloadMode.FULL:
+        region_payload = build_region_payload(log_instance, options, image1, image2)
+        if region_payload is not None:
+            return LLMImages(*region_payload, payload_mode=options.payload_mode)
+    if options.preprocess_enabled:
+        image1, image2 = preprocess_images(log_instance, options, image1, image2)
+    return LLMImages(image1, image2)
+
+
+def record_failure(log_instance: ChangeDetectionLog, error: LLMServiceError):
+    log_instance.description = str(error)
+    log_instance.status = AnalysisStatus.FAILED
+
+
+def record_crash(log_instance: ChangeDetectionLog, description: str = UNEXPECTED_ERROR_DESCRIPTION):
+    """Marks an analysis that raised as failed, so the log does not stay RUNNING."""
+    log_instance.description = description
+    log_instance.status = AnalysisStatus.FAILED
+    try:
+        log_instance.save(update_fields=['description', 'status'])
+    except Exception:
+        logger.exception(f"Could not mark log {log_instance.id} as failed.")
+
+
+def record_reply(log_instance: ChangeDetectionLog, reply, payload_mode: str, started: float):
+    """Stores the LLM description with the payload mode, request size and end-to-end latency."""
+    log_instance.description = reply.text
+    log_instance.status = AnalysisStatus.DONE
+    log_instance.payload_mode = payload_mode
+    log_instance.payload_bytes = reply.payload_bytes
+    log_instance.llm_latency_ms = round((time.monotonic() - started) * 1000)
+
+
+@timed("image_prepare")
+def build_region_payload(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1, image2):
+    """
+    Builds the images for the crops or composite payload modes from the change regions found
+    by the pre-filter. Returns (image1, image2, image_note), with image2 None for a composite,
+    or None when the full frames should be sent instead.
+    """
+    bounds = changed_bounds(log_instance.change_regions, settings.ANALYSIS_CROP_PADDING)
+    if options.payload_mode == PayloadMode.CROPS and bounds is None:
+        return None
+    try:
+        if options.payload_mode == PayloadMode.CROPS:
+            return (*crop_pair(image1, image2, bounds, max_edge=options.preprocess_max_edge,
+                               quality=options.preprocess_quality, grayscale=options.preprocess_grayscale),
+                    CROPS_NOTE)
+        composite = compose_pair(image1, image2, bounds, max_edge=options.preprocess_max_edge,
+                                 quality=options.preprocess_quality, grayscale=options.preprocess_grayscale)
+        return composite, None, COMPOSITE_NOTE
+    except (OSError, ValueError) as e:
+        logger.warning(f"Sending full frames for log {log_instance.id}, building the {options.payload_mode} "
+                       f"payload failed: {e}")
+        return None
+
+
+@timed("image_prepare")
+def preprocess_images(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1, image2):
+    """Returns normalized copies of the pair for the LLM, or the originals if they cannot be decoded."""
+    try:
+        return prepare_pair(
+            image1, image2,
+            max_edge=options.preprocess_max_edge,
+            quality=options.preprocess_quality,
+            grayscale=options.preprocess_grayscale,
+        )
+    except (OSError, ValueError) as e:
+        logger.warning(f"Sending original images for log {log_instance.id}, preprocessing failed: {e}")
+        return image1, image2
+
+
+@timed("change_prefilter")
+def apply_change_prefilter(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1, image2) -> bool:
+    """
+    Scores the pair locally and records the result on the log. When the score is below the
+    device threshold the log is completed as unchanged so the LLM call can be skipped.
+    Returns False when the images could not be decoded for comparison.
+    """
+    try:
+        difference = compute_difference(image1, image2)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Skipping change pre-filter for log {log_instance.id}: {e}")
+        return False
+
+    log_instance.difference_score = difference.score
+    log_instance.changed_area_percent = difference.changed_area_percent
+    log_instance.change_regions = difference.regions
+    if difference.score < options.change_threshold:
+        log_instance.description = NO_CHANGE_DESCRIPTION
+        log_instance.status = AnalysisStatus.DONE
+    return True
+
+
+def notify_analysis_result(log_instance: ChangeDetectionLog):
+    """
+    Pushes the outcome of an analysis to the owner's log group so open dashboards update live.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    group_name = f"user_{log_instance.user_id}_logs"
+    payload = {
+        "type": "analysis.result",
+        "log_id": str(log_instance.id),
+        "status": log_instance.status,
+        "description": log_instance.description,
+    }
+    try:
+        async_to_sync(channel_layer.group_send)(group_name, payload)
+    except Exception as e:
+        logger.warning(f"Could not publish analysis result for log {log_instance.id}: {e}")
@@ -0,0 +1,115 @@
+"""
+Async-native device endpoints for ASGI deployments (Daphne). They mirror LogReceiverView and
+the analysis create endpoint, but await the channel layer and the LLM instead of blocking a
+worker thread, so one process can hold many slow analyses open at once.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import ValidationError
+
+from authentication.authentication import verify_api_key
+from authentication.models import UserAPIKey
+from iot_ai_monitor.metrics import timed, timer
+from .analysis import AnalysisOptions, arun_analysis
+from .device_logs import admit_log_entries, log_rate_limiter, parse_log_entries
+from .enums import AnalysisStatus
+from .log_store import device_log_store
+from .models import ChangeDetectionLog
+from .scheduling import recommend_schedule
+from .serializers import AnalysisRequestSerializer, ChangeDetectionLogSerializer
+
+logger = logging.getLogger(__name__)
+
+
+async def authenticate_device(request):
+    """Returns (api_key, None) for a valid X-Api-Key header, or (None, error response)."""
+    raw_key = request.headers.get("X-Api-Key")
+    if not raw_key:
+        return None, JsonResponse({"detail": "Authentication credentials were not provided."}, status=403)
+    try:
+        return await sync_to_async(verify_api_key, thread_sensitive=False)(raw_key), None
+    except UserAPIKey.DoesNotExist:
+        return None, JsonResponse({"detail": "Invalid API Key provided."}, status=403)
+
+
+@csrf_exempt
+@require_POST
+async def log_receiver(request):
+    api_key, error = await authenticate_device(request)
+    if error:
+        return error
+
+    try:
+        entries, is_batch = parse_log_entries(json.loads(request.body or b"{}"))
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "Request body must be a JSON object."}, status=400)
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=400)
+
+    batch = await sync_to_async(admit_log_entries, thread_sensitive=False)(entries, is_batch, api_key.prefix)
+    if batch.event is None:
+        response = JsonResponse({"error": "Log rate limit exceeded.", "accepted": 0, "dropped": batch.dropped},
+                                status=429)
+        response.headers["Retry-After"] = str(log_rate_limiter.retry_after())
+        return response
+
+    with timer("log_group_send"):
+        await get_channel_layer().group_send(f"user_{api_key.user_id}_logs", batch.event)
+    device_log_store.append(api_key.user_id, batch.event)
+
+    if batch.is_batch:
+        return JsonResponse({"accepted": batch.accepted, "dropped": batch.dropped})
+    return HttpResponse(status=204)
+
+
+@timed("upload_parse")
+def _validate_analysis_request(request, api_key):
+    serializer = AnalysisRequestSerializer(data={**request.POST.dict(), **request.FILES.dict()})
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data, api_key.config
+
+
+@csrf_exempt
+@require_POST
+async def analyze(request):
+    """
+    Same contract as POST /api/vision/logs/, except the analysis always completes within the
+    request (201) while the coroutine awaits the LLM.
+    """
+    api_key, error = await authenticate_device(request)
+    if error:
+        return error
+
+    try:
+        validated_data, config = await sync_to_async(_validate_analysis_request, thread_sensitive=False)(
+            request, api_key
+        )
+    except ValidationError as e:
+        return JsonResponse(e.detail, status=400)
+
+    options = AnalysisOptions.from_config(config, validated_data.get("prompt_context"))
+    with timer("db_write"):
+        log_instance = await ChangeDetectionLog.objects.acreate(
+            user=api_key.user,
+            api_key=api_key,
+            image1=validated_data['image1'],
+            image2=validated_data['image2'],
+            model_used=validated_data.get("model") or config.default_model,
+            status=AnalysisStatus.QUEUED,
+        )
+
+    try:
+        await arun_analysis(log_instance, options, validated_data['image1'], validated_data['image2'])
+    except OSError:
+        return JsonResponse({"error": "Could not read saved image files after upload."}, status=500)
+
+    output_serializer = ChangeDetectionLogSerializer(log_instance, context={'request': request})
+    data = output_serializer.data
+    data["schedule"] = (await sync_to_async(recommend_schedule, thread_sensitive=False)(config)).as_dict()
+    return JsonResponse(data, status=201)
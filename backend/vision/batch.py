@@ -0,0 +1,204 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+import tarfile
+import threading
+import weakref
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.db import close_old_connections
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import FileUploadParser
+from rest_framework.renderers import BaseRenderer
+
+from .analysis import run_analysis
+
+logger = logging.getLogger(__name__)
+
+FIELD_RE = re.compile(r"^(image[12])_(\w+)$")
+MEMBER_RE = re.compile(r"^(?:.*/)?(?P<pair>[^/]+)/(?P<field>image[12])\.\w+$")
+# Room for the two images and the directory of each pair, plus stray files such as __MACOSX entries.
+MEMBERS_PER_PAIR = 6
+ARCHIVE_ERRORS = (tarfile.TarError, zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError)
+
+# Entries disappear once no running analysis holds the user's semaphore.
+_user_semaphores = weakref.WeakValueDictionary()
+_user_semaphores_lock = threading.Lock()
+
+
+class ArchiveUploadParser(FileUploadParser):
+    """Accepts a raw tar or zip body; the archive format is detected from its content."""
+    media_type = "application/*"
+
+    def get_filename(self, stream, media_type, parser_context):
+        return super().get_filename(stream, media_type, parser_context) or "batch-archive"
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets clients ask for newline-delimited JSON; the view streams the body itself."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return "".join(f"{json.dumps(item, cls=DjangoJSONEncoder)}\n" for item in data).encode()
+
+
+@contextmanager
+def user_analysis_slot(user_id):
+    """Limits how many analyses of one user run at the same time across batch requests."""
+    with _user_semaphores_lock:
+        semaphore = _user_semaphores.get(user_id)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(settings.ANALYSIS_CONCURRENCY_PER_USER)
+            _user_semaphores[user_id] = semaphore
+    with semaphore:
+        yield
+
+
+def collect_pairs(data) -> list:
+    """
+    Groups the uploaded files of a batch request into image pairs, ordered by pair key.
+    Pairs are sent as image1_<key>/image2_<key> multipart fields, or as an `archive`
+    (tar or zip) whose members are named <key>/image1.jpg and <key>/image2.jpg. An archive
+    is read only until it exceeds the pair, member or byte limits of a batch.
+    """
+    pairs = {}
+    archive = data.get("archive") or data.get("file")
+    if archive is not None:
+        for key, field, uploaded in _iter_archive(archive):
+            pairs.setdefault(key, {})[field] = uploaded
+            _check_pair_count(pairs)
+    for name in data:
+        match = FIELD_RE.match(name)
+        if match:
+            pairs.setdefault(match.group(2), {})[match.group(1)] = data[name]
+
+    if not pairs:
+        raise ValidationError({"detail": "No image pairs were provided."})
+    _check_pair_count(pairs)
+    return [{"key": key, **pairs[key]} for key in sorted(pairs, key=_natural_key)]
+
+
+def _natural_key(key: str):
+    return (0, int(key), "") if key.isdigit() else (1, 0, key)
+
+
+def _check_pair_count(pairs: dict):
+    if len(pairs) > settings.ANALYSIS_BATCH_MAX_PAIRS:
+        raise ValidationError({"detail": f"A batch may contain at most {settings.ANALYSIS_BATCH_MAX_PAIRS} pairs."})
+
+
+def _iter_archive(archive):
+    """
+    Yields (pair key, field, file) for the image members of a tar or zip archive. Stops with a
+    ValidationError once the archive has more members, or its images more uncompressed bytes,
+    than a batch may hold, before the member over the limit is extracted.
+    """
+    max_members = MEMBERS_PER_PAIR * settings.ANALYSIS_BATCH_MAX_PAIRS
+    budget = settings.ANALYSIS_BATCH_MAX_BYTES
+    try:
+        for count, (name, size, open_member) in enumerate(_archive_members(archive), start=1):
+            if count > max_members:
+                raise ValidationError({"archive": f"The archive may contain at most {max_members} entries."})
+            match = MEMBER_RE.match(name)
+            if match is None or open_member is None:
+                continue
+            budget -= size
+            if budget < 0:
+                raise ValidationError({
+                    "archive": f"The images in the archive may total at most {settings.ANALYSIS_BATCH_MAX_BYTES} bytes."
+                })
+            with open_member() as member:
+                yield match["pair"], match["field"], _spool(name, member, size)
+    except ARCHIVE_ERRORS:
+        raise ValidationError({"archive": "The archive must be a valid tar or zip file."})
+
+
+def _archive_members(archive):
+    """
+    Yields (name, uncompressed size, open) for each entry of a tar or zip archive; open is None
+    for directories and other entries that are not regular files. Reading a member never returns
+    more than its size, so the sizes can be budgeted before anything is extracted.
+    """
+    archive.seek(0)
+    if zipfile.is_zipfile(archive):
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.flag_bits & 0x1:
+                    raise zipfile.BadZipFile(f"{info.filename} is encrypted.")
+                yield info.filename, info.file_size, None if info.is_dir() else functools.partial(zf.open, info)
+        return
+
+    archive.seek(0)
+    with tarfile.open(fileobj=archive, mode="r|*") as tf:
+        for info in tf:
+            yield info.name, info.size, functools.partial(tf.extractfile, info) if info.isfile() else None
+
+
+def _spool(name: str, member, size: int):
+    """Copies an archive member into an uploaded-file object, on disk when it is large."""
+    filename = os.path.basename(name)
+    if size <= settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+        return SimpleUploadedFile(filename, member.read(), content_type="image/jpeg")
+    uploaded = TemporaryUploadedFile(filename, "image/jpeg", size, None)
+    for chunk in iter(lambda: member.read(64 * 1024), b""):
+        uploaded.write(chunk)
+    uploaded.seek(0)
+    return uploaded
+
+
+def run_batch(user_id, jobs: list):
+    """
+    Runs (log, options, image1, image2) jobs concurrently, bounded by the per-user cap,
+    and yields each analyzed log as soon as it finishes.
+    """
+    def analyze(job):
+        log_instance, options, image1, image2 = job
+        try:
+            with user_analysis_slot(user_id):
+                return run_analysis(log_instance, options, image1, image2)
+        except OSError:
+            return log_instance
+        finally:
+            close_old_connections()
+
+    workers = max(1, min(settings.ANALYSIS_CONCURRENCY_PER_USER, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-analysis") as executor:
+        futures = [executor.submit(analyze, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+async def iterate_in_thread(iterable):
+    """
+    Consumes a blocking iterable on a worker thread and yields its items as they are produced,
+    so an ASGI StreamingHttpResponse sends each one immediately instead of collecting them all.
+    If the consumer stops early, the thread still runs the iterable to the end.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        finally:
+            close_old_connections()
+            loop.call_soon_threadsafe(items.put_nowait, done)
+
+    producer = loop.run_in_executor(None, produce)
+    while (item := await items.get()) is not done:
+        yield item
+    # Re-raises an error from the iterable.
+    await producer
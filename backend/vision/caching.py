@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import threading
+
+import numpy as np
+from PIL import Image
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "analysis-result:v3"
+
+
+def file_sha256(fileobj, chunk_size: int = 64 * 1024) -> str:
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def difference_hash(fileobj) -> str:
+    """64-bit dHash: frames that look the same at 9x8 grayscale share a hash."""
+    fileobj.seek(0)
+    with Image.open(fileobj) as img:
+        img.draft("L", (64, 64))
+        pixels = np.asarray(img.convert("L").resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    fileobj.seek(0)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return f"{int(''.join('1' if bit else '0' for bit in bits), 2):016x}"
+
+
+def normalize_prompt(prompt_context: str) -> str:
+    return " ".join((prompt_context or "").split()).casefold()
+
+
+class AnalysisResultCache:
+    """
+    Caches LLM descriptions keyed by the content of the image pair, the model, the
+    normalized prompt context and the variant of the images sent (see
+    AnalysisOptions.cache_variant). The analysis timestamp the service adds to the prompt is
+    deliberately not part of the key. Entries expire by the cache alias TIMEOUT, and the
+    local-memory backend additionally evicts by MAX_ENTRIES.
+    """
+
+    def __init__(self, alias: str, enabled: bool = True, perceptual: bool = False):
+        self.alias = alias
+        self.enabled = enabled
+        self.perceptual = perceptual
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_keys(self, image1, image2, model_name: str, prompt_context: str, variant: str = "") -> list:
+        context = f"{model_name}|{variant}|{normalize_prompt(prompt_context)}"
+        keys = [self._key("sha256", file_sha256(image1), file_sha256(image2), context)]
+        if self.perceptual:
+            try:
+                keys.append(self._key("dhash", difference_hash(image1), difference_hash(image2), context))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not compute perceptual hashes: {e}")
+        return keys
+
+    @staticmethod
+    def _key(kind: str, hash1: str, hash2: str, context: str) -> str:
+        digest = hashlib.sha256(f"{hash1}|{hash2}|{context}".encode()).hexdigest()
+        return f"{KEY_PREFIX}:{kind}:{digest}"
+
+    def get(self, keys: list):
+        description = None
+        for key in keys:
+            description = self.cache.get(key)
+            if description is not None:
+                break
+        with self._lock:
+            if description is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return description
+
+    def set(self, keys: list, description: str):
+        self.cache.set_many({key: description for key in keys})
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "perceptual": self.perceptual,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+
+
+result_cache = AnalysisResultCache(
+    alias=settings.ANALYSIS_CACHE_ALIAS,
+    enabled=settings.ANALYSIS_CACHE_ENABLED,
+    perceptual=settings.ANALYSIS_CACHE_PERCEPTUAL,
+)
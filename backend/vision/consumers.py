@@ -1,15 +1,49 @@
+import asyncio
 import json
 import logging
+from collections import deque
+from urllib.parse import parse_qs
+
+import redis
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from iot_ai_monitor.metrics import timer, websocket_connections
+from .device_config import device_config_document, device_config_group, etag_matches
+from .log_store import device_log_store
+from .models import DeviceConfiguration
 
 logger = logging.getLogger(__name__)
 
 
 class LogConsumer(AsyncWebsocketConsumer):
+    """
+    Streams a user's device logs and analysis results to the dashboard.
+
+    Log lines are not sent one frame per event: they are filtered by the client's subscription,
+    collected in a bounded per-connection queue and flushed as one log_batch frame every
+    LOG_SOCKET_FLUSH_INTERVAL_MS. When more lines arrive between flushes than the queue holds,
+    the oldest are discarded and the next frame reports how many were skipped, so memory stays
+    bounded.
+
+    The queue only measures lines piling up inside this process. A completed send means the
+    frame was handed to the ASGI server, not that the client read it. A slow client is therefore
+    only limited by the server's own write buffering, and `skipped` does not measure network lag.
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(args, kwargs)
         self.group_name = None
         self.user = None
+        self.prefixes = None
+        self.levels = None
+        self.pending = deque(maxlen=settings.LOG_SOCKET_MAX_PENDING)
+        self.skipped = 0
+        self.frames_sent = 0
+        self.flush_task = None
+        self.accepted = False
 
     async def connect(self):
         self.user = self.scope["user"]
@@ -20,29 +54,229 @@ class LogConsumer(AsyncWebsocketConsumer):
         self.group_name = f'user_{self.user.id}_logs'
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
+        self.accepted = True
+        websocket_connections.inc(consumer="logs")
         logger.info(f"WebSocket connected for user: {self.user.username}")
+        await self.replay_history()
+        self.flush_task = asyncio.create_task(self.flush_pending())
+
+    async def replay_history(self):
+        """
+        Sends stored device log lines as one log_batch frame marked as a replay. Clients pass
+        ?since=<cursor> from a previous replay to receive only newer lines, or ?last=N.
+        """
+        if not device_log_store.enabled:
+            return
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        since = params.get("since", [None])[0]
+        try:
+            count = min(int(params.get("last", [settings.DEVICE_LOG_REPLAY_COUNT])[0]), device_log_store.max_entries)
+        except ValueError:
+            count = settings.DEVICE_LOG_REPLAY_COUNT
+        if since is None and count <= 0:
+            return
+
+        try:
+            entries, cursor = await sync_to_async(device_log_store.read, thread_sensitive=False)(
+                self.user.id, since=since, count=count if since is None else device_log_store.max_entries
+            )
+        except (redis.RedisError, ValueError) as e:
+            logger.warning(f"Could not replay device logs for user {self.user.username}: {e}")
+            return
+
+        await self.send(text_data=json.dumps({
+            'type': 'log_batch',
+            'replay': True,
+            'cursor': cursor,
+            'messages': [self.format_entry(entry['prefix'], entry) for entry in entries],
+        }))
 
     async def disconnect(self, close_code):
-        if hasattr(self, 'group_name'):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        if self.accepted:
+            websocket_connections.dec(consumer="logs")
+        if self.group_name is not None:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
         logger.info(f"WebSocket disconnected for user: {self.user.username}")
 
     async def receive(self, **kwargs):
         """
-        Receives messages from the WebSocket client.
-        Currently used to handle heartbeat pings.
+        Receives messages from the WebSocket client:
+        - {"type": "heartbeat"}
+        - {"type": "subscribe", "prefixes": [...], "levels": [...]}: only forward matching log
+          lines; an empty or missing list means no filter on that field. Anything other than a
+          list of strings is answered with an error frame and the old subscription is kept.
+        - {"type": "stats"}: replies with this connection's queue depth and skip counters.
         """
         try:
             data = json.loads(kwargs['text_data'])
-            if data.get('type') == 'heartbeat':
-                logger.debug(f"Heartbeat received from user: {self.user.username}")
         except json.JSONDecodeError:
             logger.warning(f"Received invalid JSON from user: {self.user.username}")
+            return
+
+        message_type = data.get('type')
+        if message_type == 'heartbeat':
+            logger.debug(f"Heartbeat received from user: {self.user.username}")
+        elif message_type == 'subscribe':
+            try:
+                prefixes = self.parse_filter(data, 'prefixes')
+                levels = self.parse_filter(data, 'levels')
+            except ValueError as e:
+                await self.send(text_data=json.dumps({'type': 'error', 'error': str(e)}))
+                return
+            self.prefixes, self.levels = prefixes, levels
+            await self.send(text_data=json.dumps({
+                'type': 'subscribed',
+                'prefixes': sorted(self.prefixes or []),
+                'levels': sorted(self.levels or []),
+            }))
+        elif message_type == 'stats':
+            await self.send(text_data=json.dumps({'type': 'stats', **self.queue_stats()}))
+
+    @staticmethod
+    def parse_filter(data: dict, field: str):
+        """Returns the set of values to match for a subscription field, or None for no filter."""
+        values = data.get(field)
+        if values is None:
+            return None
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise ValueError(f"'{field}' must be a list of strings.")
+        return set(values) or None
+
+    def queue_stats(self) -> dict:
+        return {
+            'queue_depth': len(self.pending),
+            'queue_capacity': self.pending.maxlen,
+            'skipped': self.skipped,
+            'frames_sent': self.frames_sent,
+        }
+
+    @staticmethod
+    def format_entry(prefix, entry) -> dict:
+        return {
+            'prefix': prefix,
+            'message': f"{prefix}: {entry['message']}",
+            'timestamp': entry.get('timestamp'),
+            'level': entry.get('level', 'info'),
+        }
+
+    def enqueue(self, prefix, entries):
+        if self.prefixes is not None and prefix not in self.prefixes:
+            return
+        for entry in entries:
+            if self.levels is not None and entry.get('level', 'info') not in self.levels:
+                continue
+            if len(self.pending) == self.pending.maxlen:
+                self.skipped += 1
+            self.pending.append(self.format_entry(prefix, entry))
+
+    async def flush_pending(self):
+        interval = settings.LOG_SOCKET_FLUSH_INTERVAL_MS / 1000
+        reported_skips = 0
+        while True:
+            await asyncio.sleep(interval)
+            if not self.pending and self.skipped == reported_skips:
+                continue
+            messages = [self.pending.popleft() for _ in range(min(len(self.pending), settings.LOG_SOCKET_MAX_BATCH))]
+            frame = {'type': 'log_batch', 'messages': messages}
+            if self.skipped != reported_skips:
+                frame['skipped'] = self.skipped - reported_skips
+                reported_skips = self.skipped
+            with timer("socket_send"):
+                await self.send(text_data=json.dumps(frame))
+            self.frames_sent += 1
 
     async def log_message(self, event):
-        message = event['message']
-        prefix = event['prefix']
+        self.enqueue(event['prefix'], [{'message': event['message']}])
 
-        await self.send(text_data=json.dumps({
-            'message': f"{prefix}: {message}"
-        }))
+    async def log_batch(self, event):
+        self.enqueue(event['prefix'], event['messages'])
+
+    async def analysis_result(self, event):
+        with timer("socket_send"):
+            await self.send(text_data=json.dumps({
+                'type': 'analysis',
+                'log_id': event['log_id'],
+                'status': event['status'],
+                'description': event['description'],
+            }))
+
+
+class DeviceConfigConsumer(AsyncWebsocketConsumer):
+    """
+    Keeps a device informed about its own configuration. The device authenticates with its
+    X-Api-Key header and gets the configuration document on connect, then again whenever it
+    is saved. A device that reconnects with the ETag it last received (If-None-Match header
+    or ?etag=) gets a short config_unchanged frame instead of the full document. The socket is
+    closed with code 4001 once the key is revoked, deleted or has expired.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.api_key = None
+        self.group_name = None
+        self.etag = None
+
+    async def connect(self):
+        self.api_key = self.scope.get("api_key")
+        if self.api_key is None:
+            await self.close()
+            return
+
+        self.group_name = device_config_group(self.api_key.prefix)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        websocket_connections.inc(consumer="device_config")
+        logger.info(f"Config socket connected for device: {self.api_key.prefix}")
+
+        headers = dict(self.scope.get("headers", []))
+        known_etag = (parse_qs(self.scope.get("query_string", b"").decode()).get("etag", [None])[0]
+                      or headers.get(b"if-none-match", b"").decode("latin1"))
+        await self.send_config(known_etag)
+
+    async def disconnect(self, close_code):
+        if self.group_name is not None:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            websocket_connections.dec(consumer="device_config")
+            logger.info(f"Config socket disconnected for device: {self.api_key.prefix}")
+
+    async def receive(self, **kwargs):
+        """
+        Receives messages from the device:
+        - {"type": "heartbeat"}
+        - {"type": "get", "etag": "..."}: sends the configuration unless the ETag is current.
+        """
+        try:
+            data = json.loads(kwargs.get('text_data') or "")
+        except json.JSONDecodeError:
+            logger.warning(f"Received invalid JSON from device: {self.api_key.prefix}")
+            return
+        if data.get('type') == 'get':
+            await self.send_config(data.get('etag'))
+
+    async def send_config(self, known_etag=None):
+        data, etag = await database_sync_to_async(self.load_document)()
+        await self.send_document(data, etag, known_etag)
+
+    def load_document(self):
+        return device_config_document(DeviceConfiguration.objects.get(api_key_id=self.api_key.pk))
+
+    async def send_document(self, data, etag, known_etag=None):
+        if etag_matches(known_etag, etag):
+            frame = {'type': 'config_unchanged', 'etag': etag}
+        else:
+            frame = {'type': 'config', 'etag': etag, 'config': data}
+        with timer("socket_send"):
+            await self.send(text_data=json.dumps(frame))
+        self.etag = etag
+
+    async def config_update(self, event):
+        if self.api_key.has_expired:
+            await self.close(code=4001)
+            return
+        await self.send_document(event['config'], event['etag'], self.etag)
+
+    async def config_revoked(self, event):
+        logger.info(f"Closing config socket of revoked device: {self.api_key.prefix}")
+        await self.close(code=4001)
@@ -0,0 +1,60 @@
+"""
+The configuration document a device reads from `/api/vision/device/config/` and receives over
+the `ws/device/config/` socket. Its ETag combines the configuration version with the current
+capture schedule, so a device that still holds the latest copy can skip it.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .models import DeviceConfiguration
+from .scheduling import recommend_schedule
+from .serializers import DeviceConfigurationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def device_config_group(prefix: str) -> str:
+    return f"device_{prefix}_config"
+
+
+def config_etag(config: DeviceConfiguration, schedule) -> str:
+    return f'"{config.version}-{schedule.capture_interval_seconds}-{schedule.delay_seconds}"'
+
+
+def device_config_document(config: DeviceConfiguration):
+    """Returns the configuration with its schedule, and the ETag of that document."""
+    schedule = recommend_schedule(config)
+    data = dict(DeviceConfigurationSerializer(config).data)
+    data["schedule"] = schedule.as_dict()
+    return data, config_etag(config, schedule)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Compares an If-None-Match value with an ETag, ignoring weak-validator prefixes."""
+    candidates = (value.strip().removeprefix("W/") for value in (if_none_match or "").split(","))
+    return any(candidate in (etag, "*") for candidate in candidates)
+
+
+def push_device_config(config: DeviceConfiguration):
+    """Sends the current configuration to the device's open config sockets, if it has any."""
+    data, etag = device_config_document(config)
+    prefix = config.api_key_id.partition(".")[0]
+    try:
+        async_to_sync(get_channel_layer().group_send)(device_config_group(prefix), {
+            "type": "config.update",
+            "config": data,
+            "etag": etag,
+        })
+    except Exception as e:
+        # The device still gets the change on its next poll or reconnect.
+        logger.warning(f"Could not push configuration to device {prefix}: {e}")
+
+
+def close_device_config_sockets(prefix: str):
+    """Closes the device's open config sockets, e.g. once its API key is revoked or deleted."""
+    try:
+        async_to_sync(get_channel_layer().group_send)(device_config_group(prefix), {"type": "config.revoked"})
+    except Exception as e:
+        logger.warning(f"Could not close the config sockets of device {prefix}: {e}")
@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .enums import LogLevel
+from .ratelimit import TokenBucket
+from .serializers import DeviceLogBatchSerializer
+
+log_rate_limiter = TokenBucket(
+    alias=settings.LOG_RATE_LIMIT_CACHE_ALIAS,
+    rate=settings.LOG_RATE_PER_SECOND,
+    burst=settings.LOG_RATE_BURST,
+    name="device-logs",
+)
+
+
+@dataclass
+class LogBatch:
+    """The outcome of admitting a device log request: the channel event to publish, if any."""
+    is_batch: bool
+    accepted: int
+    dropped: int
+    event: dict = None
+
+
+def parse_log_entries(data) -> tuple:
+    """
+    Returns (entries, is_batch) for either the single {"message"} form or a {"messages": [...]} batch.
+    Raises ValidationError for malformed requests.
+    """
+    if "messages" in data:
+        serializer = DeviceLogBatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data["messages"], True
+    message = data.get("message")
+    if not message:
+        raise ValidationError({"error": "Message not provided"})
+    return [{"message": message}], False
+
+
+def admit_log_entries(entries: list, is_batch: bool, prefix: str) -> LogBatch:
+    """
+    Applies the per-key token bucket and builds the single log.batch event for the dashboard.
+    Over budget, an even sample of the batch is kept and a line reports how many were dropped.
+    """
+    granted = log_rate_limiter.consume(prefix, len(entries))
+    batch = LogBatch(is_batch=is_batch, accepted=granted, dropped=len(entries) - granted)
+    if not granted:
+        return batch
+
+    now = timezone.now()
+    kept = [entries[i * len(entries) // granted] for i in range(granted)]
+    messages = [
+        {
+            "message": entry["message"],
+            "timestamp": _entry_time(entry, now).isoformat(),
+            "level": entry.get("level") or infer_level(entry["message"]),
+        }
+        for entry in kept
+    ]
+    if batch.dropped:
+        messages.append({
+            "message": f"[{batch.dropped} log messages dropped by rate limit]",
+            "timestamp": now.isoformat(),
+            "level": LogLevel.WARNING,
+        })
+    batch.event = {
+        "type": "log.batch",
+        "prefix": prefix,
+        "messages": messages,
+    }
+    return batch
+
+
+def _entry_time(entry, now):
+    if "timestamp" in entry:
+        return entry["timestamp"]
+    return now - timedelta(milliseconds=entry.get("age_ms", 0))
+
+
+def infer_level(message: str) -> str:
+    """Devices mostly send plain text, so derive a level from the usual wording."""
+    text = message.lstrip().upper()
+    if text.startswith(("CRITICAL", "ERROR", "FAILED", "FAIL")):
+        return LogLevel.ERROR
+    if text.startswith(("WARN", "WARNING")):
+        return LogLevel.WARNING
+    return LogLevel.INFO
@@ -0,0 +1,150 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+from PIL import Image
+
+# Frames are compared at this resolution. JPEG draft mode decodes directly at a reduced
+# scale, so a VGA capture costs about a sixteenth of a full decode.
+ANALYSIS_SIZE = (160, 120)
+BLOCK_SIZE = 8
+# A pixel counts as changed when it differs by more than this many grey levels after
+# compensating for a global brightness shift (auto-exposure, flash).
+PIXEL_THRESHOLD = 25.0
+# A block belongs to a change region when at least this fraction of its pixels changed.
+# Neighbouring blocks (4-connected) are merged into one region and tiny regions are dropped.
+REGION_BLOCK_RATIO = 0.1
+REGION_MIN_BLOCKS = 2
+MAX_REGIONS = 8
+
+_SSIM_C1 = (0.01 * 255) ** 2
+_SSIM_C2 = (0.03 * 255) ** 2
+
+
+@dataclass
+class FrameDifference:
+    score: float
+    changed_ratio: float
+    mask: np.ndarray
+    regions: list = field(default_factory=list)
+
+    @property
+    def changed_area_percent(self) -> float:
+        return round(self.changed_ratio * 100, 2)
+
+
+def load_grayscale(fileobj, size=ANALYSIS_SIZE) -> np.ndarray:
+    """Decodes an image file into a float32 grayscale array of the given size."""
+    fileobj.seek(0)
+    with Image.open(fileobj) as img:
+        img.draft("L", size)
+        frame = img.convert("L").resize(size, Image.BILINEAR)
+    fileobj.seek(0)
+    return np.asarray(frame, dtype=np.float32)
+
+
+def _blocks(frame: np.ndarray) -> np.ndarray:
+    height, width = frame.shape
+    rows, cols = height // BLOCK_SIZE, width // BLOCK_SIZE
+    cropped = frame[:rows * BLOCK_SIZE, :cols * BLOCK_SIZE]
+    return cropped.reshape(rows, BLOCK_SIZE, cols, BLOCK_SIZE).swapaxes(1, 2).reshape(rows, cols, -1)
+
+
+def compare_frames(frame1: np.ndarray, frame2: np.ndarray) -> FrameDifference:
+    """
+    Scores how different two grayscale frames are.
+    The score is one minus the mean block-wise SSIM, so 0 means structurally identical.
+    The mask marks pixels whose brightness-compensated difference exceeds PIXEL_THRESHOLD.
+    """
+    blocks1 = _blocks(frame1)
+    blocks2 = _blocks(frame2)
+    mean1 = blocks1.mean(axis=2)
+    mean2 = blocks2.mean(axis=2)
+    var1 = blocks1.var(axis=2)
+    var2 = blocks2.var(axis=2)
+    covariance = (blocks1 * blocks2).mean(axis=2) - mean1 * mean2
+
+    ssim = ((2 * mean1 * mean2 + _SSIM_C1) * (2 * covariance + _SSIM_C2)) / (
+        (mean1 ** 2 + mean2 ** 2 + _SSIM_C1) * (var1 + var2 + _SSIM_C2)
+    )
+    score = float(np.clip(1.0 - ssim.mean(), 0.0, 1.0))
+
+    delta = frame2 - frame1
+    delta -= delta.mean()
+    mask = np.abs(delta) > PIXEL_THRESHOLD
+    return FrameDifference(
+        score=round(score, 4),
+        changed_ratio=float(mask.mean()),
+        mask=mask,
+        regions=find_change_regions(mask, delta),
+    )
+
+
+def _label_blocks(active: np.ndarray) -> np.ndarray:
+    """
+    Labels 4-connected components of a boolean block grid; inactive blocks get -1.
+    Every block starts with its own index and repeatedly takes the smallest label among its
+    active neighbours until nothing changes, which converges in at most the grid diameter.
+    """
+    labels = np.where(active, np.arange(active.size).reshape(active.shape), active.size)
+    while True:
+        padded = np.pad(labels, 1, constant_values=active.size)
+        merged = np.minimum.reduce([
+            labels, padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:],
+        ])
+        merged = np.where(active, merged, active.size)
+        if np.array_equal(merged, labels):
+            return np.where(active, labels, -1)
+        labels = merged
+
+
+def find_change_regions(mask: np.ndarray, delta: np.ndarray) -> list:
+    """
+    Groups changed pixels into rectangular regions, largest first.
+    Boxes are normalized to the frame (0-1) so they apply to the original capture at any size.
+    `changed_ratio` is the share of changed pixels inside the box and `intensity_delta` the
+    mean brightness-compensated change of those pixels (positive means the area got brighter).
+    """
+    height, width = mask.shape
+    block_ratio = _blocks(mask.astype(np.float32)).mean(axis=2)
+    labels = _label_blocks(block_ratio >= REGION_BLOCK_RATIO)
+
+    regions = []
+    for label in np.unique(labels[labels >= 0]):
+        rows, cols = np.nonzero(labels == label)
+        if rows.size < REGION_MIN_BLOCKS:
+            continue
+        top, bottom = rows.min() * BLOCK_SIZE, (rows.max() + 1) * BLOCK_SIZE
+        left, right = cols.min() * BLOCK_SIZE, (cols.max() + 1) * BLOCK_SIZE
+        region_mask = mask[top:bottom, left:right]
+        changed = int(region_mask.sum())
+        if not changed:
+            continue
+        regions.append((changed, {
+            "x": round(left / width, 4),
+            "y": round(top / height, 4),
+            "width": round((right - left) / width, 4),
+            "height": round((bottom - top) / height, 4),
+            "changed_ratio": round(changed / region_mask.size, 4),
+            "intensity_delta": round(float(delta[top:bottom, left:right][region_mask].mean()), 2),
+        }))
+
+    regions.sort(key=lambda item: item[0], reverse=True)
+    return [region for _, region in regions[:MAX_REGIONS]]
+
+
+def compute_difference(image1, image2) -> FrameDifference:
+    return compare_frames(load_grayscale(image1), load_grayscale(image2))
+
+
+def changed_bounds(regions: list, padding: float = 0.0):
+    """
+    Returns the normalized (left, top, right, bottom) box enclosing all regions, grown by
+    padding (a fraction of the frame) on every side, or None when there are no regions.
+    """
+    if not regions:
+        return None
+    left = min(region["x"] for region in regions) - padding
+    top = min(region["y"] for region in regions) - padding
+    right = max(region["x"] + region["width"] for region in regions) + padding
+    bottom = max(region["y"] + region["height"] for region in regions) + padding
+    return max(0.0, left), max(0.0, top), min(1.0, right), min(1.0, bottom)
@@ -6,3 +6,23 @@ class OpenAIVisionModels(models.TextChoices):
     GPT_4o = 'gpt-4o', 'GPT-4o '
     GPT_4_1_MINI = 'gpt-4.1-mini', 'GPT-4.1 Mini'
     GPT_4_1 = 'gpt-4.1', 'GPT-4.1'
+
+
+class AnalysisStatus(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    RUNNING = 'running', 'Running'
+    DONE = 'done', 'Done'
+    FAILED = 'failed', 'Failed'
+
+
+class PayloadMode(models.TextChoices):
+    FULL = 'full', 'Full Frames'
+    CROPS = 'crops', 'Changed-Area Crops'
+    COMPOSITE = 'composite', 'Side-by-Side Composite'
+
+
+class LogLevel(models.TextChoices):
+    DEBUG = 'debug', 'Debug'
+    INFO = 'info', 'Info'
+    WARNING = 'warning', 'Warning'
+    ERROR = 'error', 'Error'
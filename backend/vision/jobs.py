@@ -0,0 +1,129 @@
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .analysis import AnalysisOptions, run_analysis, notify_analysis_result
+from .enums import AnalysisStatus
+from .models import ChangeDetectionLog
+
+logger = logging.getLogger(__name__)
+
+STALE_DESCRIPTION = "The analysis was interrupted by a server restart; please upload the images again."
+
+
+class AnalysisQueueFull(Exception):
+    """Raised when the bounded analysis queue cannot accept another job."""
+
+
+class AnalysisJobQueue:
+    """
+    A bounded in-process queue drained by a fixed pool of worker threads.
+    The LLM call is network-bound, so threads keep request workers free without the
+    overhead of separate processes. Workers are started lazily on the first submit.
+    Queued jobs do not survive a restart; the first worker fails the logs they leave
+    behind (see fail_stale_analyses) before it takes its first job.
+    """
+
+    def __init__(self, workers: int, maxsize: int):
+        self.workers = max(1, workers)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, log_id, options: AnalysisOptions):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((log_id, options))
+        except queue.Full:
+            raise AnalysisQueueFull("The analysis queue is full. Please retry later.")
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, args=(i == 0,), name=f"analysis-worker-{i}",
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self, sweep: bool = False):
+        if sweep:
+            try:
+                fail_stale_analyses()
+            except Exception:
+                logger.exception("Could not fail stale analyses.")
+            finally:
+                close_old_connections()
+        while True:
+            log_id, options = self._queue.get()
+            try:
+                process_analysis_job(log_id, options)
+            except Exception:
+                logger.exception(f"Analysis job for log {log_id} crashed.")
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+
+def process_analysis_job(log_id, options: AnalysisOptions):
+    try:
+        log_instance = ChangeDetectionLog.objects.get(id=log_id)
+    except ChangeDetectionLog.DoesNotExist:
+        logger.warning(f"Analysis job skipped, log {log_id} no longer exists.")
+        return
+
+    try:
+        run_analysis(log_instance, options)
+    except OSError:
+        logger.error(f"Could not read saved image files for log {log_id}.")
+    finally:
+        notify_analysis_result(log_instance)
+
+
+def fail_stale_analyses(max_age: int = None) -> int:
+    """
+    Fails analyses still QUEUED or RUNNING after max_age seconds (ANALYSIS_STALE_SECONDS by
+    default), which a restart or deploy left behind with the in-memory queue. Their per-request
+    options are gone with the queue, so they cannot be re-run. Returns how many were failed.
+    """
+    max_age = settings.ANALYSIS_STALE_SECONDS if max_age is None else max_age
+    return ChangeDetectionLog.objects.filter(
+        status__in=[AnalysisStatus.QUEUED, AnalysisStatus.RUNNING],
+        created_at__lt=timezone.now() - timedelta(seconds=max_age),
+    ).update(status=AnalysisStatus.FAILED, description=STALE_DESCRIPTION)
+
+
+analysis_queue = AnalysisJobQueue(
+    workers=settings.ANALYSIS_WORKERS,
+    maxsize=settings.ANALYSIS_QUEUE_SIZE,
+)
+
+
+def start_analysis(log_instance: ChangeDetectionLog, options: AnalysisOptions, image1=None,
+                   image2=None) -> ChangeDetectionLog:
+    """Queues the analysis when asynchronous analysis is enabled, otherwise runs it inline."""
+    if settings.ANALYSIS_ASYNC_ENABLED:
+        enqueue_analysis(log_instance, options)
+        return log_instance
+    return run_analysis(log_instance, options, image1, image2)
+
+
+def enqueue_analysis(log_instance: ChangeDetectionLog, options: AnalysisOptions):
+    try:
+        analysis_queue.submit(log_instance.id, options)
+    except AnalysisQueueFull:
+        log_instance.description = "The analysis queue was full; the images were not analyzed."
+        log_instance.status = AnalysisStatus.FAILED
+        log_instance.save(update_fields=['description', 'status'])
+        raise
@@ -0,0 +1,167 @@
+import logging
+import queue
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "device-logs:v1:user"
+WRITE_BATCH_SIZE = 500
+TRIM_INTERVAL_SECONDS = 60
+
+
+def _id_key(stream_id: str) -> tuple:
+    milliseconds, _, sequence = stream_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+class DeviceLogStore:
+    """
+    Keeps each user's device log lines in a capped Redis stream so dashboards can replay them
+    after a reload. Appends only enqueue in memory; a background thread writes them in
+    pipelined batches, so persisting never adds a Redis round trip to the ingest request.
+    Streams are capped at max_entries (approximate MAXLEN) and entries older than
+    max_age_seconds are trimmed by MINID. Stream IDs serve as replay cursors.
+    """
+
+    def __init__(self, url: str, enabled: bool, max_entries: int, max_age_seconds: int,
+                 flush_interval: float = 0.2, queue_size: int = 10000):
+        self.url = url
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._client = None
+        # Stream key -> time of its last MINID trim, for streams written within TRIM_INTERVAL_SECONDS.
+        self._last_trim = {}
+        self._last_trim_pruned = 0.0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    @staticmethod
+    def stream_key(user_id) -> str:
+        return f"{KEY_PREFIX}:{user_id}"
+
+    def append(self, user_id, event: dict):
+        """Queues the messages of a log.batch event for writing; never blocks the caller."""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((user_id, event["prefix"], event["messages"]))
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(event["messages"])
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="device-log-writer", daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except redis.RedisError as e:
+                self._count_failure()
+                logger.warning(f"Could not persist {len(batch)} device log batches: {e}")
+            except Exception:
+                # Anything else must not end the writer thread, or history would stop silently.
+                self._count_failure()
+                logger.exception(f"Dropped {len(batch)} device log batches that could not be written")
+
+    def _count_failure(self):
+        with self._lock:
+            self.failed_batches += 1
+
+    def write(self, batch: list):
+        pipe = self.client.pipeline(transaction=False)
+        touched = set()
+        for user_id, prefix, messages in batch:
+            key = self.stream_key(user_id)
+            touched.add(key)
+            for entry in messages:
+                pipe.xadd(
+                    key,
+                    {
+                        "prefix": prefix,
+                        "message": entry["message"],
+                        "timestamp": entry["timestamp"],
+                        "level": entry["level"],
+                    },
+                    maxlen=self.max_entries,
+                    approximate=True,
+                )
+        now = time.time()
+        for key in touched:
+            if now - self._last_trim.get(key, 0) >= TRIM_INTERVAL_SECONDS:
+                pipe.xtrim(key, minid=self._min_id(now), approximate=True)
+                self._last_trim[key] = now
+        if now - self._last_trim_pruned >= TRIM_INTERVAL_SECONDS:
+            # Streams not trimmed within the interval are due again anyway, so forgetting them is free.
+            self._last_trim = {
+                key: trimmed for key, trimmed in self._last_trim.items() if now - trimmed < TRIM_INTERVAL_SECONDS
+            }
+            self._last_trim_pruned = now
+        pipe.execute()
+
+    def _min_id(self, now: float) -> str:
+        return f"{int((now - self.max_age_seconds) * 1000)}-0"
+
+    def read(self, user_id, since: str = None, count: int = 100) -> tuple:
+        """
+        Returns (entries, cursor): the entries after the `since` stream ID, or the last `count`
+        entries, oldest first and never older than the retention age. The cursor is the ID of
+        the newest entry returned (or `since` when nothing is new).
+        """
+        key = self.stream_key(user_id)
+        min_id = self._min_id(time.time())
+        if since and _id_key(since) >= _id_key(min_id):
+            rows = self.client.xrange(key, min=f"({since}", count=count)
+        elif since:
+            rows = self.client.xrange(key, min=min_id, count=count)
+        else:
+            rows = list(reversed(self.client.xrevrange(key, min=min_id, count=count)))
+        entries = [{"id": entry_id, **fields} for entry_id, fields in rows]
+        cursor = entries[-1]["id"] if entries else since
+        return entries, cursor
+
+    def stats(self) -> dict:
+        with self._lock:
+            dropped, failed_batches = self.dropped, self.failed_batches
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "dropped": dropped,
+            "failed_batches": failed_batches,
+        }
+
+
+device_log_store = DeviceLogStore(
+    url=settings.DEVICE_LOG_REDIS_URL,
+    enabled=settings.DEVICE_LOG_HISTORY_ENABLED,
+    max_entries=settings.DEVICE_LOG_MAX_ENTRIES,
+    max_age_seconds=settings.DEVICE_LOG_MAX_AGE_SECONDS,
+)
@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from vision.enums import AnalysisStatus
+from vision.models import ChangeDetectionLog
+
+
+class Command(BaseCommand):
+    help = ("Measures log listing latency for accounts of growing size. Rows are inserted in a "
+            "transaction that is rolled back at the end, so the database is left unchanged.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                            help="Comma-separated row counts to measure at.")
+        parser.add_argument("--requests", type=int, default=20, help="Requests per measurement.")
+        parser.add_argument("--depth", type=int, default=10, help="Pages to follow for the deep-page timing.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        with transaction.atomic():
+            user = User.objects.create(username=f"listing-benchmark-{time.time_ns()}")
+            client = APIClient()
+            client.force_authenticate(user)
+
+            inserted = 0
+            for size in sizes:
+                self._insert(user, size - inserted, options["batch_size"])
+                inserted = size
+                if connection.vendor == "postgresql":
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"ANALYZE {ChangeDetectionLog._meta.db_table}")
+
+                first = self._time(client, "/api/vision/logs/", options["requests"])
+                url = "/api/vision/logs/"
+                for _ in range(options["depth"]):
+                    url = client.get(url).json()["next"] or url
+                deep = self._time(client, url, options["requests"])
+                self.stdout.write(f"{size:>9} rows: first page {first:.2f} ms, "
+                                  f"page {options['depth'] + 1} {deep:.2f} ms (median)")
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _insert(user, count: int, batch_size: int):
+        for start in range(0, count, batch_size):
+            ChangeDetectionLog.objects.bulk_create(
+                [
+                    ChangeDetectionLog(
+                        user=user,
+                        image1="",
+                        image2="",
+                        model_used="gpt-4o-mini",
+                        status=AnalysisStatus.DONE,
+                        description="Benchmark row.",
+                    )
+                    for _ in range(min(batch_size, count - start))
+                ],
+                batch_size=batch_size,
+            )
+
+    @staticmethod
+    def _time(client, url: str, requests: int) -> float:
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.status_code
+        return statistics.median(timings)
@@ -0,0 +1,93 @@
+import base64
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+
+from vision.services import build_llm_payload, build_streaming_llm_body
+
+
+def _write_fake_jpeg(path: str, size: int):
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8\xff\xe0")
+        f.write(os.urandom(size - 6))
+        f.write(b"\xff\xd9")
+
+
+def _legacy_body(path1: str, path2: str) -> int:
+    with open(path1, "rb") as f1, open(path2, "rb") as f2:
+        image1_base64 = base64.b64encode(f1.read()).decode("utf-8")
+        image2_base64 = base64.b64encode(f2.read()).decode("utf-8")
+    payload = build_llm_payload(image1_base64, image2_base64, "gpt-4o-mini", "benchmark")
+    body = json.dumps(payload, allow_nan=False).encode("utf-8")
+    return len(body)
+
+
+def _streaming_body(path1: str, path2: str) -> int:
+    with open(path1, "rb") as f1, open(path2, "rb") as f2:
+        body = build_streaming_llm_body(f1, f2, "gpt-4o-mini", "benchmark")
+        return sum(len(chunk) for chunk in body)
+
+
+MODES = {
+    "legacy": _legacy_body,
+    "streaming": _streaming_body,
+}
+
+
+def _measure(mode: str, path1: str, path2: str, results):
+    import django
+    django.setup()
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    started = time.perf_counter()
+    body_bytes = MODES[mode](path1, path2)
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        "mode": mode,
+        "body_bytes": body_bytes,
+        "seconds": elapsed,
+        "rss_growth_kb": peak_rss - baseline_rss,
+        "traced_peak_kb": traced_peak // 1024,
+    })
+
+
+class Command(BaseCommand):
+    help = ("Compares peak memory of the legacy read/base64/json LLM payload with the streaming body "
+            "for a pair of large JPEG files. Each mode runs in a fresh process.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=float, default=5.0, help="Size of each test image in MB.")
+
+    def handle(self, *args, **options):
+        size = int(options["size_mb"] * 1024 * 1024)
+        context = multiprocessing.get_context("spawn")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path1 = os.path.join(tmp_dir, "image1.jpg")
+            path2 = os.path.join(tmp_dir, "image2.jpg")
+            _write_fake_jpeg(path1, size)
+            _write_fake_jpeg(path2, size)
+
+            self.stdout.write(f"Two images of {size / 1024 / 1024:.1f} MB each")
+            self.stdout.write(
+                f"{'mode':<10} {'body MB':>9} {'seconds':>8} {'RSS growth MB':>14} {'traced peak MB':>15}"
+            )
+            for mode in MODES:
+                results = context.Queue()
+                process = context.Process(target=_measure, args=(mode, path1, path2, results))
+                process.start()
+                result = results.get()
+                process.join()
+                self.stdout.write(
+                    f"{result['mode']:<10} {result['body_bytes'] / 1024 / 1024:>9.1f} {result['seconds']:>8.3f} "
+                    f"{result['rss_growth_kb'] / 1024:>14.1f} {result['traced_peak_kb'] / 1024:>15.1f}"
+                )
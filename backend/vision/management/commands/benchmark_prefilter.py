@@ -0,0 +1,52 @@
+import io
+import time
+
+import numpy as np
+from PIL import Image
+from django.core.management.base import BaseCommand
+
+from vision.diffing import compute_difference
+
+
+def _synthetic_frame(rng, width: int, height: int, with_object: bool) -> bytes:
+    y, x = np.mgrid[0:height, 0:width]
+    frame = (x / width * 120 + y / height * 80 + rng.normal(0, 4, (height, width))).clip(0, 255)
+    frame = np.stack([frame, frame * 0.9, frame * 0.8], axis=2)
+    if with_object:
+        top, left = rng.integers(0, height - 120), rng.integers(0, width - 160)
+        frame[top:top + 120, left:left + 160] = rng.integers(0, 255, 3)
+    buffer = io.BytesIO()
+    Image.fromarray(frame.astype(np.uint8)).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Measures single-core throughput of the local change pre-filter on JPEG frame pairs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pairs", type=int, default=500)
+        parser.add_argument("--width", type=int, default=640)
+        parser.add_argument("--height", type=int, default=480)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        width, height = options["width"], options["height"]
+        samples = [
+            (_synthetic_frame(rng, width, height, False), _synthetic_frame(rng, width, height, i % 2 == 1))
+            for i in range(20)
+        ]
+
+        pairs = options["pairs"]
+        scores = []
+        started = time.perf_counter()
+        for i in range(pairs):
+            image1, image2 = samples[i % len(samples)]
+            scores.append(compute_difference(io.BytesIO(image1), io.BytesIO(image2)).score)
+        elapsed = time.perf_counter() - started
+
+        unchanged = [score for i, score in enumerate(scores) if i % len(samples) % 2 == 0]
+        changed = [score for i, score in enumerate(scores) if i % len(samples) % 2 == 1]
+        self.stdout.write(f"{pairs} pairs of {width}x{height} JPEGs in {elapsed:.3f}s")
+        self.stdout.write(f"Throughput: {pairs / elapsed:.1f} pairs/s ({elapsed / pairs * 1000:.2f} ms/pair)")
+        self.stdout.write(f"Mean score, unchanged pairs: {np.mean(unchanged):.4f}; "
+                          f"with a new object: {np.mean(changed):.4f}")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from vision.uploads import clear_expired_sessions
+
+
+class Command(BaseCommand):
+    help = ("Deletes resumable upload sessions older than UPLOAD_SESSION_TTL together with their staged "
+            "chunks, and staging directories left behind without a session. Run it periodically, e.g. from cron.")
+
+    def handle(self, *args, **options):
+        removed = clear_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} expired upload sessions."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from vision.jobs import fail_stale_analyses
+
+
+class Command(BaseCommand):
+    help = ("Fails analyses left queued or running for longer than ANALYSIS_STALE_SECONDS, e.g. by a restart "
+            "that dropped the in-memory job queue. Run it periodically, e.g. from cron.")
+
+    def handle(self, *args, **options):
+        failed = fail_stale_analyses()
+        self.stdout.write(self.style.SUCCESS(f"Failed {failed} stale analyses."))
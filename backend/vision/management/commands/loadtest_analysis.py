@@ -0,0 +1,184 @@
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+from django.core.management.base import BaseCommand
+
+
+class _StubLLMHandler(BaseHTTPRequestHandler):
+    """Answers like the LLM service after a fixed delay and tracks how many calls overlap."""
+    protocol_version = "HTTP/1.1"
+    latency = 1.0
+    lock = threading.Lock()
+    in_flight = 0
+    peak_in_flight = 0
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak_in_flight = max(cls.peak_in_flight, cls.in_flight)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(cls.latency)
+        body = json.dumps({"output": [{"content": [{"text": "Load test description."}]}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with cls.lock:
+            cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def _jpeg(index: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (index * 37 % 256, index * 91 % 256, 128)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _upload(name: str, data: bytes):
+    fileobj = io.BytesIO(data)
+    fileobj.name = name
+    return fileobj
+
+
+class _ThreadSampler:
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.05):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _run_sync(raw_key: str, pairs: list, threads: int) -> list:
+    from django.test import Client
+
+    def post(pair):
+        response = Client().post(
+            "/api/vision/logs/",
+            {"image1": _upload("a.jpg", pair[0]), "image2": _upload("b.jpg", pair[1])},
+            headers={"X-Api-Key": raw_key},
+        )
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(post, pairs))
+
+
+def _run_async(raw_key: str, pairs: list) -> list:
+    from django.test import AsyncClient
+
+    async def post(pair):
+        response = await AsyncClient().post(
+            "/api/vision/async/analyze/",
+            {"image1": _upload("a.jpg", pair[0]), "image2": _upload("b.jpg", pair[1])},
+            headers={"X-Api-Key": raw_key},
+        )
+        return response.status_code
+
+    async def main():
+        return await asyncio.gather(*(post(pair) for pair in pairs))
+
+    return asyncio.run(main())
+
+
+def _measure(mode: str, llm_url: str, requests: int, threads: int, results):
+    os.environ["LLM_API_URL"] = llm_url
+    os.environ["LLM_API_KEY"] = "load-test"
+    os.environ["LLM_POOL_MAXSIZE"] = str(requests)
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from authentication.models import UserAPIKey
+    from vision.caching import result_cache
+
+    settings.ANALYSIS_ASYNC_ENABLED = False
+    result_cache.enabled = False
+    pairs = [(_jpeg(i), _jpeg(i + 1)) for i in range(requests)]
+    user = User.objects.create(username=f"load-test-{mode}-{time.time_ns()}")
+    _, raw_key = UserAPIKey.objects.create_key(name="load-test", user=user)
+
+    try:
+        baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        with _ThreadSampler() as sampler:
+            if mode == "sync":
+                statuses = _run_sync(raw_key, pairs, threads)
+            else:
+                statuses = _run_async(raw_key, pairs)
+        elapsed = time.perf_counter() - started
+        results.put({
+            "mode": mode,
+            "seconds": elapsed,
+            "ok": sum(1 for code in statuses if code == 201),
+            "peak_threads": sampler.peak,
+            "rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss,
+        })
+    finally:
+        user.delete()
+
+
+class Command(BaseCommand):
+    help = ("Load-tests the synchronous analysis endpoint (thread per request) against the async-native "
+            "one (coroutine per request) with a local stub LLM that answers after a fixed delay. Each mode "
+            "runs in a fresh process against the configured database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Concurrent analysis requests.")
+        parser.add_argument("--threads", type=int, default=32,
+                            help="Worker threads available to the synchronous path.")
+        parser.add_argument("--llm-latency", type=float, default=1.0, help="Stub LLM response time in seconds.")
+
+    def handle(self, *args, **options):
+        _StubLLMHandler.latency = options["llm_latency"]
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _StubLLMHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        llm_url = f"http://127.0.0.1:{server.server_address[1]}/v1/responses"
+        context = multiprocessing.get_context("spawn")
+
+        self.stdout.write(f"{options['requests']} requests, LLM latency {options['llm_latency']:.1f}s, "
+                          f"{options['threads']} threads for the sync path")
+        self.stdout.write(f"{'mode':<6} {'ok':>5} {'seconds':>8} {'req/s':>7} {'peak LLM calls':>15} "
+                          f"{'peak threads':>13} {'RSS growth MB':>14}")
+        try:
+            for mode in ("sync", "async"):
+                _StubLLMHandler.peak_in_flight = 0
+                results = context.Queue()
+                process = context.Process(
+                    target=_measure,
+                    args=(mode, llm_url, options["requests"], options["threads"], results),
+                )
+                process.start()
+                result = results.get()
+                process.join()
+                self.stdout.write(
+                    f"{result['mode']:<6} {result['ok']:>5} {result['seconds']:>8.2f} "
+                    f"{result['ok'] / result['seconds']:>7.1f} {_StubLLMHandler.peak_in_flight:>15} "
+                    f"{result['peak_threads']:>13} {result['rss_growth_kb'] / 1024:>14.1f}"
+                )
+        finally:
+            server.shutdown()
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from vision.models import ChangeDetectionLog
+from vision.storage import ContentAddressedStorage
+
+IMAGE_FIELDS = ("image1", "image2")
+
+
+class Command(BaseCommand):
+    help = ("Moves existing analysis images into the content-addressed layout. Duplicate files collapse "
+            "into one and the old files are removed once no log references them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        storage = ChangeDetectionLog._meta.get_field("image1").storage
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError("CONTENT_ADDRESSED_MEDIA is disabled; enable it before migrating media.")
+
+        dry_run = options["dry_run"]
+        renamed = {}
+        unique_sizes = {}
+        bytes_before = 0
+        migrated_logs = 0
+
+        logs = ChangeDetectionLog.objects.only(*IMAGE_FIELDS).iterator(chunk_size=options["batch_size"])
+        for log in logs:
+            updates = {}
+            for field in IMAGE_FIELDS:
+                old_name = getattr(log, field).name
+                if not old_name or storage.is_content_name(old_name):
+                    continue
+                if old_name not in renamed:
+                    if not storage.exists(old_name):
+                        self.stderr.write(f"Missing file for log {log.id}: {old_name}")
+                        continue
+                    size = storage.size(old_name)
+                    bytes_before += size
+                    with storage.open(old_name, "rb") as f:
+                        renamed[old_name] = (
+                            storage.content_name(old_name, f) if dry_run else storage.save(old_name, f)
+                        )
+                    unique_sizes[renamed[old_name]] = size
+                updates[field] = renamed[old_name]
+
+            if updates:
+                migrated_logs += 1
+                if not dry_run:
+                    ChangeDetectionLog.objects.filter(pk=log.pk).update(**updates)
+
+        bytes_after = sum(unique_sizes.values())
+
+        if not dry_run:
+            for old_name in renamed:
+                if not ChangeDetectionLog.objects.filter(Q(image1=old_name) | Q(image2=old_name)).exists():
+                    storage.delete(old_name)
+
+        prefix = "[dry run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Migrated {migrated_logs} logs: {len(renamed)} files collapsed into {len(unique_sizes)} "
+            f"unique files ({bytes_before / 1024 / 1024:.1f} MB -> {bytes_after / 1024 / 1024:.1f} MB)."
+        ))
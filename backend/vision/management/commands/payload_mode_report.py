@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max
+from django.utils import timezone
+
+from vision.enums import AnalysisStatus
+from vision.models import ChangeDetectionLog
+
+
+class Command(BaseCommand):
+    help = ("Compares LLM request size and end-to-end latency per payload mode (full frames, "
+            "changed-area crops, side-by-side composite) over recent analyses.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="How many days of logs to include.")
+        parser.add_argument("--device", help="Only include logs sent with this API key prefix.")
+
+    def handle(self, *args, **options):
+        recent = ChangeDetectionLog.objects.filter(created_at__gte=timezone.now() - timedelta(days=options["days"]))
+        if options["device"]:
+            recent = recent.filter(api_key__prefix=options["device"])
+        logs = recent.filter(payload_bytes__isnull=False)
+        # Result-cache hits and pre-filter skips finish without an LLM call, so they carry no payload metrics.
+        without_call = recent.filter(payload_bytes__isnull=True, status=AnalysisStatus.DONE).count()
+
+        rows = logs.values("payload_mode").annotate(
+            calls=Count("id"),
+            avg_bytes=Avg("payload_bytes"),
+            max_bytes=Max("payload_bytes"),
+            avg_latency=Avg("llm_latency_ms"),
+            max_latency=Max("llm_latency_ms"),
+        ).order_by("payload_mode")
+        if not rows:
+            self.stdout.write("No LLM calls with payload metrics in this period.")
+            self._report_excluded(without_call)
+            return
+
+        baseline = logs.filter(payload_mode="full").aggregate(avg=Avg("payload_bytes"))["avg"]
+        self.stdout.write(
+            f"{'mode':<10} {'calls':>7} {'avg KB':>9} {'max KB':>9} {'avg ms':>8} {'max ms':>8} {'vs full':>8}"
+        )
+        for row in rows:
+            saving = f"{1 - row['avg_bytes'] / baseline:.0%}" if baseline and row["payload_mode"] != "full" else "-"
+            self.stdout.write(
+                f"{row['payload_mode'] or '-':<10} {row['calls']:>7} {row['avg_bytes'] / 1024:>9.1f} "
+                f"{row['max_bytes'] / 1024:>9.1f} {row['avg_latency'] or 0:>8.0f} {row['max_latency'] or 0:>8} "
+                f"{saving:>8}"
+            )
+        self._report_excluded(without_call)
+
+    def _report_excluded(self, count: int):
+        if count:
+            self.stdout.write(f"Not included: {count} analyses answered without an LLM call "
+                              f"(result-cache hits and pre-filter skips).")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from vision.thumbnails import thumbnail_cache
+
+
+class Command(BaseCommand):
+    help = ("Reports the size and hit rate of the on-disk thumbnail cache. Hit counters are read from "
+            "THUMBNAIL_STATS_CACHE_ALIAS, so they only cover other processes when that cache is shared.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true", help="Evict least recently used thumbnails now.")
+        parser.add_argument("--clear", action="store_true", help="Delete every cached thumbnail.")
+
+    def handle(self, *args, **options):
+        if options["clear"] or options["prune"]:
+            removed = thumbnail_cache.prune(target_bytes=0 if options["clear"] else None)
+            self.stdout.write(f"Removed {removed} thumbnails.")
+
+        stats = thumbnail_cache.stats(scan_disk=True)
+        used = stats["bytes"] / stats["max_bytes"] * 100 if stats["max_bytes"] else 0
+        self.stdout.write(f"Location: {thumbnail_cache.root}")
+        self.stdout.write(f"Files: {stats['files']}, {stats['bytes'] / 1024 / 1024:.1f} MB of "
+                          f"{stats['max_bytes'] / 1024 / 1024:.1f} MB ({used:.1f}%)")
+        if stats["oldest_access"]:
+            self.stdout.write(f"Least recently used: {stats['oldest_access']}")
+        hit_ratio = f"{stats['hit_ratio'] * 100:.1f}%" if stats["hit_ratio"] is not None else "n/a"
+        self.stdout.write(f"Hits: {stats['hits']}, misses: {stats['misses']}, evictions: {stats['evictions']}, "
+                          f"hit rate: {hit_ratio}")
@@ -0,0 +1,134 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.negotiation import BaseContentNegotiation
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+SERVE_MODE_DJANGO = "django"
+SERVE_MODE_X_ACCEL = "x-accel-redirect"
+SERVE_MODE_X_SENDFILE = "x-sendfile"
+
+
+class IgnoreAcceptNegotiation(BaseContentNegotiation):
+    """
+    Media views return files, so an image-only Accept header (as sent by <img> tags) must not
+    cause a 406. Errors are still rendered with the first configured renderer.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def file_etag(storage, name: str, size: int, modified) -> str:
+    """Content-addressed names already carry the SHA-256 of the file; other files use mtime and size."""
+    if getattr(storage, "is_content_name", None) and storage.is_content_name(name):
+        return quote_etag(os.path.splitext(os.path.basename(name))[0])
+    return f'W/"{int(modified.timestamp()):x}-{size:x}"'
+
+
+def parse_range(header: str, size: int):
+    """
+    Returns (start, end) for a single `bytes=` range, None when the header should be ignored
+    (absent, malformed or multi-range) and raises ValueError when the range is unsatisfiable.
+    """
+    match = RANGE_RE.match(header or "")
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _iter_range(fileobj, start: int, length: int):
+    with fileobj:
+        fileobj.seek(start)
+        while length > 0:
+            chunk = fileobj.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_protected_file(request, storage, name: str, max_age: int = None, etag: str = None):
+    """
+    Serves a stored file to an already-authorized request. Conditional requests are answered
+    with 304 from the ETag/Last-Modified alone, without opening the file. Depending on
+    PROTECTED_MEDIA_SERVE_MODE the body is streamed by Django (FileResponse, which lets the
+    server use sendfile, plus single byte ranges) or delegated to nginx/Apache through
+    X-Accel-Redirect or X-Sendfile.
+    """
+    try:
+        size = storage.size(name)
+        modified = storage.get_modified_time(name)
+    except OSError:
+        raise Http404("Image file could not be opened.")
+
+    etag = etag or file_etag(storage, name, size, modified)
+    last_modified = int(modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, storage, name, size, etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(
+        response, private=True,
+        max_age=settings.PROTECTED_MEDIA_MAX_AGE if max_age is None else max_age,
+    )
+    return response
+
+
+def _file_response(request, storage, name: str, size: int, etag: str):
+    content_type = mimetypes.guess_type(name)[0] or "image/jpeg"
+    mode = settings.PROTECTED_MEDIA_SERVE_MODE
+
+    if mode == SERVE_MODE_X_ACCEL:
+        response = HttpResponse(content_type=content_type)
+        response.headers["X-Accel-Redirect"] = settings.PROTECTED_MEDIA_INTERNAL_URL + name
+        return response
+    if mode == SERVE_MODE_X_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        response.headers["X-Sendfile"] = storage.path(name)
+        return response
+
+    byte_range = None
+    if request.headers.get("If-Range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response.headers["Content-Range"] = f"bytes */{size}"
+            return response
+
+    try:
+        fileobj = storage.open(name, "rb")
+    except OSError:
+        raise Http404("Image file could not be opened.")
+
+    if byte_range is None:
+        response = FileResponse(fileobj, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _iter_range(fileobj, start, end - start + 1), status=206, content_type=content_type
+        )
+        response.headers["Content-Length"] = str(end - start + 1)
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0005_alter_deviceconfiguration_options_and_more"),
+    ]
+
+    operations = [
+        # Logs created before the job pipeline were always analyzed inline.
+        migrations.AddField(
+            model_name="changedetectionlog",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="done",
+                max_length=10,
+                verbose_name="Analysis Status",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="changedetectionlog",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="queued",
+                max_length=10,
+                verbose_name="Analysis Status",
+            ),
+        ),
+    ]
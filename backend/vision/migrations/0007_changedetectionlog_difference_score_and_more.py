@@ -0,0 +1,41 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:20
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0006_changedetectionlog_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="changedetectionlog",
+            name="changed_area_percent",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Changed Area (%)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="changedetectionlog",
+            name="difference_score",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="Difference Score"
+            ),
+        ),
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="change_threshold",
+            field=models.FloatField(
+                default=0.0,
+                help_text="Pairs whose local difference score (0-1) is below this value are logged as unchanged without calling the AI model. 0 disables the filter; around 0.05 suits most scenes.",
+                validators=[
+                    django.core.validators.MinValueValidator(0.0),
+                    django.core.validators.MaxValueValidator(1.0),
+                ],
+                verbose_name="Change Threshold",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:30
+
+import vision.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0007_changedetectionlog_difference_score_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="changedetectionlog",
+            name="image1",
+            field=models.ImageField(
+                db_index=True,
+                storage=vision.storage.get_image_storage,
+                upload_to="change_detection/",
+                verbose_name="First Image",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="changedetectionlog",
+            name="image2",
+            field=models.ImageField(
+                db_index=True,
+                storage=vision.storage.get_image_storage,
+                upload_to="change_detection/",
+                verbose_name="Second Image",
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:40
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0008_changedetectionlog_content_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="preprocess_enabled",
+            field=models.BooleanField(
+                default=False,
+                help_text="Resize and re-encode images before they are sent to the AI model. Stored images are unchanged.",
+                verbose_name="Normalize Images Before Analysis",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="preprocess_grayscale",
+            field=models.BooleanField(
+                default=False, verbose_name="Convert to Grayscale"
+            ),
+        ),
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="preprocess_max_edge",
+            field=models.PositiveIntegerField(
+                default=1024,
+                validators=[django.core.validators.MinValueValidator(64)],
+                verbose_name="Maximum Image Edge (pixels)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="preprocess_quality",
+            field=models.PositiveSmallIntegerField(
+                default=85,
+                validators=[
+                    django.core.validators.MinValueValidator(10),
+                    django.core.validators.MaxValueValidator(95),
+                ],
+                verbose_name="JPEG Quality",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-18 16:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+        ("vision", "0009_deviceconfiguration_preprocessing"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="changedetectionlog",
+            name="api_key",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="logs",
+                to="authentication.userapikey",
+                verbose_name="Device API Key",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="changedetectionlog",
+            index=models.Index(
+                fields=["user", "-created_at"], name="vision_log_user_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0010_changedetectionlog_api_key_and_user_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="changedetectionlog",
+            name="change_regions",
+            field=models.JSONField(blank=True, null=True, verbose_name="Changed Regions"),
+        ),
+    ]
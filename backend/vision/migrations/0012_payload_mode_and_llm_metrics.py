@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0011_changedetectionlog_change_regions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="changedetectionlog",
+            name="llm_latency_ms",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="LLM Latency (ms)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="changedetectionlog",
+            name="payload_bytes",
+            field=models.PositiveIntegerField(
+                blank=True, null=True, verbose_name="LLM Payload Size (bytes)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="changedetectionlog",
+            name="payload_mode",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("full", "Full Frames"),
+                    ("crops", "Changed-Area Crops"),
+                    ("composite", "Side-by-Side Composite"),
+                ],
+                max_length=10,
+                verbose_name="LLM Payload Mode",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="payload_mode",
+            field=models.CharField(
+                choices=[
+                    ("full", "Full Frames"),
+                    ("crops", "Changed-Area Crops"),
+                    ("composite", "Side-by-Side Composite"),
+                ],
+                default="full",
+                help_text="Send both full frames, only crops of the area that changed, or a single side-by-side image. Crops fall back to full frames when no changed area could be located.",
+                max_length=10,
+                verbose_name="AI Payload Mode",
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+        ("vision", "0012_payload_mode_and_llm_metrics"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="adaptive_schedule",
+            field=models.BooleanField(
+                default=True,
+                help_text="Back off on quiet scenes and capture more often on active ones, based on recent analyses.",
+                verbose_name="Adapt Capture Interval to Activity",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="capture_interval_seconds",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="How often the device captures and sends a pair on its own. 0 disables periodic capture.",
+                verbose_name="Capture Interval (seconds)",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="changedetectionlog",
+            index=models.Index(
+                fields=["api_key", "-created_at"], name="vision_log_key_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:30
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0013_capture_schedule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="motion_threshold",
+            field=models.FloatField(
+                default=0.0,
+                help_text="Share of the frame (0-1) that must differ from the last uploaded frame before the device uploads a scheduled pair. Checked on the device, so unchanged scenes cost no upload. 0 uploads every pair.",
+                validators=[
+                    django.core.validators.MinValueValidator(0.0),
+                    django.core.validators.MaxValueValidator(1.0),
+                ],
+                verbose_name="On-Device Motion Threshold",
+            ),
+        ),
+    ]
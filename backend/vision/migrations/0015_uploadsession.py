@@ -0,0 +1,103 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:40
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+        ("vision", "0014_deviceconfiguration_motion_threshold"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadSession",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "model",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("gpt-4o-mini", "GPT-4o Mini (Recommended)"),
+                            ("gpt-4o", "GPT-4o "),
+                            ("gpt-4.1-mini", "GPT-4.1 Mini"),
+                            ("gpt-4.1", "GPT-4.1"),
+                        ],
+                        max_length=50,
+                        verbose_name="AI Model",
+                    ),
+                ),
+                (
+                    "prompt_context",
+                    models.TextField(blank=True, verbose_name="Custom Prompt Context"),
+                ),
+                (
+                    "image1_size",
+                    models.PositiveIntegerField(
+                        verbose_name="First Image Size (bytes)"
+                    ),
+                ),
+                (
+                    "image2_size",
+                    models.PositiveIntegerField(
+                        verbose_name="Second Image Size (bytes)"
+                    ),
+                ),
+                (
+                    "image1_received",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="First Image Bytes Received"
+                    ),
+                ),
+                (
+                    "image2_received",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Second Image Bytes Received"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, db_index=True, verbose_name="Creation Time"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "api_key",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="upload_sessions",
+                        to="authentication.userapikey",
+                        verbose_name="Device API Key",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="upload_sessions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Upload Session",
+                "verbose_name_plural": "Upload Sessions",
+            },
+        ),
+    ]
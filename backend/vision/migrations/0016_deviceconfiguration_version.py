@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0015_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deviceconfiguration",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=1,
+                editable=False,
+                help_text="Incremented on every save, so devices can tell whether their copy is current.",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vision", "0016_deviceconfiguration_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadsession",
+            name="chunk_claim",
+            field=models.UUIDField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Chunk Being Written",
+            ),
+        ),
+        migrations.AddField(
+            model_name="uploadsession",
+            name="chunk_claim_expires",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="Chunk Claim Expiry"
+            ),
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
-from .enums import OpenAIVisionModels
+from .enums import OpenAIVisionModels, AnalysisStatus, PayloadMode
+from .storage import get_image_storage
 
 
 class ChangeDetectionLog(models.Model):
@@ -12,16 +14,56 @@ class ChangeDetectionLog(models.Model):
         verbose_name="User"
     )
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    image1 = models.ImageField(upload_to='change_detection/', verbose_name="First Image")
-    image2 = models.ImageField(upload_to='change_detection/', verbose_name="Second Image")
+    image1 = models.ImageField(
+        upload_to='change_detection/', storage=get_image_storage, db_index=True, verbose_name="First Image"
+    )
+    image2 = models.ImageField(
+        upload_to='change_detection/', storage=get_image_storage, db_index=True, verbose_name="Second Image"
+    )
+    api_key = models.ForeignKey(
+        "authentication.UserAPIKey",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="logs",
+        verbose_name="Device API Key"
+    )
     model_used = models.CharField(max_length=50, blank=True, verbose_name="AI Model Used")
     description = models.TextField(blank=True, null=True, verbose_name="Change Description")
+    status = models.CharField(
+        max_length=10,
+        choices=AnalysisStatus.choices,
+        default=AnalysisStatus.QUEUED,
+        verbose_name="Analysis Status"
+    )
+    difference_score = models.FloatField(null=True, blank=True, verbose_name="Difference Score")
+    changed_area_percent = models.FloatField(null=True, blank=True, verbose_name="Changed Area (%)")
+    change_regions = models.JSONField(null=True, blank=True, verbose_name="Changed Regions")
+    payload_mode = models.CharField(
+        max_length=10,
+        choices=PayloadMode.choices,
+        blank=True,
+        verbose_name="LLM Payload Mode"
+    )
+    payload_bytes = models.PositiveIntegerField(null=True, blank=True, verbose_name="LLM Payload Size (bytes)")
+    llm_latency_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name="LLM Latency (ms)")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Creation Time")
 
     class Meta:
         verbose_name = "Change Detection Log"
         verbose_name_plural = "Change Detection Logs"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='vision_log_user_created_idx'),
+            models.Index(fields=['api_key', '-created_at'], name='vision_log_key_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.image1._committed and self.image2._committed:
+            return super().save(*args, **kwargs)
+        # New images are stored in the same transaction as the row; see ContentAddressedStorage.
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().save(*args, **kwargs)
 
 
 class DeviceConfiguration(models.Model):
@@ -33,6 +75,16 @@ class DeviceConfiguration(models.Model):
     )
     flash_enabled = models.BooleanField(default=True, verbose_name="Enable ESP32 Flash")
     delay_seconds = models.PositiveIntegerField(default=10, verbose_name="Delay Between Photos (seconds)")
+    capture_interval_seconds = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Capture Interval (seconds)",
+        help_text="How often the device captures and sends a pair on its own. 0 disables periodic capture."
+    )
+    adaptive_schedule = models.BooleanField(
+        default=True,
+        verbose_name="Adapt Capture Interval to Activity",
+        help_text="Back off on quiet scenes and capture more often on active ones, based on recent analyses."
+    )
     default_model = models.CharField(
         max_length=50,
         choices=OpenAIVisionModels.choices,
@@ -44,11 +96,103 @@ class DeviceConfiguration(models.Model):
         verbose_name="Custom Prompt Context",
         help_text="Describe specific concerns, e.g., 'check for fire hazards' or 'monitor for unauthorized access'."
     )
+    change_threshold = models.FloatField(
+        default=0.0,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        verbose_name="Change Threshold",
+        help_text="Pairs whose local difference score (0-1) is below this value are logged as unchanged "
+                  "without calling the AI model. 0 disables the filter; around 0.05 suits most scenes."
+    )
+    motion_threshold = models.FloatField(
+        default=0.0,
+        validators=[MinValueValidator(0.0), MaxValueValidator(1.0)],
+        verbose_name="On-Device Motion Threshold",
+        help_text="Share of the frame (0-1) that must differ from the last uploaded frame before the device "
+                  "uploads a scheduled pair. Checked on the device, so unchanged scenes cost no upload. "
+                  "0 uploads every pair."
+    )
+    preprocess_enabled = models.BooleanField(
+        default=False,
+        verbose_name="Normalize Images Before Analysis",
+        help_text="Resize and re-encode images before they are sent to the AI model. Stored images are unchanged."
+    )
+    preprocess_max_edge = models.PositiveIntegerField(
+        default=1024,
+        validators=[MinValueValidator(64)],
+        verbose_name="Maximum Image Edge (pixels)"
+    )
+    preprocess_quality = models.PositiveSmallIntegerField(
+        default=85,
+        validators=[MinValueValidator(10), MaxValueValidator(95)],
+        verbose_name="JPEG Quality"
+    )
+    preprocess_grayscale = models.BooleanField(default=False, verbose_name="Convert to Grayscale")
+    payload_mode = models.CharField(
+        max_length=10,
+        choices=PayloadMode.choices,
+        default=PayloadMode.FULL,
+        verbose_name="AI Payload Mode",
+        help_text="Send both full frames, only crops of the area that changed, or a single side-by-side image. "
+                  "Crops fall back to full frames when no changed area could be located."
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Incremented on every save, so devices can tell whether their copy is current."
+    )
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Configuration for {self.api_key.name}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # Incremented in the database so concurrent saves never end up with the same version.
+        self.version = models.F("version") + 1
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=["version"])
+
     class Meta:
         verbose_name = "Device Configuration"
         verbose_name_plural = "Device Configurations"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload of one image pair. The device declares both sizes up front, sends each
+    image in chunks by byte offset and then commits the session, which creates the log.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+        verbose_name="User"
+    )
+    api_key = models.ForeignKey(
+        "authentication.UserAPIKey",
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+        verbose_name="Device API Key"
+    )
+    model = models.CharField(max_length=50, blank=True, choices=OpenAIVisionModels.choices, verbose_name="AI Model")
+    prompt_context = models.TextField(blank=True, verbose_name="Custom Prompt Context")
+    image1_size = models.PositiveIntegerField(verbose_name="First Image Size (bytes)")
+    image2_size = models.PositiveIntegerField(verbose_name="Second Image Size (bytes)")
+    image1_received = models.PositiveIntegerField(default=0, verbose_name="First Image Bytes Received")
+    image2_received = models.PositiveIntegerField(default=0, verbose_name="Second Image Bytes Received")
+    chunk_claim = models.UUIDField(null=True, blank=True, editable=False, verbose_name="Chunk Being Written")
+    chunk_claim_expires = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Chunk Claim Expiry")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Creation Time")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+
+    def __str__(self):
+        return f"Upload {self.id}"
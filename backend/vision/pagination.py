@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ChangeDetectionLogPagination(CursorPagination):
+    """
+    Keyset pagination over created_at. Each page is a range scan on the (user, -created_at)
+    index, so fetching a page costs the same no matter how many logs an account has.
+    """
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,92 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_PREPROCESS_WORKERS,
+    thread_name_prefix="image-preprocess",
+)
+
+
+def normalize_image(fileobj, max_edge: int, quality: int, grayscale: bool = False) -> io.BytesIO:
+    """
+    Re-encodes an image as a JPEG no larger than max_edge on its longest side.
+    JPEG draft mode lets libjpeg decode at a reduced scale, so large captures never decode in full.
+    EXIF data is dropped after applying its orientation. The source file is left untouched.
+    """
+    mode = "L" if grayscale else "RGB"
+    fileobj.seek(0)
+    with Image.open(fileobj) as img:
+        if max_edge and max(img.size) > max_edge:
+            scale = max_edge / max(img.size)
+            img.draft(mode, (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+        img = ImageOps.exif_transpose(img).convert(mode)
+        if max_edge:
+            img.thumbnail((max_edge, max_edge), Image.BICUBIC)
+        output = io.BytesIO()
+        img.save(output, "JPEG", quality=quality, optimize=True)
+    fileobj.seek(0)
+    output.seek(0)
+    return output
+
+
+def prepare_pair(image1, image2, max_edge: int, quality: int, grayscale: bool = False):
+    """Normalizes both images in parallel on the preprocessing pool and waits for the results."""
+    futures = [_executor.submit(normalize_image, image, max_edge, quality, grayscale) for image in (image1, image2)]
+    return tuple(future.result() for future in futures)
+
+
+def load_area(fileobj, bounds, max_edge: int, grayscale: bool = False) -> Image.Image:
+    """
+    Decodes the part of an image inside normalized (left, top, right, bottom) bounds, in the
+    stored orientation the change regions were computed in, scaled to at most max_edge.
+    The whole frame is used when bounds is None.
+    """
+    fileobj.seek(0)
+    with Image.open(fileobj) as img:
+        img = img.convert("L" if grayscale else "RGB")
+    fileobj.seek(0)
+    if bounds is not None:
+        left, top, right, bottom = bounds
+        img = img.crop((
+            int(left * img.width), int(top * img.height),
+            max(int(left * img.width) + 1, round(right * img.width)),
+            max(int(top * img.height) + 1, round(bottom * img.height)),
+        ))
+    if max_edge:
+        img.thumbnail((max_edge, max_edge), Image.BICUBIC)
+    return img
+
+
+def encode_jpeg(img: Image.Image, quality: int) -> io.BytesIO:
+    output = io.BytesIO()
+    img.save(output, "JPEG", quality=quality, optimize=True)
+    output.seek(0)
+    return output
+
+
+def crop_pair(image1, image2, bounds, max_edge: int, quality: int, grayscale: bool = False):
+    """Crops both images to the same area and re-encodes the crops as JPEGs, in parallel."""
+    futures = [_executor.submit(load_area, image, bounds, max_edge, grayscale) for image in (image1, image2)]
+    return tuple(encode_jpeg(future.result(), quality) for future in futures)
+
+
+def compose_pair(image1, image2, bounds, max_edge: int, quality: int, grayscale: bool = False,
+                 gap: int = 8) -> io.BytesIO:
+    """
+    Places the (optionally cropped) images side by side, earlier frame on the left, separated
+    by a white bar, and encodes the result as one JPEG whose longest edge is at most max_edge.
+    """
+    futures = [_executor.submit(load_area, image, bounds, max_edge, grayscale) for image in (image1, image2)]
+    left, right = (future.result() for future in futures)
+    composite = Image.new(left.mode, (left.width + gap + right.width, max(left.height, right.height)), "white")
+    composite.paste(left, (0, 0))
+    composite.paste(right, (left.width + gap, 0))
+    if max_edge:
+        composite.thumbnail((max_edge, max_edge), Image.BICUBIC)
+    return encode_jpeg(composite, quality)
@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "rate-limit:v1"
+
+# Refills and takes tokens in one step on the Redis server, so concurrent processes cannot
+# both spend the same tokens. KEYS[1] is the bucket; ARGV is rate, burst, now, requested, ttl.
+CONSUME_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local now, requested = tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens, updated = tonumber(state[1]), tonumber(state[2])
+if tokens == nil or updated == nil then
+    tokens, updated = burst, now
+end
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local granted = math.min(requested, math.floor(tokens))
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - granted), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[5]))
+return granted
+"""
+
+
+class TokenBucket:
+    """
+    A token bucket per key, stored in a Django cache alias so all workers sharing that cache
+    share the budget. Buckets refill at `rate` tokens per second up to `burst`. On a Redis
+    alias each update runs as one server-side script, so the limit holds across processes;
+    other backends only serialize the read-modify-write within a process. If Redis cannot be
+    reached, requests are let through rather than rejected.
+    """
+
+    def __init__(self, alias: str, rate: float, burst: int, name: str):
+        self.alias = alias
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self) -> int:
+        return int(self.burst / self.rate) + 60
+
+    def consume(self, key: str, requested: int = 1) -> int:
+        """Takes up to `requested` tokens for key and returns how many were granted."""
+        if self.rate <= 0:
+            return requested
+        cache = caches[self.alias]
+        cache_key = f"{KEY_PREFIX}:{self.name}:{key}"
+        if isinstance(cache, RedisCache):
+            return self._consume_redis(cache, cache_key, requested)
+        with self._lock:
+            now = time.time()
+            tokens, updated = cache.get(cache_key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            granted = min(requested, int(tokens))
+            cache.set(cache_key, (tokens - granted, now), timeout=self.timeout)
+        return granted
+
+    def _consume_redis(self, cache: RedisCache, cache_key: str, requested: int) -> int:
+        key = cache.make_and_validate_key(cache_key)
+        try:
+            client = cache._cache.get_client(key, write=True)
+            script = client.register_script(CONSUME_SCRIPT)
+            return int(script(keys=[key], args=[self.rate, self.burst, time.time(), requested, self.timeout]))
+        except Exception as e:
+            logger.warning(f"Rate limit {self.name} is not enforced, Redis failed: {e}")
+            return requested
+
+    def retry_after(self) -> int:
+        return max(1, int(1 / self.rate)) if self.rate > 0 else 0
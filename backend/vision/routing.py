@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/logs/$', consumers.LogConsumer.as_asgi()),
+    re_path(r'ws/device/config/$', consumers.DeviceConfigConsumer.as_asgi()),
 ]
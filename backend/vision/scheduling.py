@@ -0,0 +1,66 @@
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ChangeDetectionLog, DeviceConfiguration
+
+# On an active scene the interval shrinks towards half the configured one; each consecutive
+# unchanged pair doubles it. The delay between the two frames of a pair follows the same
+# factor within these bounds, so slow changes get time to show on quiet scenes.
+MIN_DELAY_FACTOR = 0.5
+MAX_DELAY_FACTOR = 4.0
+
+
+@dataclass
+class CaptureSchedule:
+    capture_interval_seconds: int
+    delay_seconds: int
+    change_rate: float = None
+    quiet_streak: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def recent_scores(config: DeviceConfiguration) -> list:
+    """Difference scores of the device's latest analyses, newest first."""
+    since = timezone.now() - timedelta(hours=settings.CAPTURE_SCHEDULE_WINDOW_HOURS)
+    return list(
+        ChangeDetectionLog.objects
+        .filter(api_key_id=config.api_key_id, created_at__gte=since, difference_score__isnull=False)
+        .order_by("-created_at")
+        .values_list("difference_score", flat=True)[:settings.CAPTURE_SCHEDULE_HISTORY]
+    )
+
+
+def recommend_schedule(config: DeviceConfiguration) -> CaptureSchedule:
+    """
+    Recommends when the device should capture its next pair and how long to wait between
+    the two frames, from how often its recent pairs actually changed.
+    Periodic capture stays off while the configured interval is 0.
+    """
+    base_interval = config.capture_interval_seconds
+    if not base_interval or not config.adaptive_schedule:
+        return CaptureSchedule(base_interval, config.delay_seconds)
+
+    scores = recent_scores(config)
+    if not scores:
+        return CaptureSchedule(base_interval, config.delay_seconds)
+
+    threshold = config.change_threshold or settings.CAPTURE_SCHEDULE_CHANGE_SCORE
+    changed = [score >= threshold for score in scores]
+    change_rate = sum(changed) / len(changed)
+    quiet_streak = changed.index(True) if any(changed) else len(changed)
+
+    if quiet_streak:
+        factor = 2.0 ** quiet_streak
+    else:
+        factor = 1.0 - change_rate / 2
+    interval = round(base_interval * factor)
+    interval = min(max(interval, settings.CAPTURE_SCHEDULE_MIN_INTERVAL), settings.CAPTURE_SCHEDULE_MAX_INTERVAL)
+
+    delay_factor = min(max(interval / base_interval, MIN_DELAY_FACTOR), MAX_DELAY_FACTOR)
+    delay = min(max(1, round(config.delay_seconds * delay_factor)), interval)
+    return CaptureSchedule(interval, delay, round(change_rate, 3), quiet_streak)
@@ -1,21 +1,23 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.urls import reverse
 from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
-from .models import ChangeDetectionLog, DeviceConfiguration
-from .enums import OpenAIVisionModels
+from .models import ChangeDetectionLog, DeviceConfiguration, UploadSession
+from .enums import OpenAIVisionModels, LogLevel
 
 
 class ChangeDetectionLogSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
+    user = serializers.CharField(source='user.username', read_only=True)
     image1_url = serializers.SerializerMethodField()
     image2_url = serializers.SerializerMethodField()
 
     class Meta:
         model = ChangeDetectionLog
         fields = [
-            'id', 'user', 'model_used', 'description', 'created_at',
-            'image1_url', 'image2_url'
+            'id', 'user', 'model_used', 'status', 'description', 'difference_score',
+            'changed_area_percent', 'change_regions', 'payload_mode', 'payload_bytes', 'llm_latency_ms',
+            'created_at', 'image1_url', 'image2_url'
         ]
 
     @extend_schema_field(OpenApiTypes.URI)
@@ -33,6 +35,13 @@ class ChangeDetectionLogSerializer(serializers.ModelSerializer):
         )
 
 
+class ChangeDetectionLogFilterSerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False, help_text="Only logs created at or after this time.")
+    until = serializers.DateTimeField(required=False, help_text="Only logs created before this time.")
+    model = serializers.ChoiceField(choices=OpenAIVisionModels.choices, required=False)
+    device = serializers.CharField(required=False, help_text="Prefix of the API key that submitted the images.")
+
+
 class AnalysisRequestSerializer(serializers.Serializer):
     image1 = serializers.ImageField(required=True)
     image2 = serializers.ImageField(required=True)
@@ -40,8 +49,46 @@ class AnalysisRequestSerializer(serializers.Serializer):
     prompt_context = serializers.CharField(required=False, allow_blank=True)
 
 
+class UploadSessionSerializer(serializers.ModelSerializer):
+    image1_size = serializers.IntegerField(min_value=1, max_value=settings.UPLOAD_MAX_IMAGE_BYTES)
+    image2_size = serializers.IntegerField(min_value=1, max_value=settings.UPLOAD_MAX_IMAGE_BYTES)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'model', 'prompt_context', 'image1_size', 'image2_size', 'image1_received',
+                  'image2_received', 'created_at']
+        read_only_fields = ['id', 'image1_received', 'image2_received', 'created_at']
+
+
+class BatchAnalysisRequestSerializer(serializers.Serializer):
+    """Documents the batch upload form; pairs are read from image1_<key>/image2_<key> fields or an archive."""
+    archive = serializers.FileField(
+        required=False, help_text="A tar or zip file of <key>/image1.jpg, <key>/image2.jpg."
+    )
+    model = serializers.ChoiceField(choices=OpenAIVisionModels.choices, required=False, allow_blank=True)
+    prompt_context = serializers.CharField(required=False, allow_blank=True)
+
+
+class DeviceLogEntrySerializer(serializers.Serializer):
+    message = serializers.CharField(max_length=settings.LOG_MESSAGE_MAX_LENGTH)
+    age_ms = serializers.IntegerField(
+        required=False, min_value=0, help_text="Milliseconds between logging the line and sending the batch."
+    )
+    timestamp = serializers.DateTimeField(required=False, help_text="Client time, for devices with a synced clock.")
+    level = serializers.ChoiceField(
+        choices=LogLevel.choices, required=False, help_text="Inferred from the message text when omitted."
+    )
+
+
+class DeviceLogBatchSerializer(serializers.Serializer):
+    messages = DeviceLogEntrySerializer(many=True, allow_empty=False, max_length=settings.LOG_BATCH_MAX_MESSAGES)
+
+
 class DeviceConfigurationSerializer(serializers.ModelSerializer):
     class Meta:
         model = DeviceConfiguration
-        fields = ['flash_enabled', 'delay_seconds', 'default_model', 'prompt_context', 'updated_at']
-        read_only_fields = ['updated_at']
+        fields = ['flash_enabled', 'delay_seconds', 'capture_interval_seconds', 'adaptive_schedule',
+                  'default_model', 'prompt_context', 'change_threshold', 'motion_threshold',
+                  'preprocess_enabled', 'preprocess_max_edge', 'preprocess_quality', 'preprocess_grayscale',
+                  'payload_mode', 'version', 'updated_at']
+        read_only_fields = ['version', 'updated_at']
@@ -1,72 +1,501 @@
-import requests
-from decouple import config
+import asyncio
 import base64
+import json
 import logging
+import os
+import socket
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import requests
+from asgiref.sync import sync_to_async
+from decouple import config
 from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from urllib3.util.retry import Retry
 from django.utils import timezone
 
+from iot_ai_monitor.metrics import llm_errors_total, llm_requests_total, timer
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
-def get_change_description_from_llm(image1_base64: str, image2_base64: str, model_name: str,
-                                    prompt_context: str) -> str:
-    api_key = config('LLM_API_KEY', default='')
-    api_url = config('LLM_API_URL', default='')
+class LLMServiceError(Exception):
+    """Raised when the LLM service cannot produce a change description."""
 
-    if not api_key or not api_url:
-        logger.warning("LLM service API Key or URL is not configured.")
-        return "LLM service API Key or URL is not configured."
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
+@dataclass
+class LLMReply:
+    text: str
+    payload_bytes: int
+
+
+class StreamingJSONBody:
+    """
+    A re-iterable request body made of literal JSON fragments and binary image files.
+    Images are base64-encoded chunk by chunk while the body is sent, so the full encoded
+    payload never exists in memory. Its length is known up front and sent as Content-Length.
+    Iterated asynchronously, each chunk is read and encoded on a worker thread, not the event loop.
+    """
+    chunk_size = 3 * 16 * 1024
+
+    def __init__(self, parts: list):
+        self.parts = parts
+        self._length = sum(
+            len(part) if isinstance(part, bytes) else 4 * ((_file_size(part) + 2) // 3)
+            for part in parts
+        )
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+            part.seek(0)
+            pending = b""
+            while True:
+                chunk = part.read(self.chunk_size)
+                if not chunk:
+                    break
+                chunk = pending + chunk
+                cut = len(chunk) - len(chunk) % 3
+                pending = chunk[cut:]
+                if cut:
+                    yield base64.b64encode(chunk[:cut])
+            if pending:
+                yield base64.b64encode(pending)
+
+    async def __aiter__(self):
+        chunks = iter(self)
+        next_chunk = sync_to_async(next, thread_sensitive=False)
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+
+
+def _file_size(fileobj) -> int:
+    size = getattr(fileobj, "size", None)
+    if size is not None:
+        return size
+    position = fileobj.tell()
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(position)
+    return size
+
+
+class LLMClientMetrics:
+    """
+    Thread-safe counters for the shared LLM clients.
+    A request that did not have to open a new connection counts as a pool hit.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._connect_times = deque(maxlen=window)
+        self._request_times = deque(maxlen=window)
+        self.requests = 0
+        self.connections = 0
+
+    def record_connect(self, seconds: float):
+        with self._lock:
+            self.connections += 1
+            self._connect_times.append(seconds)
+
+    def record_request(self, seconds: float):
+        with self._lock:
+            self.requests += 1
+            self._request_times.append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._connect_times.clear()
+            self._request_times.clear()
+            self.requests = 0
+            self.connections = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            connect_times = sorted(self._connect_times)
+            request_times = sorted(self._request_times)
+            requests_count = self.requests
+            connections = self.connections
+        pool_hits = max(requests_count - connections, 0)
+        return {
+            "requests": requests_count,
+            "connections_opened": connections,
+            "pool_hits": pool_hits,
+            "pool_hit_ratio": round(pool_hits / requests_count, 4) if requests_count else None,
+            "connect_seconds": _summarize(connect_times),
+            "request_seconds": _summarize(request_times),
+        }
+
+
+def _summarize(sorted_samples: list) -> dict:
+    if not sorted_samples:
+        return {"count": 0, "mean": None, "p50": None, "p99": None}
+
+    def percentile(p):
+        return sorted_samples[min(len(sorted_samples) - 1, int(p * len(sorted_samples)))]
+
+    return {
+        "count": len(sorted_samples),
+        "mean": round(sum(sorted_samples) / len(sorted_samples), 6),
+        "p50": round(percentile(0.50), 6),
+        "p99": round(percentile(0.99), 6),
     }
 
+
+llm_metrics = LLMClientMetrics()
+
+_KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    default_socket_options = _KEEPALIVE_SOCKET_OPTIONS
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        llm_metrics.record_connect(time.perf_counter() - started)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    default_socket_options = _KEEPALIVE_SOCKET_OPTIONS
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        llm_metrics.record_connect(time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class LLMClient:
+    """
+    A reusable, thread-safe client for the LLM service.
+    Connections are kept alive in a sized pool so consecutive analyses skip the TCP/TLS handshake.
+    """
+
+    def __init__(self, api_url: str, api_key: str, pool_maxsize: int = 10, timeout: float = 180,
+                 verify: bool = False):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.verify = verify
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+            "Connection": "keep-alive",
+        })
+        retry_strategy = Retry(
+            total=3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            backoff_factor=1
+        )
+        adapter = _PooledHTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry_strategy,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # A replaced client may still be serving requests, so its pool is closed once the last
+        # user drops it rather than when it is replaced.
+        weakref.finalize(self, self.session.close)
+
+    def post(self, payload) -> dict:
+        """Posts a JSON payload given either as a dict or as a StreamingJSONBody."""
+        if isinstance(payload, StreamingJSONBody):
+            body_kwargs = {"data": payload}
+        else:
+            body_kwargs = {"json": payload}
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.api_url, timeout=self.timeout, verify=self.verify, **body_kwargs)
+        finally:
+            llm_metrics.record_request(time.perf_counter() - started)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncLLMClient:
+    """
+    An awaitable counterpart of LLMClient built on httpx, using HTTP/2 when the `h2` package is installed.
+    Each instance is bound to the event loop it was created on; use get_async_llm_client() to obtain one.
+    """
+
+    def __init__(self, api_url: str, api_key: str, pool_maxsize: int = 10, timeout: float = 180,
+                 verify: bool = False, http2: bool = True):
+        if httpx is None:
+            raise LLMServiceError("The async LLM client requires the 'httpx' package.")
+        self.api_url = api_url
+        self.api_key = api_key
+        self._connect_done_event = (
+            "connection.start_tls.complete" if api_url.startswith("https") else "connection.connect_tcp.complete"
+        )
+        transport = httpx.AsyncHTTPTransport(
+            verify=verify,
+            http2=http2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            retries=3,
+        )
+        self.client = httpx.AsyncClient(
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}",
+            },
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def post(self, payload) -> dict:
+        """Posts a JSON payload given either as a dict or as a StreamingJSONBody."""
+        if isinstance(payload, StreamingJSONBody):
+            # httpx only streams async iterables lazily, so hand it the async iterator explicitly.
+            body_kwargs = {"content": aiter(payload), "headers": {"Content-Length": str(len(payload))}}
+        else:
+            body_kwargs = {"json": payload}
+        connect_started = []
+
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.started":
+                connect_started.append(time.perf_counter())
+            elif event_name == self._connect_done_event and connect_started:
+                llm_metrics.record_connect(time.perf_counter() - connect_started.pop())
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(self.api_url, extensions={"trace": trace}, **body_kwargs)
+        finally:
+            llm_metrics.record_request(time.perf_counter() - started)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def _client_options() -> dict:
+    return {
+        "pool_maxsize": config('LLM_POOL_MAXSIZE', default=10, cast=int),
+        "timeout": config('LLM_TIMEOUT_SECONDS', default=180, cast=float),
+    }
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+_async_client_closers = set()
+
+
+def get_llm_client(api_url: str, api_key: str) -> LLMClient:
+    global _client
+    client = _client
+    if client is not None and client.api_url == api_url and client.api_key == api_key:
+        return client
+    with _client_lock:
+        if _client is None or _client.api_url != api_url or _client.api_key != api_key:
+            _client = LLMClient(api_url, api_key, **_client_options())
+        return _client
+
+
+async def _close_on_loop_shutdown(client: AsyncLLMClient):
+    # asyncio.run() and other well-behaved loop owners cancel pending tasks before closing the loop.
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+
+def get_async_llm_client(api_url: str, api_key: str) -> AsyncLLMClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.api_url != api_url or client.api_key != api_key:
+        client = AsyncLLMClient(
+            api_url, api_key, http2=config('LLM_HTTP2', default=True, cast=bool), **_client_options()
+        )
+        # A replaced client is not closed here, as other tasks may still be awaiting it; like the
+        # current one, it is closed when the loop shuts down.
+        closer = loop.create_task(_close_on_loop_shutdown(client))
+        _async_client_closers.add(closer)
+        closer.add_done_callback(_async_client_closers.discard)
+        _async_clients[loop] = client
+    return client
+
+
+def build_llm_payload(image1_base64: str, image2_base64, model_name: str, prompt_context: str,
+                      image_note: str = "") -> dict:
+    """
+    Builds the Responses API request. image2_base64 may be None when a single composite image
+    is sent; image_note then tells the model how the image(s) are laid out.
+    """
     current_time = timezone.localtime(timezone.now()).strftime('%Y-%m-%d %H:%M:%S')
     time_context = f"System Context: The current time of analysis is {current_time}. Please consider this time in your response."
+    if image_note:
+        time_context = f"{time_context}\n{image_note}"
 
     final_prompt = f"{time_context}\n\nUser's Prompt: {prompt_context}"
 
-    image1_data_uri = f"data:image/jpeg;base64,{image1_base64}"
-    image2_data_uri = f"data:image/jpeg;base64,{image2_base64}"
+    content = [{"type": "input_text", "text": final_prompt}]
+    for image_base64 in (image1_base64, image2_base64):
+        if image_base64 is not None:
+            content.append({"type": "input_image", "image_url": f"data:image/jpeg;base64,{image_base64}"})
 
-    json_payload = {
+    return {
         "model": model_name,
         "input": [
             {
                 "role": "user",
-                "content": [
-                    {"type": "input_text", "text": final_prompt},
-                    {"type": "input_image", "image_url": image1_data_uri},
-                    {"type": "input_image", "image_url": image2_data_uri},
-                ]
+                "content": content,
             }
         ]
     }
 
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=3,
-        status_forcelist=[429, 500, 502, 503, 504],
-        backoff_factor=1
+
+def build_streaming_llm_body(image1, image2, model_name: str, prompt_context: str,
+                             image_note: str = "") -> StreamingJSONBody:
+    """
+    Builds the same request as build_llm_payload, but from binary image files that are
+    base64-encoded lazily while the request is being sent.
+    """
+    token = uuid.uuid4().hex
+    images = [(f"{token}-1", image1)] + ([(f"{token}-2", image2)] if image2 is not None else [])
+    payload = build_llm_payload(
+        images[0][0], images[1][0] if len(images) > 1 else None, model_name, prompt_context, image_note
     )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
+    parts = []
+    rest = json.dumps(payload)
+    for placeholder, image in images:
+        head, rest = rest.split(placeholder, 1)
+        parts += [head.encode(), image]
+    parts.append(rest.encode())
+    return StreamingJSONBody(parts)
 
-    response = None
-    try:
-        response = session.post(api_url, headers=headers, json=json_payload, timeout=180, verify=False)
-        response.raise_for_status()
-        data = response.json()
-        description = data['output'][0]['content'][0]['text']
-        return description
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error calling LLM service: {e}")
-        return "Error connecting to the analysis service."
+def parse_llm_response(data) -> str:
+    try:
+        return data['output'][0]['content'][0]['text']
     except (KeyError, IndexError, TypeError) as e:
-        data_preview = str(response.json())[:200] if 'response' in locals() else "N/A"
+        data_preview = str(data)[:200]
         logger.error(f"Error parsing LLM response structure: {e}. Response preview: {data_preview}")
-        return "Could not parse the response from the analysis service."
+        raise LLMServiceError("Could not parse the response from the analysis service.") from e
+
+
+def _llm_credentials():
+    api_key = config('LLM_API_KEY', default='')
+    api_url = config('LLM_API_URL', default='')
+
+    if not api_key or not api_url:
+        logger.warning("LLM service API Key or URL is not configured.")
+        raise LLMServiceError("LLM service API Key or URL is not configured.")
+    return api_url, api_key
+
+
+def llm_error_type(error: LLMServiceError) -> str:
+    """A short label for what made an LLM request fail, e.g. http_429 or ConnectTimeout."""
+    cause = error.__cause__
+    status_code = getattr(getattr(cause, "response", None), "status_code", None)
+    if status_code:
+        return f"http_{status_code}"
+    return type(cause).__name__ if cause is not None else "not_configured"
+
+
+@contextmanager
+def measure_llm_call(model_name: str):
+    """Records the duration of an LLM request and counts it, and its failure, by model."""
+    llm_requests_total.inc(model=model_name)
+    try:
+        with timer("llm_request"):
+            yield
+    except LLMServiceError as e:
+        llm_errors_total.inc(model=model_name, error=llm_error_type(e))
+        raise
+
+
+def get_change_description_from_llm(image1_base64: str, image2_base64: str, model_name: str,
+                                    prompt_context: str) -> str:
+    try:
+        with measure_llm_call(model_name):
+            api_url, api_key = _llm_credentials()
+            json_payload = build_llm_payload(image1_base64, image2_base64, model_name, prompt_context)
+            return _post_to_llm(api_url, api_key, json_payload)
+    except LLMServiceError as e:
+        return str(e)
+
+
+def request_change_description(image1, image2, model_name: str, prompt_context: str,
+                               image_note: str = "") -> LLMReply:
+    """
+    Asks the LLM to describe the differences between two binary image files, or within a
+    single composite image when image2 is None.
+    Raises LLMServiceError when the service is not configured or cannot be reached.
+    """
+    with measure_llm_call(model_name):
+        api_url, api_key = _llm_credentials()
+        body = build_streaming_llm_body(image1, image2, model_name, prompt_context, image_note)
+        return LLMReply(text=_post_to_llm(api_url, api_key, body), payload_bytes=len(body))
+
+
+def _post_to_llm(api_url: str, api_key: str, payload) -> str:
+    try:
+        data = get_llm_client(api_url, api_key).post(payload)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Error calling LLM service: {e}")
+        raise LLMServiceError("Error connecting to the analysis service.") from e
+    return parse_llm_response(data)
+
+
+async def arequest_change_description(image1, image2, model_name: str, prompt_context: str,
+                                      image_note: str = "") -> LLMReply:
+    with measure_llm_call(model_name):
+        api_url, api_key = _llm_credentials()
+        client = get_async_llm_client(api_url, api_key)
+        body = build_streaming_llm_body(image1, image2, model_name, prompt_context, image_note)
+
+        try:
+            data = await client.post(body)
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Error calling LLM service: {e}")
+            raise LLMServiceError("Error connecting to the analysis service.") from e
+        return LLMReply(text=parse_llm_response(data), payload_bytes=len(body))
@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .device_config import push_device_config
+from .models import ChangeDetectionLog, DeviceConfiguration
+from .storage import lock_content_name
+
+
+def release_image(storage, name: str):
+    """
+    Deletes a stored image once no remaining log references it. The name is locked while it is
+    checked and deleted, so a log storing the same content meanwhile either commits first and
+    is seen here, or writes the file again after it was deleted.
+    """
+    with transaction.atomic():
+        lock_content_name(name)
+        still_referenced = ChangeDetectionLog.objects.filter(Q(image1=name) | Q(image2=name)).exists()
+        if not still_referenced:
+            storage.delete(name)
+
+
+@receiver(post_delete, sender=ChangeDetectionLog)
+def delete_unreferenced_images(sender, instance, **kwargs):
+    # Checked and deleted only once the delete commits: a rolled-back delete keeps its images, and
+    # a log saved meanwhile with the same content-addressed file is seen by the reference check.
+    storage = instance.image1.storage
+    for name in {instance.image1.name, instance.image2.name} - {""}:
+        transaction.on_commit(lambda name=name: release_image(storage, name))
+
+
+@receiver(post_save, sender=DeviceConfiguration)
+def push_saved_device_configuration(sender, instance, created, **kwargs):
+    if created:
+        return
+
+    def push():
+        # Reloaded because the instance's version is still an unresolved F() expression here.
+        config = DeviceConfiguration.objects.filter(pk=instance.pk).first()
+        if config is not None:
+            push_device_config(config)
+
+    transaction.on_commit(push)
@@ -59,13 +59,28 @@ function setupWebSocket() {
     logSocket.onopen = (e) => addLogEntry('--- Connected to Log Server ---', '#007bff');
     logSocket.onmessage = (e) => {
         const data = JSON.parse(e.data);
+        if (data.type === 'analysis') {
+            addLogEntry(`Analysis ${data.status}: ${data.description || ''}`, '#198754');
+            fetchAnalysisHistory();
+            return;
+        }
+        if (data.type === 'log_batch') {
+            data.messages.forEach(entry => {
+                const color = data.replay ? '#6c757d' : (entry.level === 'error' ? '#dc3545' : undefined);
+                addLogEntry(entry.message, color, new Date(entry.timestamp));
+            });
+            if (data.skipped) {
+                addLogEntry(`--- ${data.skipped} messages skipped ---`, '#fd7e14');
+            }
+            return;
+        }
         addLogEntry(data.message);
     };
     logSocket.onclose = (e) => addLogEntry('--- Connection lost. Please refresh. ---', '#dc3545');
     logSocket.onerror = (e) => addLogEntry('--- WebSocket Error ---', '#dc3545');
 
-    function addLogEntry(text, color = '#212529') {
-        const timestamp = new Date().toLocaleTimeString('fa-IR');
+    function addLogEntry(text, color = '#212529', time = new Date()) {
+        const timestamp = time.toLocaleTimeString('fa-IR');
         const newLog = document.createElement('div');
         newLog.className = 'log-entry';
         newLog.style.color = color;
@@ -99,6 +114,15 @@ async function openConfigModal(prefix, name) {
 
         document.getElementById('flash_enabled').checked = config.flash_enabled;
         document.getElementById('delay_seconds').value = config.delay_seconds;
+        document.getElementById('capture_interval_seconds').value = config.capture_interval_seconds;
+        document.getElementById('adaptive_schedule').checked = config.adaptive_schedule;
+        document.getElementById('change_threshold').value = config.change_threshold;
+        document.getElementById('motion_threshold').value = config.motion_threshold;
+        document.getElementById('preprocess_enabled').checked = config.preprocess_enabled;
+        document.getElementById('preprocess_max_edge').value = config.preprocess_max_edge;
+        document.getElementById('preprocess_quality').value = config.preprocess_quality;
+        document.getElementById('preprocess_grayscale').checked = config.preprocess_grayscale;
+        document.getElementById('payload_mode').value = config.payload_mode;
         document.getElementById('prompt_context').value = config.prompt_context || '';
 
         const modelSelect = document.getElementById('default_model');
@@ -127,6 +151,9 @@ async function handleConfigUpdate(event) {
     const formData = new FormData(form);
     const data = Object.fromEntries(formData.entries());
     data.flash_enabled = document.getElementById('flash_enabled').checked;
+    data.adaptive_schedule = document.getElementById('adaptive_schedule').checked;
+    data.preprocess_enabled = document.getElementById('preprocess_enabled').checked;
+    data.preprocess_grayscale = document.getElementById('preprocess_grayscale').checked;
 
     const statusEl = document.getElementById('config-status');
     statusEl.textContent = 'در حال ذخیره...';
@@ -151,21 +178,31 @@ async function handleConfigUpdate(event) {
     }
 }
 
-async function fetchAnalysisHistory() {
+async function fetchAnalysisHistory(pageUrl = null) {
     const historyContainer = document.getElementById('history-container');
     try {
-        const response = await authFetch('/api/vision/logs/');
-        const logs = await response.json();
+        const response = await authFetch(pageUrl || '/api/vision/logs/');
+        const page = await response.json();
 
-        historyContainer.innerHTML = '';
-        if (logs.length === 0) {
-            historyContainer.innerHTML = '<p>هیچ تحلیل سابقی یافت نشد.</p>';
-            return;
+        historyContainer.querySelector('.load-more-btn')?.remove();
+        if (!pageUrl) {
+            historyContainer.innerHTML = '';
+            if (page.results.length === 0) {
+                historyContainer.innerHTML = '<p>هیچ تحلیل سابقی یافت نشد.</p>';
+                return;
+            }
         }
-        logs.forEach(log => {
+        page.results.forEach(log => {
             const card = createHistoryCard(log);
             historyContainer.appendChild(card);
         });
+        if (page.next) {
+            const loadMoreBtn = document.createElement('button');
+            loadMoreBtn.className = 'button button-secondary load-more-btn';
+            loadMoreBtn.textContent = 'نمایش موارد قدیمی‌تر';
+            loadMoreBtn.addEventListener('click', () => fetchAnalysisHistory(page.next));
+            historyContainer.appendChild(loadMoreBtn);
+        }
         setupLazyLoading();
     } catch (error) {
         console.error("Failed to fetch analysis history:", error);
@@ -179,13 +216,15 @@ function createHistoryCard(log) {
     const formattedDate = new Date(log.created_at).toLocaleString('fa-IR', {dateStyle: 'short', timeStyle: 'short'});
     card.innerHTML = `
         <div class="images">
-            <a href="${log.image1_url}" target="_blank"><img class="lazy" loading="lazy" data-src="${log.image1_url}" src="[https://placehold.co/400x300/f8f9fa/dee2e6?text=Loading]..." alt="Before"></a>
-            <a href="${log.image2_url}" target="_blank"><img class="lazy" loading="lazy" data-src="${log.image2_url}" src="[https://placehold.co/400x300/f8f9fa/dee2e6?text=Loading]..." alt="After"></a>
+            <a href="${log.image1_url}" target="_blank"><img class="lazy" loading="lazy" data-src="${log.image1_url}thumb/320/" src="[https://placehold.co/400x300/f8f9fa/dee2e6?text=Loading]..." alt="Before"></a>
+            <a href="${log.image2_url}" target="_blank"><img class="lazy" loading="lazy" data-src="${log.image2_url}thumb/320/" src="[https://placehold.co/400x300/f8f9fa/dee2e6?text=Loading]..." alt="After"></a>
         </div>
         <div class="details">
             <p>${log.description || 'توضیحی ثبت نشده است.'}</p>
             <span><strong>زمان:</strong> ${formattedDate}</span>
             <span><strong>مدل استفاده شده:</strong> ${log.model_used}</span>
+            ${log.difference_score !== null ? `<span><strong>میزان تغییر:</strong> ${log.changed_area_percent}٪ (امتیاز ${log.difference_score})</span>` : ''}
+            ${log.change_regions && log.change_regions.length ? `<span><strong>نواحی تغییر:</strong> ${log.change_regions.length}</span>` : ''}
         </div>
     `;
     return card;
@@ -199,7 +238,7 @@ function setupLazyLoading() {
                 const image = entry.target;
                 const imageUrl = image.dataset.src;
 
-                authFetch(imageUrl)
+                authFetch(imageUrl, {headers: {'Accept': 'image/webp,image/jpeg,*/*'}})
                     .then(response => response.blob())
                     .then(blob => {
                         image.src = URL.createObjectURL(blob);
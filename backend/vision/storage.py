@@ -0,0 +1,118 @@
+import hashlib
+import os
+import re
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.utils import validate_file_name
+from django.db import connection, transaction
+
+CONTENT_NAME_RE = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.[\w]+$")
+
+
+class _AlreadyStored(Exception):
+    pass
+
+
+def lock_content_name(name: str):
+    """
+    Takes a PostgreSQL advisory lock on a stored name until the current transaction ends. Storing
+    a file and releasing it (see vision.signals.release_image) both hold it, so a release cannot
+    delete a file between the dedup check of a new upload and the commit of the row using it.
+    Other databases, such as SQLite in development, get no lock.
+    """
+    if connection.vendor != "postgresql":
+        return
+    key = int(hashlib.sha256(name.encode()).hexdigest()[:15], 16)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [key])
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    A file system storage that names files after the SHA-256 of their content, e.g.
+    ``change_detection/ab/ab12...ef.jpg``. Identical uploads resolve to the same name and are
+    written only once. Several records can therefore share a file, so callers must check for
+    remaining references before deleting one (see vision.signals). Save inside the transaction
+    that inserts the referencing row, so the name stays locked until that row is visible.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        with transaction.atomic(savepoint=False):
+            lock_content_name(name)
+            if not self.exists(name):
+                try:
+                    name = self._save(name, content)
+                except _AlreadyStored:
+                    pass
+        validate_file_name(name, allow_relative_path=True)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Only reached from _save() when a concurrent writer stored the same content first.
+        raise _AlreadyStored(name)
+
+    @staticmethod
+    def content_name(name: str, content) -> str:
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, "seek"):
+            content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower() or ".jpg"
+        return "/".join(part for part in (directory, hexdigest[:2], hexdigest + extension) if part)
+
+    def adopt(self, name: str, path: str) -> str:
+        """
+        Stores a finished file from elsewhere on disk under its content name by renaming it into
+        place, so large uploads are not copied a second time. The source file is consumed.
+        Call it after the referencing row has been committed.
+        """
+        with open(path, "rb") as f:
+            name = self.content_name(name, File(f))
+        with transaction.atomic(savepoint=False):
+            lock_content_name(name)
+            return self._adopt(name, path)
+
+    def _adopt(self, name: str, path: str) -> str:
+        if self.exists(name):
+            os.remove(path)
+            return name
+        target = self.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.replace(path, target)
+        except OSError:
+            # Not on the same file system: fall back to a regular copy.
+            with open(path, "rb") as f:
+                try:
+                    name = self._save(name, File(f))
+                except _AlreadyStored:
+                    pass
+            os.remove(path)
+            return name
+        if self.file_permissions_mode is not None:
+            os.chmod(target, self.file_permissions_mode)
+        return name
+
+    @staticmethod
+    def is_content_name(name: str) -> bool:
+        return bool(CONTENT_NAME_RE.search(name or ""))
+
+
+content_storage = ContentAddressedStorage()
+
+
+def get_image_storage():
+    if settings.CONTENT_ADDRESSED_MEDIA:
+        return content_storage
+    return default_storage
@@ -1,3 +1,93 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from . import services
+from .services import LLMClient, get_async_llm_client, get_llm_client, llm_metrics, parse_llm_response
+
+
+class _StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.connections.add(self.client_address)
+        body = json.dumps({"output": [{"content": [{"text": "No changes."}]}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LLMClientPoolTests(SimpleTestCase):
+    """Runs the shared LLM clients against a local keep-alive stub server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubLLMHandler)
+        cls.server.daemon_threads = True
+        cls.server.connections = set()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1/responses"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.connections.clear()
+        llm_metrics.reset()
+        self.addCleanup(setattr, services, "_client", services._client)
+
+    def test_sync_client_reuses_one_connection(self):
+        client = LLMClient(self.url, "test-key")
+        for _ in range(5):
+            self.assertEqual(parse_llm_response(client.post({"model": "stub"})), "No changes.")
+        client.close()
+
+        stats = llm_metrics.snapshot()
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["pool_hits"], 4)
+        self.assertEqual(stats["pool_hit_ratio"], 0.8)
+        self.assertEqual(stats["connect_seconds"]["count"], 1)
+        self.assertEqual(stats["request_seconds"]["count"], 5)
+
+    def test_replaced_client_stays_usable(self):
+        services._client = None
+        first = get_llm_client(self.url, "first-key")
+        self.assertIs(get_llm_client(self.url, "first-key"), first)
+        first.post({"model": "stub"})
+
+        second = get_llm_client(self.url, "second-key")
+        self.assertIsNot(second, first)
+        # A thread still holding the old client can finish on its pooled connection.
+        first.post({"model": "stub"})
+        self.assertEqual(llm_metrics.snapshot()["connections_opened"], 1)
+
+    def test_async_client_reuses_connection_and_closes_with_loop(self):
+        async def run():
+            client = get_async_llm_client(self.url, "test-key")
+            self.assertIs(get_async_llm_client(self.url, "test-key"), client)
+            for _ in range(3):
+                await client.post({"model": "stub"})
+            return client
+
+        client = asyncio.run(run())
+
+        stats = llm_metrics.snapshot()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["pool_hits"], 2)
+        self.assertTrue(client.client.is_closed)
@@ -0,0 +1,184 @@
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, features
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY_PREFIX = "thumbnail-cache:v1"
+WEBP_SUPPORTED = features.check("webp")
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 80, "optimize": True}),
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.THUMBNAIL_WORKERS,
+    thread_name_prefix="thumbnail",
+)
+
+
+def render_thumbnail(source, size: int, extension: str, destination: str):
+    """Decodes the source at reduced scale and writes a thumbnail fitting size x size."""
+    image_format, save_options = FORMATS[extension]
+    with Image.open(source) as img:
+        img.draft("RGB", (size, size))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((size, size), Image.BICUBIC)
+        img.save(destination, image_format, **save_options)
+
+
+class ThumbnailCache:
+    """
+    Lazily generated thumbnails kept on disk under MEDIA_ROOT/<THUMBNAIL_DIR>, capped at
+    max_bytes. A cache hit bumps the file's mtime, and when the cap is exceeded the least
+    recently used files are removed until the cache is back under 90% of the cap.
+
+    Hit and miss counters live in a Django cache alias so every worker process, and the
+    thumbnail_cache management command, see the same numbers when that alias is shared (Redis).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, stats_alias: str):
+        self.storage = FileSystemStorage()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats_alias = stats_alias
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @property
+    def root(self) -> str:
+        return self.storage.path(self.directory)
+
+    def thumbnail_name(self, source_storage, source_name: str, size: int, extension: str) -> str:
+        if getattr(source_storage, "is_content_name", None) and source_storage.is_content_name(source_name):
+            key = os.path.splitext(os.path.basename(source_name))[0]
+        else:
+            key = hashlib.sha256(source_name.encode()).hexdigest()
+        return f"{self.directory}/{key[:2]}/{key}/{size}.{extension}"
+
+    def get_or_create(self, source_storage, source_name: str, size: int, extension: str) -> str:
+        """Returns the storage name of the thumbnail, rendering it on a worker thread if needed."""
+        name = self.thumbnail_name(source_storage, source_name, size, extension)
+        path = self.storage.path(name)
+        try:
+            os.utime(path)
+            self._count("hits")
+            return name
+        except FileNotFoundError:
+            self._count("misses")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _executor.submit(self._render, source_storage, source_name, size, extension, path).result()
+        return name
+
+    def _render(self, source_storage, source_name: str, size: int, extension: str, path: str):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            with source_storage.open(source_name, "rb") as source:
+                render_thumbnail(source, size, extension, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        self._add_bytes(os.path.getsize(path))
+
+    def _add_bytes(self, size: int):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(entry[2] for entry in self._scan())
+            else:
+                self._total_bytes += size
+            over_cap = self._total_bytes > self.max_bytes
+        if over_cap:
+            self.prune()
+
+    def _scan(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    # A thumbnail still being rendered.
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def prune(self, target_bytes: int = None) -> int:
+        """Deletes least recently used thumbnails until the cache fits target_bytes; returns files removed."""
+        target = int(self.max_bytes * 0.9) if target_bytes is None else target_bytes
+        entries = sorted(self._scan(), key=lambda entry: entry[1])
+        total = sum(entry[2] for entry in entries)
+        removed = 0
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._total_bytes = total
+        if removed:
+            self._count("evictions", removed)
+        return removed
+
+    def _count(self, counter: str, amount: int = 1):
+        cache = caches[self.stats_alias]
+        key = f"{STATS_KEY_PREFIX}:{counter}"
+        try:
+            try:
+                cache.incr(key, amount)
+            except ValueError:
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, amount)
+        except Exception as e:
+            # Statistics are best effort; serving the thumbnail matters more.
+            logger.debug(f"Could not count thumbnail cache {counter}: {e}")
+
+    def stats(self, scan_disk: bool = False) -> dict:
+        cache = caches[self.stats_alias]
+        try:
+            counters = cache.get_many([f"{STATS_KEY_PREFIX}:{name}" for name in ("hits", "misses", "evictions")])
+        except Exception as e:
+            logger.warning(f"Could not read thumbnail cache counters: {e}")
+            counters = {}
+        hits = counters.get(f"{STATS_KEY_PREFIX}:hits", 0)
+        misses = counters.get(f"{STATS_KEY_PREFIX}:misses", 0)
+        total = hits + misses
+        stats = {
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get(f"{STATS_KEY_PREFIX}:evictions", 0),
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+        if scan_disk:
+            entries = list(self._scan())
+            stats["files"] = len(entries)
+            stats["bytes"] = sum(entry[2] for entry in entries)
+            stats["oldest_access"] = time.ctime(min(entry[1] for entry in entries)) if entries else None
+        return stats
+
+
+thumbnail_cache = ThumbnailCache(
+    directory=settings.THUMBNAIL_DIR,
+    max_bytes=settings.THUMBNAIL_CACHE_MAX_BYTES,
+    stats_alias=settings.THUMBNAIL_STATS_CACHE_ALIAS,
+)
@@ -0,0 +1,220 @@
+"""
+Resumable uploads of image pairs. Chunks are appended to staging files at the offset the
+client names; a dropped connection only costs the chunk in flight, and the client resumes
+from the offset the server reports. Committing checks that both images are complete JPEGs
+and moves them into image storage without copying them.
+"""
+import contextlib
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+from .models import ChangeDetectionLog, UploadSession
+from .storage import ContentAddressedStorage
+
+IMAGE_FIELDS = ("image1", "image2")
+COPY_CHUNK_SIZE = 64 * 1024
+JPEG_START = b"\xff\xd8\xff"
+JPEG_END = b"\xff\xd9"
+
+staging_storage = FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, settings.UPLOAD_SESSION_DIR))
+
+
+class UploadOffsetMismatch(Exception):
+    """The chunk does not start where the stored data ends; `received` is where it does."""
+    message = "Expected a chunk at offset {received}."
+
+    def __init__(self, received: int):
+        super().__init__(self.message.format(received=received))
+        self.received = received
+
+
+class UploadChunkInProgress(UploadOffsetMismatch):
+    """Another request is still writing a chunk of the same session."""
+    message = "Another chunk of this upload is still being written; {received} bytes are stored so far."
+
+
+def live_sessions(api_key):
+    """Upload sessions of this API key that have not expired yet."""
+    expires_before = timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+    return UploadSession.objects.filter(api_key=api_key, created_at__gte=expires_before)
+
+
+def staging_path(session: UploadSession, field: str) -> str:
+    return staging_storage.path(f"{session.id}/{field}.part")
+
+
+def write_chunk(session: UploadSession, field: str, offset: int, stream, length: int) -> int:
+    """
+    Writes `length` bytes from stream at `offset` of the staged image and returns how many
+    bytes of it are now stored. A chunk cut short by a dropped connection still counts as far
+    as it got. Raises UploadOffsetMismatch when offset is not the current end of the data.
+
+    The request first claims the session in a short transaction, then reads the body into a
+    file of its own without holding a lock, and finally appends it in a second short
+    transaction if its claim still stands. Concurrent PUTs for the same session get a 409
+    instead of overwriting or truncating each other's bytes, and a stalled client only blocks
+    the session until its claim expires after UPLOAD_CHUNK_CLAIM_SECONDS.
+    """
+    claim = _claim_session(session, field, offset, length)
+    path = staging_path(session, field)
+    chunk_path = f"{path}.{claim}"
+    written = 0
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(chunk_path, "wb") as f:
+            while written < length:
+                data = stream.read(min(COPY_CHUNK_SIZE, length - written))
+                if not data:
+                    break
+                f.write(data)
+                written += len(data)
+        received = _append_chunk(session, field, claim, offset, chunk_path, written)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(chunk_path)
+    setattr(session, f"{field}_received", received)
+    return received
+
+
+def _claim_session(session: UploadSession, field: str, offset: int, length: int) -> uuid.UUID:
+    now = timezone.now()
+    with transaction.atomic():
+        locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+        received = getattr(locked, f"{field}_received")
+        size = getattr(locked, f"{field}_size")
+        if locked.chunk_claim is not None and locked.chunk_claim_expires > now:
+            raise UploadChunkInProgress(received)
+        if offset != received:
+            raise UploadOffsetMismatch(received)
+        if offset + length > size:
+            raise ValidationError({"detail": f"The chunk would exceed the declared size of {field} ({size} bytes)."})
+        locked.chunk_claim = uuid.uuid4()
+        locked.chunk_claim_expires = now + timedelta(seconds=settings.UPLOAD_CHUNK_CLAIM_SECONDS)
+        locked.save(update_fields=["chunk_claim", "chunk_claim_expires", "updated_at"])
+    return locked.chunk_claim
+
+
+def _append_chunk(session: UploadSession, field: str, claim: uuid.UUID, offset: int, chunk_path: str,
+                  written: int) -> int:
+    """Copies a received chunk into the staged image and releases the claim; returns the bytes stored."""
+    with transaction.atomic():
+        try:
+            locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+        except UploadSession.DoesNotExist:
+            raise NotFound("The upload session was deleted while the chunk was being received.")
+        received = getattr(locked, f"{field}_received")
+        if locked.chunk_claim != claim:
+            # The claim expired and another request took over; its data wins.
+            raise UploadOffsetMismatch(received)
+        path = staging_path(session, field)
+        with open(chunk_path, "rb") as source, open(path, "r+b" if os.path.exists(path) else "wb") as target:
+            target.seek(offset)
+            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+            target.truncate()
+        setattr(locked, f"{field}_received", offset + written)
+        locked.chunk_claim = None
+        locked.chunk_claim_expires = None
+        locked.save(update_fields=[f"{field}_received", "chunk_claim", "chunk_claim_expires", "updated_at"])
+    return offset + written
+
+
+def looks_like_jpeg(path: str) -> bool:
+    """Checks the JPEG start and end markers instead of decoding the whole image."""
+    if not os.path.isfile(path) or os.path.getsize(path) < len(JPEG_START) + len(JPEG_END):
+        return False
+    with open(path, "rb") as f:
+        start = f.read(len(JPEG_START))
+        f.seek(-len(JPEG_END), os.SEEK_END)
+        return start == JPEG_START and f.read(len(JPEG_END)) == JPEG_END
+
+
+def commit_session(session: UploadSession, create_log) -> ChangeDetectionLog:
+    """
+    Validates the completed uploads, creates their log with create_log(names), where names are
+    the stored image names keyed by field, and deletes the session. Must run in a transaction:
+    content-addressed images are only moved out of staging once it commits, so a rollback leaves
+    the session and its files as they were.
+    """
+    errors = {}
+    for field in IMAGE_FIELDS:
+        received, size = getattr(session, f"{field}_received"), getattr(session, f"{field}_size")
+        if received != size:
+            errors[field] = f"Only {received} of {size} bytes were uploaded."
+        elif not looks_like_jpeg(staging_path(session, field)):
+            errors[field] = "The upload is not a complete JPEG image."
+    if errors:
+        raise ValidationError(errors)
+
+    session_id = session.id
+    names, staged, copied = {}, [], []
+    try:
+        for field in IMAGE_FIELDS:
+            model_field = ChangeDetectionLog._meta.get_field(field)
+            name = model_field.generate_filename(None, f"{field}.jpg")
+            path = staging_path(session, field)
+            with open(path, "rb") as f:
+                if isinstance(model_field.storage, ContentAddressedStorage):
+                    # The stored name follows from the content, so the file can be moved after the commit.
+                    names[field] = model_field.storage.content_name(name, File(f))
+                    staged.append((model_field.storage, name, path))
+                else:
+                    names[field] = model_field.storage.save(name, File(f))
+                    copied.append((model_field.storage, names[field]))
+        log_instance = create_log(names)
+        session.delete()
+    except Exception:
+        for storage, name in copied:
+            storage.delete(name)
+        raise
+
+    def move_staged_images():
+        for storage, name, path in staged:
+            storage.adopt(name, path)
+        shutil.rmtree(staging_storage.path(str(session_id)), ignore_errors=True)
+
+    transaction.on_commit(move_staged_images)
+    return log_instance
+
+
+def discard_session(session: UploadSession):
+    """Deletes a session and whatever it staged."""
+    shutil.rmtree(staging_storage.path(str(session.id)), ignore_errors=True)
+    session.delete()
+
+
+def clear_expired_sessions() -> int:
+    """Deletes expired sessions and staging directories without a session. Returns the number removed."""
+    expires_before = timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+    removed = 0
+    for session in UploadSession.objects.filter(created_at__lt=expires_before).iterator():
+        discard_session(session)
+        removed += 1
+
+    if os.path.isdir(staging_storage.location):
+        directories, _ = staging_storage.listdir("")
+        known = {str(pk) for pk in UploadSession.objects.filter(pk__in=_as_uuids(directories))
+                 .values_list("pk", flat=True)}
+        for directory in directories:
+            if directory not in known:
+                shutil.rmtree(staging_storage.path(directory), ignore_errors=True)
+                removed += 1
+    return removed
+
+
+def _as_uuids(names) -> list:
+    uuids = []
+    for name in names:
+        try:
+            uuids.append(uuid.UUID(name))
+        except ValueError:
+            pass
+    return uuids
@@ -1,18 +1,34 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     ChangeDetectionViewSet,
     AvailableModelsView,
+    DeviceConfigView,
     LogReceiverView,
+    ProfileDownloadView,
+    ProfileListView,
     ProtectedMediaView,
+    ServiceStatsView,
+    ThumbnailView,
+    UploadSessionViewSet,
 )
 
 router = DefaultRouter()
 router.register(r'logs', ChangeDetectionViewSet, basename='change-detection-log')
+router.register(r'uploads', UploadSessionViewSet, basename='upload-session')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('models/', AvailableModelsView.as_view(), name='available-models'),
     path('log/', LogReceiverView.as_view(), name='log-receiver'),
+    path('device/config/', DeviceConfigView.as_view(), name='device-config'),
+    path('async/log/', async_views.log_receiver, name='async-log-receiver'),
+    path('async/analyze/', async_views.analyze, name='async-analyze'),
+    path('stats/', ServiceStatsView.as_view(), name='service-stats'),
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:name>/', ProfileDownloadView.as_view(), name='profile-download'),
     path('media/<uuid:log_id>/<str:image_field>/', ProtectedMediaView.as_view(), name='protected-media'),
+    path('media/<uuid:log_id>/<str:image_field>/thumb/<int:size>/', ThumbnailView.as_view(),
+         name='protected-media-thumbnail'),
 ]
@@ -1,25 +1,65 @@
-import base64
+import hmac
+import io
+import json
+import os
+from PIL import Image
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.generic import TemplateView
-from django.http import HttpResponse, Http404
-from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.views.generic import TemplateView, View
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, mixins, status, generics, permissions
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authentication import SessionAuthentication
-from rest_framework.exceptions import PermissionDenied
-from authentication.authentication import APIKeyAuthentication
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from authentication.authentication import APIKeyAuthentication, api_key_cache
+from iot_ai_monitor.metrics import metrics, timer
+from iot_ai_monitor.profiling import profile_store
 
-from .enums import OpenAIVisionModels
+from .analysis import AnalysisOptions
+from .batch import ArchiveUploadParser, NDJSONRenderer, collect_pairs, iterate_in_thread, run_batch
+from .caching import result_cache
+from .device_config import device_config_document, etag_matches
+from .device_logs import admit_log_entries, log_rate_limiter, parse_log_entries
+from .enums import OpenAIVisionModels, AnalysisStatus
+from .jobs import enqueue_analysis, start_analysis, AnalysisQueueFull
+from .log_store import device_log_store
+from .media import IgnoreAcceptNegotiation, serve_protected_file
 from .models import ChangeDetectionLog
+from .pagination import ChangeDetectionLogPagination
+from .scheduling import recommend_schedule
 from .serializers import (
     AnalysisRequestSerializer,
+    BatchAnalysisRequestSerializer,
+    ChangeDetectionLogFilterSerializer,
     ChangeDetectionLogSerializer,
+    DeviceLogBatchSerializer,
+    UploadSessionSerializer,
 )
-from .services import get_change_description_from_llm
+from .services import llm_metrics
+from .thumbnails import WEBP_SUPPORTED, thumbnail_cache
+from .uploads import UploadOffsetMismatch, commit_session, discard_session, live_sessions, write_chunk
+
+IMAGE_FIELDS = ("image1", "image2")
+
+
+def analysis_response(request, log_instance, config):
+    """The log as returned by the analysis endpoints: 202 while queued, with the capture schedule."""
+    data = ChangeDetectionLogSerializer(log_instance, context={'request': request}).data
+    data["schedule"] = recommend_schedule(config).as_dict()
+    if log_instance.status == AnalysisStatus.QUEUED:
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+    return Response(data, status=status.HTTP_201_CREATED)
 
 
 class ChangeDetectionViewSet(
@@ -34,14 +74,39 @@ class ChangeDetectionViewSet(
     def get_serializer_class(self):
         if self.action == "create":
             return AnalysisRequestSerializer
+        if self.action == "batch":
+            return BatchAnalysisRequestSerializer
         return ChangeDetectionLogSerializer
 
+    pagination_class = ChangeDetectionLogPagination
+
     def get_queryset(self):
-        return ChangeDetectionLog.objects.filter(user=self.request.user)
+        queryset = ChangeDetectionLog.objects.filter(user=self.request.user)
+        if self.action != "list":
+            return queryset
+
+        filters = ChangeDetectionLogFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        if "since" in params:
+            queryset = queryset.filter(created_at__gte=params["since"])
+        if "until" in params:
+            queryset = queryset.filter(created_at__lt=params["until"])
+        if "model" in params:
+            queryset = queryset.filter(model_used=params["model"])
+        if "device" in params:
+            queryset = queryset.filter(api_key__prefix=params["device"])
+        return queryset.select_related("user").only(
+            "id", "user__username", "model_used", "status", "description",
+            "difference_score", "changed_area_percent", "change_regions", "payload_mode", "payload_bytes",
+            "llm_latency_ms", "created_at",
+        )
 
     @extend_schema(
         summary="List Analysis Logs",
-        description="Retrieves a list of all analysis logs for the authenticated user."
+        description="Retrieves the authenticated user's analysis logs, newest first, one cursor page at a time. "
+                    "Follow the `next` link to load older logs.",
+        parameters=[ChangeDetectionLogFilterSerializer],
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -56,54 +121,224 @@ class ChangeDetectionViewSet(
     @extend_schema(
         summary="Analyze Image Differences",
         description="Upload two images to get an AI-generated description of the differences. You can optionally "
-                    "specify a model and custom prompt context.",
+                    "specify a model and custom prompt context. When asynchronous analysis is enabled the log is "
+                    "returned immediately with status 'queued' and the result is pushed over the log WebSocket. "
+                    "The response also carries the device's recommended capture `schedule`.",
         request=AnalysisRequestSerializer,
-        responses={201: ChangeDetectionLogSerializer}
+        responses={201: ChangeDetectionLogSerializer, 202: ChangeDetectionLogSerializer}
     )
     def create(self, request, *args, **kwargs):
-        input_serializer = self.get_serializer(data=request.data)
-        input_serializer.is_valid(raise_exception=True)
+        with timer("upload_parse"):
+            input_serializer = self.get_serializer(data=request.data)
+            input_serializer.is_valid(raise_exception=True)
 
         try:
             log_instance = self.perform_analysis(request, input_serializer.validated_data)
         except (IOError, FileNotFoundError):
             return Response({"error": "Could not read saved image files after upload."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except permissions.PermissionDenied as e:
-            return Response({"error": str(e)}, status=status.HTTP_403_FORBIDDEN)
+        except PermissionDenied as e:
+            return Response({"error": str(e.detail)}, status=status.HTTP_403_FORBIDDEN)
+        except AnalysisQueueFull as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={"Retry-After": "10"})
 
-        output_serializer = ChangeDetectionLogSerializer(log_instance, context={'request': request})
-        return Response(output_serializer.data, status=status.HTTP_201_CREATED)
+        return analysis_response(request, log_instance, self.get_device_config(request))
 
-    def perform_analysis(self, request, validated_data):
+    def get_device_config(self, request):
         api_key = request.auth
         if not api_key:
-            raise permissions.PermissionDenied("This endpoint can only be used with an API Key.")
+            raise PermissionDenied("This endpoint can only be used with an API Key.")
+        return api_key.config
 
-        config = api_key.config
+    def perform_analysis(self, request, validated_data):
+        config = self.get_device_config(request)
         model_to_use = validated_data.get("model") or config.default_model
-        prompt_context_to_use = (
-                validated_data.get("prompt_context") or config.prompt_context
-        )
+        options = AnalysisOptions.from_config(config, validated_data.get("prompt_context"))
+
+        with timer("db_write"):
+            log_instance = ChangeDetectionLog.objects.create(
+                user=request.user,
+                api_key=request.auth,
+                image1=validated_data['image1'],
+                image2=validated_data['image2'],
+                model_used=model_to_use,
+                status=AnalysisStatus.QUEUED,
+            )
+        return start_analysis(log_instance, options, validated_data['image1'], validated_data['image2'])
 
-        log_instance = ChangeDetectionLog.objects.create(
-            user=request.user,
-            image1=validated_data['image1'],
-            image2=validated_data['image2'],
-            model_used=model_to_use
+    @extend_schema(
+        summary="Analyze a Batch of Image Pairs",
+        description="Upload many image pairs in one request, either as image1_<key>/image2_<key> multipart fields "
+                    "or as a tar/zip archive with <key>/image1.jpg and <key>/image2.jpg members (multipart field "
+                    "'archive' or the raw request body). All pairs are validated together and the analyses run "
+                    "concurrently up to the per-user limit. Request application/x-ndjson (or ?format=ndjson) to "
+                    "stream each result as soon as it finishes. When asynchronous analysis is enabled, the pairs "
+                    "are queued instead: the response is 202 with the queued logs (one NDJSON line each if "
+                    "requested), the per-user limit does not apply and results arrive over the log WebSocket. "
+                    "Pairs the full queue rejected carry an 'error'; if it rejected all of them the response "
+                    "is 503.",
+        request=BatchAnalysisRequestSerializer,
+        responses={200: ChangeDetectionLogSerializer(many=True), 202: ChangeDetectionLogSerializer(many=True),
+                   503: ChangeDetectionLogSerializer(many=True)}
+    )
+    @action(detail=False, methods=['post'], url_path='batch',
+            parser_classes=[MultiPartParser, FormParser, ArchiveUploadParser],
+            renderer_classes=[JSONRenderer, NDJSONRenderer])
+    def batch(self, request, *args, **kwargs):
+        config = self.get_device_config(request)
+        pairs = collect_pairs(request.data)
+        shared = {
+            field: request.data.get(field) or request.query_params.get(field, "")
+            for field in ("model", "prompt_context")
+        }
+        input_serializer = AnalysisRequestSerializer(
+            data=[{**{k: v for k, v in pair.items() if k != "key"}, **shared} for pair in pairs],
+            many=True,
         )
+        input_serializer.is_valid(raise_exception=True)
 
-        with open(log_instance.image1.path, "rb") as f1, open(log_instance.image2.path, "rb") as f2:
-            image1_base64 = base64.b64encode(f1.read()).decode("utf-8")
-            image2_base64 = base64.b64encode(f2.read()).decode("utf-8")
+        options = AnalysisOptions.from_config(config, shared["prompt_context"])
+        model_to_use = shared["model"] or config.default_model
+        logs = ChangeDetectionLog.objects.bulk_create([
+            ChangeDetectionLog(
+                user=request.user,
+                api_key=request.auth,
+                image1=item["image1"],
+                image2=item["image2"],
+                model_used=model_to_use,
+                status=AnalysisStatus.QUEUED,
+            )
+            for item in input_serializer.validated_data
+        ])
+        keys = {log_instance.id: pair["key"] for log_instance, pair in zip(logs, pairs)}
 
-        description = get_change_description_from_llm(
-            image1_base64, image2_base64, model_to_use, prompt_context_to_use
-        )
+        def result(log_instance):
+            data = ChangeDetectionLogSerializer(log_instance, context={'request': request}).data
+            return {"key": keys[log_instance.id], **data}
+
+        if settings.ANALYSIS_ASYNC_ENABLED:
+            # The shared worker pool bounds concurrency here, so the per-user slots are not taken.
+            results, queued = [], 0
+            for log_instance in logs:
+                try:
+                    enqueue_analysis(log_instance, options)
+                    results.append(result(log_instance))
+                    queued += 1
+                except AnalysisQueueFull as e:
+                    results.append({**result(log_instance), "error": str(e)})
+            if not queued:
+                return Response(results, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "10"})
+            return Response(results, status=status.HTTP_202_ACCEPTED)
+
+        jobs = [
+            (log_instance, options, item["image1"], item["image2"])
+            for log_instance, item in zip(logs, input_serializer.validated_data)
+        ]
+        finished = run_batch(request.user.id, jobs)
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            lines = (f"{json.dumps(result(log_instance), cls=DjangoJSONEncoder)}\n" for log_instance in finished)
+            if isinstance(request._request, ASGIRequest):
+                # Django collects a sync iterator into a list under ASGI, which would defeat streaming.
+                lines = iterate_in_thread(lines)
+            return StreamingHttpResponse(lines, content_type=NDJSONRenderer.media_type)
+
+        order = {log_instance.id: index for index, log_instance in enumerate(logs)}
+        results = sorted(finished, key=lambda log_instance: order[log_instance.id])
+        return Response([result(log_instance) for log_instance in results])
+
+
+class UploadSessionViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Resumable pair uploads for devices on unreliable links: open a session with both image
+    sizes, PUT each image in chunks with an `Upload-Offset` header, then commit the session.
+    After a dropped connection, GET the session to learn how much of each image arrived.
+    """
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = UploadSessionSerializer
+
+    def get_queryset(self):
+        return live_sessions(self.request.auth)
+
+    @extend_schema(
+        summary="Open a Resumable Upload",
+        description="Declares the byte sizes of both JPEG images and optionally the model and prompt context "
+                    "for the analysis. Each API key may have a limited number of open sessions.",
+    )
+    def create(self, request, *args, **kwargs):
+        if live_sessions(request.auth).count() >= settings.UPLOAD_SESSIONS_PER_KEY:
+            return Response({"error": "Too many open upload sessions for this device."},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS)
+        return super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, api_key=self.request.auth)
+
+    def perform_destroy(self, instance):
+        discard_session(instance)
 
-        log_instance.description = description
-        log_instance.save()
-        return log_instance
+    @extend_schema(
+        summary="Upload an Image Chunk",
+        description="Writes the raw request body at the byte offset given in the `Upload-Offset` header, which "
+                    "must equal the number of bytes already received for that image. A mismatch, or another "
+                    "chunk of the session still being written, returns 409 with the offset to resume from.",
+        request={'application/octet-stream': {'type': 'string', 'format': 'binary'}},
+        responses={200: UploadSessionSerializer, 409: None},
+    )
+    @action(detail=True, methods=['put'], url_path=r'(?P<image_field>image[12])')
+    def chunk(self, request, pk=None, image_field=None):
+        session = self.get_object()
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.headers.get("Content-Length", ""))
+        except ValueError:
+            return Response({"error": "Upload-Offset and Content-Length headers are required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            received = write_chunk(session, image_field, offset, request.stream or io.BytesIO(), length)
+        except UploadOffsetMismatch as e:
+            return Response({"error": str(e), "received": e.received}, status=status.HTTP_409_CONFLICT,
+                            headers={"Upload-Offset": str(e.received)})
+        return Response(self.get_serializer(session).data, headers={"Upload-Offset": str(received)})
+
+    @extend_schema(
+        summary="Commit a Resumable Upload",
+        description="Checks that both images are complete JPEG files, stores them and starts the analysis. "
+                    "Responds like the single-pair analysis endpoint.",
+        request=None,
+        responses={201: ChangeDetectionLogSerializer, 202: ChangeDetectionLogSerializer},
+    )
+    @action(detail=True, methods=['post'])
+    def commit(self, request, pk=None):
+        config = request.auth.config
+        with transaction.atomic():
+            session = self.get_queryset().select_for_update().get(pk=self.get_object().pk)
+            log_instance = commit_session(session, lambda names: ChangeDetectionLog.objects.create(
+                user=request.user,
+                api_key=request.auth,
+                image1=names["image1"],
+                image2=names["image2"],
+                model_used=session.model or config.default_model,
+                status=AnalysisStatus.QUEUED,
+            ))
+
+        options = AnalysisOptions.from_config(config, session.prompt_context)
+        try:
+            log_instance = start_analysis(log_instance, options)
+        except OSError:
+            return Response({"error": "Could not read saved image files after upload."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except AnalysisQueueFull as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={"Retry-After": "10"})
+        return analysis_response(request, log_instance, config)
 
 
 @extend_schema(
@@ -134,31 +369,129 @@ class AvailableModelsView(APIView):
 
 
 @extend_schema(
-    summary="Submit a Log Entry from Device",
-    request={'application/json': {'type': 'object', 'properties': {'message': {'type': 'string'}}}},
-    responses={204: None}
+    summary="Get Device Configuration",
+    description="Returns the configuration of the calling device's API key, plus a `schedule` with the "
+                "recommended interval until the next capture and the delay between its two frames. The "
+                "schedule adapts to how often the device's recent pairs actually changed. Send the `ETag` "
+                "back in `If-None-Match` to get an empty 304 while nothing changed. Devices that keep "
+                "`ws/device/config/` open receive every change as it is saved instead of polling.",
+    responses={200: {'type': 'object'}, 304: None}
+)
+class DeviceConfigView(APIView):
+    authentication_classes = [APIKeyAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        data, etag = device_config_document(request.auth.config)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(data, headers={"ETag": etag})
+
+
+@extend_schema(
+    summary="Service Statistics",
+    description="Runtime statistics of this server process, such as LLM connection pool usage and "
+                "analysis cache hit rates. Staff only.",
+    responses={200: {'type': 'object'}}
+)
+class ServiceStatsView(APIView):
+    authentication_classes = [SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "llm_client": llm_metrics.snapshot(),
+            "analysis_cache": result_cache.stats(),
+            "api_key_cache": api_key_cache.stats(),
+            "thumbnail_cache": thumbnail_cache.stats(),
+            "device_log_store": device_log_store.stats(),
+        })
+
+
+class MetricsView(View):
+    """
+    Serves this process's metrics in the Prometheus text format, to scrapers presenting
+    METRICS_TOKEN as a bearer token or to logged-in staff.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not metrics.enabled:
+            raise Http404("Metrics are disabled.")
+        if not self.is_allowed(request):
+            return HttpResponse("Forbidden.", status=403, content_type="text/plain")
+        return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @staticmethod
+    def is_allowed(request) -> bool:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if settings.METRICS_TOKEN and scheme.lower() == "bearer":
+            return hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
+        return request.user.is_authenticated and request.user.is_staff
+
+
+class ProfileListView(APIView):
+    """Lists the stored request profiles, newest first."""
+    authentication_classes = [SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response([
+            {**entry, "url": request.build_absolute_uri(f"{entry['name']}/")}
+            for entry in profile_store.entries()
+        ])
+
+
+class ProfileDownloadView(APIView):
+    """Downloads one stored profile as a collapsed-stack file for flamegraph tools."""
+    authentication_classes = [SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, name, *args, **kwargs):
+        path = profile_store.path(name)
+        if path is None:
+            raise Http404("No such profile.")
+        return FileResponse(path.open("rb"), as_attachment=True, filename=name, content_type="text/plain")
+
+
+@extend_schema(
+    summary="Submit Log Entries from Device",
+    description="Accepts a single `message` or a batch of `messages`, each with an optional `age_ms` "
+                "(how long ago the device logged it) or absolute `timestamp`. A batch is forwarded to the "
+                "dashboard as one event. Each API key has a token-bucket budget; when it is exhausted the "
+                "batch is sampled down and the dashboard is told how many lines were dropped.",
+    request={'application/json': {'oneOf': [
+        {'type': 'object', 'properties': {'message': {'type': 'string'}}},
+        DeviceLogBatchSerializer,
+    ]}},
+    responses={200: None, 204: None, 429: None}
 )
 class LogReceiverView(APIView):
     authentication_classes = [APIKeyAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        message = request.data.get("message")
-        if message:
-            user = request.user
-            api_key_object = request.auth
-            channel_layer = get_channel_layer()
-            group_name = f"user_{user.id}_logs"
-            log_payload = {
-                "type": "log.message",
-                "prefix": api_key_object.prefix,
-                "message": message,
-            }
-            async_to_sync(channel_layer.group_send)(group_name, log_payload)
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(
-            {"error": "Message not provided"}, status=status.HTTP_400_BAD_REQUEST
-        )
+        try:
+            entries, is_batch = parse_log_entries(request.data)
+        except ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        batch = admit_log_entries(entries, is_batch, request.auth.prefix)
+        if batch.event is None:
+            return Response(
+                {"error": "Log rate limit exceeded.", "accepted": 0, "dropped": batch.dropped},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(log_rate_limiter.retry_after())},
+            )
+
+        channel_layer = get_channel_layer()
+        group_name = f"user_{request.user.id}_logs"
+        with timer("log_group_send"):
+            async_to_sync(channel_layer.group_send)(group_name, batch.event)
+        device_log_store.append(request.user.id, batch.event)
+
+        if batch.is_batch:
+            return Response({"accepted": batch.accepted, "dropped": batch.dropped}, status=status.HTTP_200_OK)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -172,23 +505,52 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 class ProtectedMediaView(APIView):
     authentication_classes = [SessionAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = IgnoreAcceptNegotiation
 
-    def get(self, request, log_id, image_field):
-        log = get_object_or_404(ChangeDetectionLog, id=log_id)
+    def get_image_name(self, request, log_id, image_field):
+        if image_field not in IMAGE_FIELDS:
+            raise Http404("Image not found.")
 
-        if log.user != request.user:
+        # One primary-key lookup that reads only the owner and the file name.
+        row = ChangeDetectionLog.objects.filter(id=log_id).values_list("user_id", image_field).first()
+        if row is None:
+            raise Http404("Image not found.")
+        user_id, name = row
+        if user_id != request.user.id:
             raise PermissionDenied("You do not have permission to access this file.")
-
-        if image_field == 'image1' and log.image1:
-            image_file = log.image1
-        elif image_field == 'image2' and log.image2:
-            image_file = log.image2
-        else:
+        if not name:
             raise Http404("Image not found.")
+        return name
+
+    def get(self, request, log_id, image_field):
+        name = self.get_image_name(request, log_id, image_field)
+        storage = ChangeDetectionLog._meta.get_field(image_field).storage
+        return serve_protected_file(request, storage, name)
+
+
+@extend_schema(
+    summary="Serve a Thumbnail of a Protected Image",
+    description="Returns the image scaled to fit size x size pixels, as WebP when the client accepts it and "
+                "JPEG otherwise. Thumbnails are generated on first request and kept in a bounded disk cache.",
+    responses={200: {'type': 'string', 'format': 'binary'}}
+)
+class ThumbnailView(ProtectedMediaView):
+
+    def get(self, request, log_id, image_field, size):
+        if size not in settings.THUMBNAIL_SIZES:
+            raise Http404("Unsupported thumbnail size.")
+        name = self.get_image_name(request, log_id, image_field)
+        storage = ChangeDetectionLog._meta.get_field(image_field).storage
+        extension = "webp" if WEBP_SUPPORTED and "image/webp" in request.headers.get("Accept", "") else "jpg"
 
         try:
-            with image_file.open('rb') as f:
-                return HttpResponse(f.read(), content_type='image/jpeg')
-        except IOError:
+            thumbnail_name = thumbnail_cache.get_or_create(storage, name, size, extension)
+        except (OSError, Image.DecompressionBombError):
             raise Http404("Image file could not be opened.")
 
+        etag = f'"{os.path.basename(os.path.dirname(thumbnail_name))}-{size}-{extension}"'
+        response = serve_protected_file(
+            request, thumbnail_cache.storage, thumbnail_name, max_age=settings.THUMBNAIL_MAX_AGE, etag=etag
+        )
+        patch_vary_headers(response, ["Accept"])
+        return response
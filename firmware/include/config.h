@@ -7,8 +7,37 @@
 extern char DJANGO_BASE_URL[100];
 extern const char* LOG_ENDPOINT;
 extern const char* ANALYZE_ENDPOINT;
+extern const char* DEVICE_CONFIG_ENDPOINT;
+extern const char* UPLOAD_ENDPOINT;
+extern const char* DEVICE_CONFIG_SOCKET_ENDPOINT;
 extern char API_KEY[65];
 
+// Log batching: lines buffered on the device and the maximum time they wait before sending
+#define LOG_BUFFER_CAPACITY 16
+#define LOG_FLUSH_INTERVAL_MS 2000
+
+// Capture schedule: how often the device re-reads its configuration from the server while the
+// configuration socket is down, how soon it reopens the socket, and its ping interval
+#define CONFIG_REFRESH_INTERVAL_MS 600000
+#define CONFIG_SOCKET_RECONNECT_MS 5000
+#define CONFIG_SOCKET_PING_MS 30000
+
+// Server connection: one keep-alive connection is shared by all requests. How long a request
+// waits for the response, and the largest response body that is read into memory
+#define SERVER_RESPONSE_TIMEOUT_MS 10000
+#define SERVER_RESPONSE_MAX_LENGTH 8192
+
+// Resumable uploads: send each image in chunks of this size through an upload session, so a
+// dropped connection only repeats the chunk in flight. Set to 0 to use a single multipart POST.
+#define UPLOAD_RESUMABLE 1
+#define UPLOAD_CHUNK_SIZE 16384
+#define UPLOAD_CHUNK_RETRIES 5
+
+// Motion gate: probe frames are decoded at 1/8 scale and averaged over tiles of this many
+// pixels per side before being compared with the last uploaded frame
+#define MOTION_GATE_BLOCK_SIZE 4
+#define MOTION_GATE_MAX_BLOCKS 512
+
 // Flash Configuration
 extern const bool ENABLE_FLASH;
 #define FLASH_GPIO_PIN 4
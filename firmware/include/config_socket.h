@@ -0,0 +1,23 @@
+#ifndef CONFIG_SOCKET_H
+#define CONFIG_SOCKET_H
+
+#include <Arduino.h>
+
+/**
+ *  @brief open the WebSocket on which the server pushes this device's configuration.
+ *  The ETag of the last received configuration is sent along, so an unchanged configuration
+ *  is not transferred again after a reconnect.
+ */
+void beginConfigSocket();
+
+/**
+ *  @brief service the configuration socket and reopen it after a disconnect; call from loop().
+ */
+void handleConfigSocket();
+
+/**
+ *  @brief true while the server can push configuration changes, so polling is unnecessary.
+ */
+bool isConfigSocketConnected();
+
+#endif
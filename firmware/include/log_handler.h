@@ -4,8 +4,20 @@
 #include <Arduino.h>
 
 /**
- *  @brief send log to server to display real-time logs
+ *  @brief queue a log line for the server's real-time log view.
+ *  Lines are kept in a ring buffer and sent in batches; a full buffer is flushed immediately.
  */
 void sendLogToServer(const String& message);
 
-#endif
\ No newline at end of file
+/**
+ *  @brief send all buffered log lines to the server in one request.
+ *  @return true if the buffer is empty afterwards.
+ */
+bool flushLogs();
+
+/**
+ *  @brief flush buffered log lines once LOG_FLUSH_INTERVAL_MS has passed; call from loop().
+ */
+void handleLogFlush();
+
+#endif
@@ -0,0 +1,23 @@
+#ifndef MOTION_HANDLER_H
+#define MOTION_HANDLER_H
+
+#include "esp_camera.h"
+
+/**
+ *  @brief set the share of the frame (0-1) that must change before a scheduled pair is uploaded.
+ *  0 disables the gate. The value comes from the server's device configuration.
+ */
+void setMotionThreshold(float threshold);
+
+/**
+ *  @brief capture a probe frame and compare it with the last uploaded one.
+ *  @return true if the scene changed enough (or the gate is off) and a pair should be uploaded.
+ */
+bool motionDetected();
+
+/**
+ *  @brief remember a frame that was uploaded as the reference for later probes.
+ */
+void rememberMotionReference(camera_fb_t* fb);
+
+#endif
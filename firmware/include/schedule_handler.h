@@ -0,0 +1,25 @@
+#ifndef SCHEDULE_HANDLER_H
+#define SCHEDULE_HANDLER_H
+
+#include <Arduino.h>
+
+/**
+ *  @brief fetch this device's configuration from the server and apply its capture schedule.
+ *  @return true if a schedule was received.
+ */
+bool fetchDeviceSchedule();
+
+/**
+ *  @brief apply the capture settings found in a JSON response body: the "schedule" object,
+ *  which the analysis endpoint returns with every result, and the device's motion threshold.
+ */
+void applyCaptureSettings(const String& body);
+
+/**
+ *  @brief capture and send a pair when the scheduled interval has passed and the motion gate
+ *  lets it through, and refresh the settings every CONFIG_REFRESH_INTERVAL_MS while the
+ *  configuration socket is down; call from loop().
+ */
+void handleScheduledCapture();
+
+#endif
@@ -0,0 +1,69 @@
+#ifndef SERVER_CONNECTION_H
+#define SERVER_CONNECTION_H
+
+#include <Arduino.h>
+
+/**
+ *  @brief a request body made of several memory buffers, sent in order without copying them.
+ */
+class PartsStream : public Stream {
+public:
+    static const size_t MAX_PARTS = 5;
+
+    void add(const uint8_t* data, size_t length);
+    void add(const String& text);
+    void rewind();
+    size_t length() const;
+
+    int available() override;
+    int read() override;
+    int peek() override;
+    size_t readBytes(char* buffer, size_t length) override;
+    size_t write(uint8_t) override { return 0; }
+
+private:
+    const uint8_t* parts[MAX_PARTS];
+    size_t lengths[MAX_PARTS];
+    size_t count = 0;
+    size_t part = 0;
+    size_t offset = 0;
+};
+
+struct ServerRequest {
+    ServerRequest(const char* method, const String& path) : method(method), path(path) {}
+
+    const char* method;
+    String path;                        // relative to DJANGO_BASE_URL
+    const char* contentType = nullptr;
+    const uint8_t* payload = nullptr;
+    size_t size = 0;
+    PartsStream* body = nullptr;        // used instead of payload when set
+    const char* header = nullptr;       // one optional extra request header
+    String headerValue;
+};
+
+struct ServerResponse {
+    int code = 0;                       // HTTP status, or a negative HTTPC_ERROR_* code
+    String body;
+    String uploadOffset;                // the Upload-Offset response header, if any
+};
+
+/**
+ *  @brief send a request to the server over the shared keep-alive connection.
+ *  The connection to DJANGO_BASE_URL is opened on first use and kept open between analysis,
+ *  log and configuration calls, so only the first request pays the TCP (and TLS) handshake.
+ *  A request that fails on a reused connection, e.g. because the server closed it while idle,
+ *  is retried once on a new one. Every request logs its duration and whether it reused the
+ *  connection.
+ *
+ *  WiFiClientSecure does not expose TLS session resumption, so a dropped HTTPS connection
+ *  costs a full handshake; keeping the connection open is what avoids it.
+ */
+ServerResponse sendServerRequest(const ServerRequest& request);
+
+/**
+ *  @brief close the shared connection; the next request opens a new one.
+ */
+void closeServerConnection();
+
+#endif
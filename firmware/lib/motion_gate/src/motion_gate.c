@@ -0,0 +1,68 @@
+#include "motion_gate.h"
+
+size_t motion_gate_block_means(const uint8_t *gray, uint16_t width, uint16_t height, uint8_t block,
+                               uint8_t *out, size_t capacity) {
+    if (block == 0) {
+        return 0;
+    }
+    size_t cols = width / block;
+    size_t rows = height / block;
+    size_t count = cols * rows;
+    if (count == 0 || count > capacity) {
+        return 0;
+    }
+
+    uint32_t area = (uint32_t)block * block;
+    for (size_t row = 0; row < rows; row++) {
+        for (size_t col = 0; col < cols; col++) {
+            uint32_t sum = 0;
+            const uint8_t *tile = gray + row * block * (size_t)width + col * block;
+            for (uint8_t y = 0; y < block; y++) {
+                const uint8_t *line = tile + y * (size_t)width;
+                for (uint8_t x = 0; x < block; x++) {
+                    sum += line[x];
+                }
+            }
+            out[row * cols + col] = (uint8_t)((sum + area / 2) / area);
+        }
+    }
+    return count;
+}
+
+float motion_gate_difference(const uint8_t *reference, const uint8_t *current, size_t count) {
+    if (count == 0) {
+        return 0.0f;
+    }
+
+    // The median block delta is the brightness shift: unlike the mean, it is not dragged
+    // along by a large local change, which would make the unchanged blocks look changed.
+    uint16_t histogram[511] = {0};
+    for (size_t i = 0; i < count; i++) {
+        histogram[(int32_t)current[i] - reference[i] + 255]++;
+    }
+    int32_t shift = -255;
+    size_t seen = 0;
+    for (int32_t bin = 0; bin < 511; bin++) {
+        seen += histogram[bin];
+        if (seen * 2 >= count) {
+            shift = bin - 255;
+            break;
+        }
+    }
+
+    size_t changed = 0;
+    for (size_t i = 0; i < count; i++) {
+        int32_t delta = (int32_t)current[i] - reference[i] - shift;
+        if (delta > MOTION_GATE_BLOCK_DELTA || delta < -MOTION_GATE_BLOCK_DELTA) {
+            changed++;
+        }
+    }
+    return (float)changed / (float)count;
+}
+
+bool motion_gate_changed(const uint8_t *reference, const uint8_t *current, size_t count, float threshold) {
+    if (threshold <= 0.0f || count == 0) {
+        return true;
+    }
+    return motion_gate_difference(reference, current, count) >= threshold;
+}
@@ -0,0 +1,47 @@
+#ifndef MOTION_GATE_H
+#define MOTION_GATE_H
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+/*
+ * Hardware-independent motion gate. A frame is reduced to the mean brightness of each
+ * block x block tile (its "signature"); two signatures are compared block by block after
+ * removing the global (median) brightness shift, so auto-exposure changes do not count as motion.
+ */
+
+// A block counts as changed when its compensated mean differs by more than this many grey levels.
+#define MOTION_GATE_BLOCK_DELTA 12
+
+/**
+ *  @brief reduce an 8-bit grayscale frame to block means, row by row.
+ *  Partial tiles at the right and bottom edges are ignored.
+ *  @return the number of means written, or 0 if the frame is smaller than one block or
+ *  the signature would not fit into capacity.
+ */
+size_t motion_gate_block_means(const uint8_t *gray, uint16_t width, uint16_t height, uint8_t block,
+                               uint8_t *out, size_t capacity);
+
+/**
+ *  @brief fraction (0-1) of blocks that changed between two signatures of the same length
+ *  (at most 65535 blocks).
+ */
+float motion_gate_difference(const uint8_t *reference, const uint8_t *current, size_t count);
+
+/**
+ *  @brief decide whether a frame is worth uploading.
+ *  @return true when the changed fraction reaches threshold. A threshold of 0 or less, or a
+ *  missing reference (count 0), always passes.
+ */
+bool motion_gate_changed(const uint8_t *reference, const uint8_t *current, size_t count, float threshold);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif
@@ -1,17 +1,15 @@
 #include "ai_handler.h"
 #include "config.h"
 #include "camera_handler.h"
-#include <WiFiClient.h>
-#include <WiFiClientSecure.h>
+#include "schedule_handler.h"
+#include "motion_handler.h"
+#include "server_connection.h"
+#include <Arduino_JSON.h>
 
-struct ServerInfo {
-    String host;
-    int port;
-    String path;
-};
-
-bool parseUrl(const char* url_str, ServerInfo &info);
 String generateBoundary();
+static void sendImagesMultipart(camera_fb_t* fb1, camera_fb_t* fb2);
+static void sendImagesResumable(camera_fb_t* fb1, camera_fb_t* fb2);
+static void handleAnalysisResponse(int httpCode, const String& body, camera_fb_t* fb2);
 
 void sendImagesToServer(int delaySeconds) {
     camera_fb_t* fb1 = captureImage();
@@ -29,105 +27,122 @@ void sendImagesToServer(int delaySeconds) {
         return;
     }
 
-    String full_analyze_url = String(DJANGO_BASE_URL) + String(ANALYZE_ENDPOINT);
-    ServerInfo server;
-    if (!parseUrl(full_analyze_url.c_str(), server)) {
-        Serial.println("Failed to parse server URL.");
-        esp_camera_fb_return(fb1);
-        esp_camera_fb_return(fb2);
-        return;
-    }
-    
-    Client* client;
-    WiFiClient httpClient;
-    WiFiClientSecure httpsClient;
-
-    if (server.port == 443) {
-        httpsClient.setInsecure();
-        client = &httpsClient;
-    } else {
-        client = &httpClient;
-    }
-    
-    Serial.printf("Connecting to host: %s, port: %d\n", server.host.c_str(), server.port);
+#if UPLOAD_RESUMABLE
+    sendImagesResumable(fb1, fb2);
+#else
+    sendImagesMultipart(fb1, fb2);
+#endif
 
-    if (!client->connect(server.host.c_str(), server.port)) {
-        Serial.println("Connection failed!");
-        esp_camera_fb_return(fb1);
-        esp_camera_fb_return(fb2);
-        return;
-    }
+    esp_camera_fb_return(fb1);
+    esp_camera_fb_return(fb2);
+}
 
+static void sendImagesMultipart(camera_fb_t* fb1, camera_fb_t* fb2) {
     String boundary = generateBoundary();
     String head_part1 = "--" + boundary + "\r\nContent-Disposition: form-data; name=\"image1\"; filename=\"image1.jpg\"\r\nContent-Type: image/jpeg\r\n\r\n";
     String head_part2 = "\r\n--" + boundary + "\r\nContent-Disposition: form-data; name=\"image2\"; filename=\"image2.jpg\"\r\nContent-Type: image/jpeg\r\n\r\n";
     String tail_part = "\r\n--" + boundary + "--\r\n";
-    
-    uint32_t total_len = head_part1.length() + fb1->len + head_part2.length() + fb2->len + tail_part.length();
-    
-    client->printf("POST %s HTTP/1.1\r\n", server.path.c_str());
-    client->printf("Host: %s\r\n", server.host.c_str());
-    client->printf("X-Api-Key: %s\r\n", API_KEY);
-    client->println("Connection: close");
-    client->printf("Content-Length: %u\r\n", total_len);
-    client->printf("Content-Type: multipart/form-data; boundary=%s\r\n", boundary.c_str());
-    client->println();
-
-    client->print(head_part1);
-    client->write(fb1->buf, fb1->len);
-    client->print(head_part2);
-    client->write(fb2->buf, fb2->len);
-    client->print(tail_part);
-
-    Serial.println("Request sent. Waiting for response...");
-
-    unsigned long timeout = millis();
-    while (client->available() == 0) {
-        if (millis() - timeout > 10000) {
-            Serial.println(">>> Client Timeout !");
-            client->stop();
-            break;
-        }
+    String content_type = "multipart/form-data; boundary=" + boundary;
+
+    PartsStream body;
+    body.add(head_part1);
+    body.add(fb1->buf, fb1->len);
+    body.add(head_part2);
+    body.add(fb2->buf, fb2->len);
+    body.add(tail_part);
+
+    ServerRequest request("POST", ANALYZE_ENDPOINT);
+    request.contentType = content_type.c_str();
+    request.body = &body;
+    ServerResponse response = sendServerRequest(request);
+
+    Serial.printf("Server Response (%d):\n", response.code);
+    Serial.println(response.body);
+    handleAnalysisResponse(response.code, response.body, fb2);
+}
+
+static void handleAnalysisResponse(int httpCode, const String& body, camera_fb_t* fb2) {
+    if (body.length() > 0) {
+        applyCaptureSettings(body);
     }
-    
-    Serial.println("Server Response:");
-    while(client->available()) {
-        Serial.write(client->read());
+    if (httpCode >= 200 && httpCode < 300) {
+        rememberMotionReference(fb2);
     }
+}
 
-    client->stop();
-    esp_camera_fb_return(fb1);
-    esp_camera_fb_return(fb2);
+// Asks the server how many bytes of an image it has stored; -1 when the session is unreachable.
+static long fetchReceivedBytes(const String& sessionPath, const char* field) {
+    ServerResponse response = sendServerRequest(ServerRequest("GET", sessionPath));
+    if (response.code != 200) {
+        return -1;
+    }
+    JSONVar session = JSON.parse(response.body);
+    String key = String(field) + "_received";
+    if (JSON.typeof(session) != "object" || !session.hasOwnProperty(key.c_str())) {
+        return -1;
+    }
+    return (long)session[key.c_str()];
 }
 
-bool parseUrl(const char* url_str, ServerInfo &info) {
-    String url = String(url_str);
+static bool uploadImage(const String& sessionPath, const char* field, camera_fb_t* fb) {
+    size_t offset = 0;
+    int failures = 0;
+
+    while (offset < fb->len) {
+        size_t length = min((size_t)UPLOAD_CHUNK_SIZE, fb->len - offset);
+        ServerRequest request("PUT", sessionPath + field + "/");
+        request.contentType = "application/octet-stream";
+        request.payload = fb->buf + offset;
+        request.size = length;
+        request.header = "Upload-Offset";
+        request.headerValue = String(offset);
+        ServerResponse response = sendServerRequest(request);
+
+        if (response.code == 200 || response.code == 409) {
+            // 409 means the server has a different amount than we thought; resume from its offset.
+            offset = response.uploadOffset.length() > 0 ? response.uploadOffset.toInt() : offset + length;
+            failures = 0;
+            continue;
+        }
 
-    if (url.startsWith("https://")) {
-        info.port = 443;
-    } else if (url.startsWith("http://")) {
-        info.port = 80;
-    } else {
-        Serial.println("Invalid URL: Protocol (http:// or https://) is missing.");
-        return false;
+        Serial.printf("Chunk upload of %s at %u failed. HTTP Code: %d\n", field, offset, response.code);
+        if (++failures > UPLOAD_CHUNK_RETRIES) {
+            return false;
+        }
+        delay(500 * failures);
+        long received = fetchReceivedBytes(sessionPath, field);
+        if (received >= 0) {
+            offset = received;
+        }
     }
+    return true;
+}
 
-    int protocol_end_index = url.indexOf("://") + 3;
-    int host_end_index = url.indexOf('/', protocol_end_index);
-    if (host_end_index == -1) {
-        info.host = url.substring(protocol_end_index);
-        info.path = "/";
-    } else {
-        info.host = url.substring(protocol_end_index, host_end_index);
-        info.path = url.substring(host_end_index);
+static void sendImagesResumable(camera_fb_t* fb1, camera_fb_t* fb2) {
+    String payload = String("{\"image1_size\":") + fb1->len + ",\"image2_size\":" + fb2->len + "}";
+    ServerRequest openRequest("POST", UPLOAD_ENDPOINT);
+    openRequest.contentType = "application/json";
+    openRequest.payload = (const uint8_t*)payload.c_str();
+    openRequest.size = payload.length();
+    ServerResponse response = sendServerRequest(openRequest);
+
+    JSONVar session = JSON.parse(response.body);
+    if (response.code != 201 || JSON.typeof(session) != "object") {
+        Serial.printf("Failed to open upload session. HTTP Code: %d\n", response.code);
+        return;
     }
 
-    int port_index = info.host.indexOf(':');
-    if (port_index != -1) {
-        info.port = info.host.substring(port_index + 1).toInt();
-        info.host = info.host.substring(0, port_index);
+    String sessionPath = String(UPLOAD_ENDPOINT) + (const char*)session["id"] + "/";
+    if (!uploadImage(sessionPath, "image1", fb1) || !uploadImage(sessionPath, "image2", fb2)) {
+        Serial.println("Upload failed; discarding the session.");
+        sendServerRequest(ServerRequest("DELETE", sessionPath));
+        return;
     }
-    return true;
+
+    response = sendServerRequest(ServerRequest("POST", sessionPath + "commit/"));
+    Serial.printf("Server Response (%d):\n", response.code);
+    Serial.println(response.body);
+    handleAnalysisResponse(response.code, response.body, fb2);
 }
 
 String generateBoundary() {
@@ -3,6 +3,9 @@
 char DJANGO_BASE_URL[100] = "http://192.168.1.104:8000";
 const char* LOG_ENDPOINT = "/api/vision/log/";
 const char* ANALYZE_ENDPOINT = "/api/vision/logs/";
+const char* DEVICE_CONFIG_ENDPOINT = "/api/vision/device/config/";
+const char* UPLOAD_ENDPOINT = "/api/vision/uploads/";
+const char* DEVICE_CONFIG_SOCKET_ENDPOINT = "/ws/device/config/";
 
 char API_KEY[65] = "YOUR_DJANGO_API_KEY_HERE";
 
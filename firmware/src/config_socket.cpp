@@ -0,0 +1,103 @@
+#include "config_socket.h"
+#include "config.h"
+#include "log_handler.h"
+#include "schedule_handler.h"
+#include <Arduino_JSON.h>
+#include <WebSocketsClient.h>
+
+static WebSocketsClient configSocket;
+static bool socketStarted = false;
+static bool socketConnected = false;
+static String lastEtag;
+static String connectEtag;
+static unsigned long lastBeginAt = 0;
+
+static void onConfigSocketEvent(WStype_t type, uint8_t* payload, size_t length) {
+    switch (type) {
+        case WStype_CONNECTED:
+            socketConnected = true;
+            Serial.println("Configuration socket connected.");
+            break;
+        case WStype_DISCONNECTED:
+            if (socketConnected) {
+                Serial.println("Configuration socket disconnected.");
+            }
+            socketConnected = false;
+            break;
+        case WStype_TEXT: {
+            JSONVar message = JSON.parse(String((const char*)payload, length));
+            if (JSON.typeof(message) != "object" || !message.hasOwnProperty("etag")) {
+                break;
+            }
+            String messageType = (const char*)message["type"];
+            lastEtag = (const char*)message["etag"];
+            if (messageType == "config") {
+                sendLogToServer("Configuration updated by the server (" + lastEtag + ").");
+                applyCaptureSettings(JSON.stringify(message["config"]));
+            }
+            break;
+        }
+        default:
+            break;
+    }
+}
+
+void beginConfigSocket() {
+    String url = String(DJANGO_BASE_URL);
+    bool secure = url.startsWith("https://");
+    int hostStart = url.indexOf("://");
+    if (hostStart == -1) {
+        Serial.println("Invalid URL: Protocol (http:// or https://) is missing.");
+        return;
+    }
+    hostStart += 3;
+    int hostEnd = url.indexOf('/', hostStart);
+    String host = hostEnd == -1 ? url.substring(hostStart) : url.substring(hostStart, hostEnd);
+    uint16_t port = secure ? 443 : 80;
+    int portStart = host.indexOf(':');
+    if (portStart != -1) {
+        port = host.substring(portStart + 1).toInt();
+        host = host.substring(0, portStart);
+    }
+
+    String path = String(DEVICE_CONFIG_SOCKET_ENDPOINT);
+    if (lastEtag.length() > 0) {
+        String etag = lastEtag;
+        etag.replace("\"", "%22");
+        path += "?etag=" + etag;
+    }
+
+    if (socketStarted) {
+        configSocket.disconnect();
+    }
+    configSocket.setExtraHeaders((String("X-Api-Key: ") + API_KEY).c_str());
+    if (secure) {
+        configSocket.beginSSL(host.c_str(), port, path.c_str());
+    } else {
+        configSocket.begin(host.c_str(), port, path.c_str());
+    }
+    configSocket.onEvent(onConfigSocketEvent);
+    configSocket.setReconnectInterval(CONFIG_SOCKET_RECONNECT_MS);
+    configSocket.enableHeartbeat(CONFIG_SOCKET_PING_MS, CONFIG_SOCKET_PING_MS / 2, 2);
+
+    socketStarted = true;
+    connectEtag = lastEtag;
+    lastBeginAt = millis();
+}
+
+void handleConfigSocket() {
+    if (!socketStarted) {
+        return;
+    }
+    configSocket.loop();
+
+    // The library reconnects to the URL it was started with; restart it when the ETag to
+    // announce has changed since, so the server can skip an unchanged configuration.
+    if (!socketConnected && lastEtag != connectEtag && millis() - lastBeginAt >= CONFIG_SOCKET_RECONNECT_MS) {
+        beginConfigSocket();
+    }
+}
+
+bool isConfigSocketConnected() {
+    return socketConnected;
+}
@@ -1,32 +1,99 @@
 #include "log_handler.h"
 #include "config.h"
-#include <HTTPClient.h>
+#include "server_connection.h"
 #include <Arduino_JSON.h>
 #include <WiFi.h>
 
+struct LogEntry {
+    String message;
+    unsigned long loggedAt;
+};
+
+static LogEntry logBuffer[LOG_BUFFER_CAPACITY];
+static size_t logHead = 0;
+static size_t logCount = 0;
+static unsigned long droppedLogs = 0;
+static unsigned long lastFlushAt = 0;
+
+static void clearLogBuffer() {
+    for (size_t i = 0; i < logCount; i++) {
+        logBuffer[(logHead + i) % LOG_BUFFER_CAPACITY].message = String();
+    }
+    logHead = 0;
+    logCount = 0;
+    droppedLogs = 0;
+}
+
 void sendLogToServer(const String& message) {
-    if (WiFi.status() != WL_CONNECTED) {
-        Serial.printf("Log failed (No WiFi): %s\n", message.c_str());
-        return;
+    if (logCount == LOG_BUFFER_CAPACITY) {
+        flushLogs();
+    }
+
+    // Flush failed (e.g. no WiFi): overwrite the oldest line and report the loss later.
+    if (logCount == LOG_BUFFER_CAPACITY) {
+        logBuffer[logHead].message = String();
+        logHead = (logHead + 1) % LOG_BUFFER_CAPACITY;
+        logCount--;
+        droppedLogs++;
+    }
+
+    LogEntry& entry = logBuffer[(logHead + logCount) % LOG_BUFFER_CAPACITY];
+    entry.message = message;
+    entry.loggedAt = millis();
+    logCount++;
+}
+
+bool flushLogs() {
+    if (logCount == 0) {
+        return true;
     }
 
-    String full_log_url = String(DJANGO_BASE_URL) + String(LOG_ENDPOINT);
+    unsigned long now = millis();
+    lastFlushAt = now;
 
-    HTTPClient http;
-    http.begin(full_log_url);
-    http.addHeader("Content-Type", "application/json");
-    http.addHeader("X-Api-Key", API_KEY); 
-    http.setTimeout(5000);
+    if (WiFi.status() != WL_CONNECTED) {
+        Serial.printf("Log flush postponed (No WiFi), %u lines buffered.\n", (unsigned)logCount);
+        return false;
+    }
+
+    JSONVar messages;
+    int index = 0;
+    if (droppedLogs > 0) {
+        JSONVar dropped;
+        dropped["message"] = String("[") + droppedLogs + " log lines dropped on device]";
+        dropped["age_ms"] = 0;
+        messages[index++] = dropped;
+    }
+    for (size_t i = 0; i < logCount; i++) {
+        const LogEntry& entry = logBuffer[(logHead + i) % LOG_BUFFER_CAPACITY];
+        JSONVar item;
+        item["message"] = entry.message;
+        item["age_ms"] = (long)(now - entry.loggedAt);
+        messages[index++] = item;
+    }
 
     JSONVar jsonPayload;
-    jsonPayload["message"] = message;
+    jsonPayload["messages"] = messages;
     String payload = JSON.stringify(jsonPayload);
 
-    int httpResponseCode = http.POST(payload);
-    
-    if (httpResponseCode != 204) {
-        Serial.printf("Failed to send log. HTTP Code: %d\n", httpResponseCode);
+    ServerRequest request("POST", LOG_ENDPOINT);
+    request.contentType = "application/json";
+    request.payload = (const uint8_t*)payload.c_str();
+    request.size = payload.length();
+    int httpResponseCode = sendServerRequest(request).code;
+
+    // 429 means the server is shedding our logs; resending the same batch would not help.
+    if (httpResponseCode == 200 || httpResponseCode == 429) {
+        clearLogBuffer();
+        return true;
     }
 
-    http.end();
-}
\ No newline at end of file
+    Serial.printf("Failed to send logs. HTTP Code: %d\n", httpResponseCode);
+    return false;
+}
+
+void handleLogFlush() {
+    if (logCount > 0 && millis() - lastFlushAt >= LOG_FLUSH_INTERVAL_MS) {
+        flushLogs();
+    }
+}
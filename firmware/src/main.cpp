@@ -8,6 +8,8 @@
 #include "ai_handler.h"
 #include "web_server_handler.h"
 #include "log_handler.h"
+#include "schedule_handler.h"
+#include "config_socket.h"
 
 void saveConfigCallback() {
     sendLogToServer("Configuration saved via WiFiManager.");
@@ -59,6 +61,7 @@ void setup() {
     if (!initCamera()) {
         Serial.println("CRITICAL: Camera initialization failed. Halting.");
         sendLogToServer("CRITICAL: Camera initialization failed. Halting.");
+        flushLogs();
         while (true) { delay(1000); }
     }
     
@@ -66,8 +69,14 @@ void setup() {
     sendLogToServer("Camera initialized successfully.");
 
     initServer();
+
+    fetchDeviceSchedule();
+    beginConfigSocket();
 }
 
 void loop() {
     handleServerClient();
+    handleLogFlush();
+    handleConfigSocket();
+    handleScheduledCapture();
 }
\ No newline at end of file
@@ -0,0 +1,98 @@
+#include "motion_handler.h"
+#include "config.h"
+#include "camera_handler.h"
+#include "log_handler.h"
+#include "esp_jpg_decode.h"
+#include <motion_gate.h>
+
+struct GrayFrame {
+    const uint8_t* jpeg;
+    size_t jpegLength;
+    uint8_t* pixels;
+    uint16_t width;
+    uint16_t height;
+};
+
+static float motionThreshold = 0.0f;
+static uint8_t referenceSignature[MOTION_GATE_MAX_BLOCKS];
+static size_t referenceBlocks = 0;
+static unsigned long skippedCaptures = 0;
+
+static size_t readJpeg(void* arg, size_t index, uint8_t* buf, size_t len) {
+    GrayFrame* frame = (GrayFrame*)arg;
+    if (index + len > frame->jpegLength) {
+        len = frame->jpegLength - index;
+    }
+    if (buf) {
+        memcpy(buf, frame->jpeg + index, len);
+    }
+    return len;
+}
+
+static bool writeGray(void* arg, uint16_t x, uint16_t y, uint16_t w, uint16_t h, uint8_t* data) {
+    // Called without data at the start and the end of the image.
+    if (!data) {
+        return true;
+    }
+    GrayFrame* frame = (GrayFrame*)arg;
+    for (uint16_t row = 0; row < h && y + row < frame->height; row++) {
+        for (uint16_t col = 0; col < w && x + col < frame->width; col++) {
+            const uint8_t* rgb = data + (row * w + col) * 3;
+            frame->pixels[(y + row) * frame->width + x + col] = (rgb[0] * 77 + rgb[1] * 150 + rgb[2] * 29) >> 8;
+        }
+    }
+    return true;
+}
+
+// Decodes the JPEG at 1/8 scale straight into grayscale and reduces it to block means.
+static size_t frameSignature(camera_fb_t* fb, uint8_t* signature) {
+    GrayFrame frame = {fb->buf, fb->len, nullptr, (uint16_t)((fb->width + 7) / 8), (uint16_t)((fb->height + 7) / 8)};
+    frame.pixels = (uint8_t*)malloc(frame.width * frame.height);
+    if (!frame.pixels) {
+        return 0;
+    }
+
+    size_t blocks = 0;
+    if (esp_jpg_decode(fb->len, JPG_SCALE_8X, readJpeg, writeGray, &frame) == ESP_OK) {
+        blocks = motion_gate_block_means(frame.pixels, frame.width, frame.height, MOTION_GATE_BLOCK_SIZE,
+                                         signature, MOTION_GATE_MAX_BLOCKS);
+    }
+    free(frame.pixels);
+    return blocks;
+}
+
+void setMotionThreshold(float threshold) {
+    motionThreshold = threshold;
+}
+
+bool motionDetected() {
+    if (motionThreshold <= 0.0f || referenceBlocks == 0) {
+        return true;
+    }
+
+    camera_fb_t* fb = captureImage();
+    if (!fb) {
+        return true;
+    }
+    uint8_t signature[MOTION_GATE_MAX_BLOCKS];
+    size_t blocks = frameSignature(fb, signature);
+    esp_camera_fb_return(fb);
+
+    // A frame that cannot be compared is uploaded rather than silently dropped.
+    if (blocks != referenceBlocks) {
+        return true;
+    }
+    if (motion_gate_changed(referenceSignature, signature, blocks, motionThreshold)) {
+        if (skippedCaptures > 0) {
+            sendLogToServer(String("Motion detected after ") + skippedCaptures + " unchanged captures.");
+            skippedCaptures = 0;
+        }
+        return true;
+    }
+    skippedCaptures++;
+    return false;
+}
+
+void rememberMotionReference(camera_fb_t* fb) {
+    referenceBlocks = motionThreshold > 0.0f ? frameSignature(fb, referenceSignature) : 0;
+}
@@ -0,0 +1,74 @@
+#include "schedule_handler.h"
+#include "config.h"
+#include "ai_handler.h"
+#include "log_handler.h"
+#include "motion_handler.h"
+#include "config_socket.h"
+#include "server_connection.h"
+#include <Arduino_JSON.h>
+#include <WiFi.h>
+
+// 0 keeps periodic capture off until the server recommends an interval.
+static unsigned long captureIntervalSeconds = 0;
+static int captureDelaySeconds = 10;
+static unsigned long lastCaptureAt = 0;
+static unsigned long lastConfigFetchAt = 0;
+
+void applyCaptureSettings(const String& body) {
+    JSONVar response = JSON.parse(body);
+    if (JSON.typeof(response) != "object") {
+        return;
+    }
+    if (response.hasOwnProperty("motion_threshold")) {
+        setMotionThreshold((float)(double)response["motion_threshold"]);
+    }
+    if (!response.hasOwnProperty("schedule")) {
+        return;
+    }
+
+    JSONVar schedule = response["schedule"];
+    unsigned long interval = (unsigned long)(long)schedule["capture_interval_seconds"];
+    int delaySeconds = (int)schedule["delay_seconds"];
+    if (delaySeconds < 1) {
+        delaySeconds = 1;
+    }
+
+    if (interval != captureIntervalSeconds || delaySeconds != captureDelaySeconds) {
+        sendLogToServer(String("Capture schedule: every ") + interval + "s, " + delaySeconds + "s between frames.");
+    }
+    captureIntervalSeconds = interval;
+    captureDelaySeconds = delaySeconds;
+}
+
+bool fetchDeviceSchedule() {
+    lastConfigFetchAt = millis();
+    if (WiFi.status() != WL_CONNECTED) {
+        return false;
+    }
+
+    ServerResponse response = sendServerRequest(ServerRequest("GET", DEVICE_CONFIG_ENDPOINT));
+    if (response.code != 200) {
+        Serial.printf("Failed to fetch device configuration. HTTP Code: %d\n", response.code);
+        return false;
+    }
+
+    applyCaptureSettings(response.body);
+    return true;
+}
+
+void handleScheduledCapture() {
+    unsigned long now = millis();
+    if (!isConfigSocketConnected() && now - lastConfigFetchAt >= CONFIG_REFRESH_INTERVAL_MS) {
+        fetchDeviceSchedule();
+    }
+
+    if (captureIntervalSeconds == 0 || now - lastCaptureAt < captureIntervalSeconds * 1000UL) {
+        return;
+    }
+
+    // Interval is measured from the start of one capture to the next, so it includes the delay.
+    lastCaptureAt = now;
+    if (motionDetected()) {
+        sendImagesToServer(captureDelaySeconds);
+    }
+}
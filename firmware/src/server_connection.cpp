@@ -0,0 +1,178 @@
+#include "server_connection.h"
+#include "config.h"
+#include <HTTPClient.h>
+#include <WiFi.h>
+#include <WiFiClient.h>
+#include <WiFiClientSecure.h>
+
+static WiFiClient plainClient;
+static WiFiClientSecure secureClient;
+static HTTPClient http;
+static String connectedBaseUrl;
+
+struct RequestTimings {
+    unsigned long count;
+    unsigned long totalMs;
+};
+
+static RequestTimings newConnectionTimings = {0, 0};
+static RequestTimings reusedConnectionTimings = {0, 0};
+
+void PartsStream::add(const uint8_t* data, size_t length) {
+    if (count < MAX_PARTS) {
+        parts[count] = data;
+        lengths[count] = length;
+        count++;
+    }
+}
+
+void PartsStream::add(const String& text) {
+    add((const uint8_t*)text.c_str(), text.length());
+}
+
+void PartsStream::rewind() {
+    part = 0;
+    offset = 0;
+}
+
+size_t PartsStream::length() const {
+    size_t total = 0;
+    for (size_t i = 0; i < count; i++) {
+        total += lengths[i];
+    }
+    return total;
+}
+
+int PartsStream::available() {
+    size_t remaining = 0;
+    for (size_t i = part; i < count; i++) {
+        remaining += lengths[i];
+    }
+    return (int)(remaining - offset);
+}
+
+int PartsStream::peek() {
+    while (part < count && offset >= lengths[part]) {
+        part++;
+        offset = 0;
+    }
+    return part < count ? parts[part][offset] : -1;
+}
+
+int PartsStream::read() {
+    int c = peek();
+    if (c >= 0) {
+        offset++;
+    }
+    return c;
+}
+
+size_t PartsStream::readBytes(char* buffer, size_t length) {
+    size_t copied = 0;
+    while (copied < length && peek() >= 0) {
+        size_t n = min(length - copied, lengths[part] - offset);
+        memcpy(buffer + copied, parts[part] + offset, n);
+        offset += n;
+        copied += n;
+    }
+    return copied;
+}
+
+void closeServerConnection() {
+    http.end();
+    plainClient.stop();
+    secureClient.stop();
+}
+
+static WiFiClient& serverClient() {
+    if (connectedBaseUrl != DJANGO_BASE_URL) {
+        closeServerConnection();
+        connectedBaseUrl = DJANGO_BASE_URL;
+        secureClient.setInsecure();
+    }
+    if (connectedBaseUrl.startsWith("https://")) {
+        return secureClient;
+    }
+    return plainClient;
+}
+
+static int attemptRequest(const ServerRequest& request, ServerResponse& response, bool& reused) {
+    WiFiClient& client = serverClient();
+    reused = client.connected();
+
+    if (!http.begin(client, connectedBaseUrl + request.path)) {
+        return HTTPC_ERROR_CONNECTION_REFUSED;
+    }
+    http.setReuse(true);
+    http.setTimeout(SERVER_RESPONSE_TIMEOUT_MS);
+    http.addHeader("X-Api-Key", API_KEY);
+    if (request.contentType) {
+        http.addHeader("Content-Type", request.contentType);
+    }
+    if (request.header) {
+        http.addHeader(request.header, request.headerValue);
+    }
+    const char* collectedHeaders[] = {"Upload-Offset"};
+    http.collectHeaders(collectedHeaders, 1);
+
+    int httpCode;
+    if (request.body) {
+        request.body->rewind();
+        httpCode = http.sendRequest(request.method, request.body, request.body->length());
+    } else {
+        httpCode = http.sendRequest(request.method, (uint8_t*)request.payload, request.size);
+    }
+    if (httpCode > 0) {
+        response.uploadOffset = http.header("Upload-Offset");
+        if (http.getSize() <= SERVER_RESPONSE_MAX_LENGTH) {
+            response.body = http.getString();
+        } else {
+            // Not worth the memory; drop the connection rather than leave the body unread on it.
+            http.setReuse(false);
+        }
+    }
+    // Keeps the socket open unless the server answered with "Connection: close".
+    http.end();
+    return httpCode;
+}
+
+static bool safeToRetry(const ServerRequest& request, int httpCode) {
+    // These errors mean the request never reached the server.
+    if (httpCode == HTTPC_ERROR_CONNECTION_REFUSED || httpCode == HTTPC_ERROR_SEND_HEADER_FAILED ||
+        httpCode == HTTPC_ERROR_SEND_PAYLOAD_FAILED) {
+        return true;
+    }
+    // A lost response can only be retried when repeating the request is harmless.
+    return httpCode == HTTPC_ERROR_CONNECTION_LOST && strcmp(request.method, "POST") != 0;
+}
+
+ServerResponse sendServerRequest(const ServerRequest& request) {
+    ServerResponse response;
+    if (WiFi.status() != WL_CONNECTED) {
+        response.code = HTTPC_ERROR_NOT_CONNECTED;
+        return response;
+    }
+
+    unsigned long startedAt = millis();
+    bool reused = false;
+    response.code = attemptRequest(request, response, reused);
+    if (response.code < 0 && reused && safeToRetry(request, response.code)) {
+        Serial.printf("Kept-alive connection failed (%s), reconnecting.\n", http.errorToString(response.code).c_str());
+        closeServerConnection();
+        startedAt = millis();
+        response.code = attemptRequest(request, response, reused);
+    }
+    if (response.code < 0) {
+        closeServerConnection();
+    }
+
+    unsigned long elapsed = millis() - startedAt;
+    RequestTimings& timings = reused ? reusedConnectionTimings : newConnectionTimings;
+    timings.count++;
+    timings.totalMs += elapsed;
+    Serial.printf("%s %s -> %d in %lu ms on a %s connection (average: new %lu ms, reused %lu ms)\n",
+                  request.method, request.path.c_str(), response.code, elapsed, reused ? "reused" : "new",
+                  newConnectionTimings.count ? newConnectionTimings.totalMs / newConnectionTimings.count : 0,
+                  reusedConnectionTimings.count ? reusedConnectionTimings.totalMs / reusedConnectionTimings.count : 0);
+    return response;
+}
@@ -0,0 +1,113 @@
+#include <string.h>
+#include <unity.h>
+#include "motion_gate.h"
+
+#define WIDTH 80
+#define HEIGHT 60
+#define BLOCK 4
+#define BLOCKS ((WIDTH / BLOCK) * (HEIGHT / BLOCK))
+
+static uint8_t frame[WIDTH * HEIGHT];
+static uint8_t reference[BLOCKS];
+static uint8_t current[BLOCKS];
+
+static void fill_frame(uint8_t value) {
+    memset(frame, value, sizeof(frame));
+}
+
+static void fill_rect(int left, int top, int width, int height, uint8_t value) {
+    for (int y = top; y < top + height; y++) {
+        memset(frame + y * WIDTH + left, value, width);
+    }
+}
+
+void setUp(void) {
+    fill_frame(100);
+}
+
+void tearDown(void) {}
+
+void test_block_means_of_uniform_frame(void) {
+    TEST_ASSERT_EQUAL_UINT(BLOCKS, motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS));
+    for (size_t i = 0; i < BLOCKS; i++) {
+        TEST_ASSERT_EQUAL_UINT8(100, reference[i]);
+    }
+}
+
+void test_block_means_average_each_tile(void) {
+    fill_rect(0, 0, 2, 4, 200);
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS);
+    TEST_ASSERT_EQUAL_UINT8(150, reference[0]);
+    TEST_ASSERT_EQUAL_UINT8(100, reference[1]);
+}
+
+void test_block_means_ignore_partial_tiles(void) {
+    uint8_t means[4];
+    TEST_ASSERT_EQUAL_UINT(4, motion_gate_block_means(frame, 10, 9, BLOCK, means, 4));
+}
+
+void test_block_means_reject_small_buffers(void) {
+    TEST_ASSERT_EQUAL_UINT(0, motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS - 1));
+    TEST_ASSERT_EQUAL_UINT(0, motion_gate_block_means(frame, 3, 3, BLOCK, reference, BLOCKS));
+    TEST_ASSERT_EQUAL_UINT(0, motion_gate_block_means(frame, WIDTH, HEIGHT, 0, reference, BLOCKS));
+}
+
+void test_identical_frames_do_not_differ(void) {
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS);
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, current, BLOCKS);
+    TEST_ASSERT_EQUAL_FLOAT(0.0f, motion_gate_difference(reference, current, BLOCKS));
+}
+
+void test_global_brightness_shift_is_ignored(void) {
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS);
+    fill_frame(160);
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, current, BLOCKS);
+    TEST_ASSERT_EQUAL_FLOAT(0.0f, motion_gate_difference(reference, current, BLOCKS));
+}
+
+void test_local_change_is_measured(void) {
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS);
+    // 8x4 blocks out of 20x15 turn bright.
+    fill_rect(16, 8, 32, 16, 250);
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, current, BLOCKS);
+    TEST_ASSERT_FLOAT_WITHIN(0.001f, 32.0f / BLOCKS, motion_gate_difference(reference, current, BLOCKS));
+}
+
+void test_local_change_under_brightness_shift(void) {
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS);
+    fill_frame(130);
+    fill_rect(16, 8, 32, 16, 10);
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, current, BLOCKS);
+    TEST_ASSERT_FLOAT_WITHIN(0.001f, 32.0f / BLOCKS, motion_gate_difference(reference, current, BLOCKS));
+}
+
+void test_gate_compares_against_threshold(void) {
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS);
+    fill_rect(16, 8, 32, 16, 250);
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, current, BLOCKS);
+    TEST_ASSERT_TRUE(motion_gate_changed(reference, current, BLOCKS, 0.1f));
+    TEST_ASSERT_FALSE(motion_gate_changed(reference, current, BLOCKS, 0.2f));
+}
+
+void test_gate_passes_without_threshold_or_reference(void) {
+    motion_gate_block_means(frame, WIDTH, HEIGHT, BLOCK, reference, BLOCKS);
+    memcpy(current, reference, sizeof(current));
+    TEST_ASSERT_TRUE(motion_gate_changed(reference, current, BLOCKS, 0.0f));
+    TEST_ASSERT_TRUE(motion_gate_changed(reference, current, 0, 0.5f));
+    TEST_ASSERT_FALSE(motion_gate_changed(reference, current, BLOCKS, 0.05f));
+}
+
+int main(void) {
+    UNITY_BEGIN();
+    RUN_TEST(test_block_means_of_uniform_frame);
+    RUN_TEST(test_block_means_average_each_tile);
+    RUN_TEST(test_block_means_ignore_partial_tiles);
+    RUN_TEST(test_block_means_reject_small_buffers);
+    RUN_TEST(test_identical_frames_do_not_differ);
+    RUN_TEST(test_global_brightness_shift_is_ignored);
+    RUN_TEST(test_local_change_is_measured);
+    RUN_TEST(test_local_change_under_brightness_shift);
+    RUN_TEST(test_gate_compares_against_threshold);
+    RUN_TEST(test_gate_passes_without_threshold_or_reference);
+    return UNITY_END();
+}